@@ -37,6 +37,8 @@ from browser_use.agent.prompts import PlannerPrompt
 
 from json_repair import repair_json
 from src.utils.agent_state import AgentState
+from src.utils.history_store import HistoryWriter
+from src.utils.history_summary import HistorySummary
 
 from .custom_message_manager import CustomMessageManager
 from .custom_views import CustomAgentOutput, CustomAgentStepInfo
@@ -45,6 +47,15 @@ from .custom_prompts import HashDealsSystemPrompt, HashDealsAgentMessagePrompt #
 logger = logging.getLogger(__name__)
 
 
+def agent_options_from_env() -> Dict[str, bool]:
+    """CustomAgent keyword arguments of the AGENT_* variables, off when they are not set"""
+    return {
+        "use_context_compaction": os.getenv("AGENT_CONTEXT_COMPACTION", "false").lower() == "true",
+        "use_element_diff": os.getenv("AGENT_ELEMENT_DIFF", "false").lower() == "true",
+        "skip_unchanged_screenshots": os.getenv("AGENT_SKIP_UNCHANGED_SCREENSHOTS", "false").lower() == "true",
+    }
+
+
 class CustomAgent(Agent):
     def __init__(
             self,
@@ -91,7 +102,14 @@ class CustomAgent(Agent):
             page_extraction_llm: Optional[BaseChatModel] = None,
             planner_llm: Optional[BaseChatModel] = None,
             planner_interval: int = 1,  # Run planner every N steps
-            is_hash_deals_agent: bool = False # New flag to indicate Hash Deals Agent
+            is_hash_deals_agent: bool = False, # New flag to indicate Hash Deals Agent
+            use_context_compaction: bool = False,
+            compaction_keep_screenshots: int = 1,
+            max_history_messages: int = 40,
+            use_element_diff: bool = False,
+            element_diff_snapshot_interval: int = 5,
+            skip_unchanged_screenshots: bool = False,
+            history_writer: Optional[HistoryWriter] = None,
 
     ):
         # ... (rest of the __init__ method remains the same until system_prompt_class and agent_prompt_class) ...
@@ -117,7 +135,6 @@ class CustomAgent(Agent):
             max_failures=max_failures,
             retry_delay=retry_delay,
             system_prompt_class=system_prompt_class, # Use potentially updated system_prompt_class
-            agent_prompt_class=agent_prompt_class, # Use potentially updated agent_prompt_class
             max_input_tokens=max_input_tokens,
             validate_output=validate_output,
             message_context=message_context,
@@ -132,7 +149,57 @@ class CustomAgent(Agent):
             register_new_step_callback=register_new_step_callback,
             register_done_callback=register_done_callback,
             tool_calling_method=tool_calling_method,
+            page_extraction_llm=page_extraction_llm,
             planner_llm=planner_llm,
             planner_interval=planner_interval
         )
+        self.add_infos = add_infos
+        if skip_unchanged_screenshots and hasattr(self.browser_context.config, "hash_screenshots"):
+            # the context only hashes screenshots when asked to
+            self.browser_context.config.hash_screenshots = True
+        # Agent has no agent_prompt_class, the state messages are built by CustomMessageManager
+        self.agent_prompt_class = agent_prompt_class
+        self.message_manager = CustomMessageManager(
+            llm=self.llm,
+            task=self.task,
+            action_descriptions=self.controller.registry.get_prompt_description(),
+            system_prompt_class=self.system_prompt_class,
+            agent_prompt_class=agent_prompt_class,
+            max_input_tokens=self.max_input_tokens,
+            include_attributes=self.include_attributes,
+            max_error_length=self.max_error_length,
+            max_actions_per_step=self.max_actions_per_step,
+            message_context=self.message_context,
+            sensitive_data=self.sensitive_data,
+            use_context_compaction=use_context_compaction,
+            compaction_keep_screenshots=compaction_keep_screenshots,
+            max_history_messages=max_history_messages,
+            use_element_diff=use_element_diff,
+            element_diff_snapshot_interval=element_diff_snapshot_interval,
+            skip_unchanged_screenshots=skip_unchanged_screenshots,
+            add_infos=self.add_infos,
+        )
+        # every step is appended to the writer as soon as it is recorded
+        self.history_writer = history_writer
+        # final_result, errors, actions, ... maintained step by step, see HistorySummary
+        self.history_summary = HistorySummary()
         # ... (rest of the __init__ method remains the same) ...
+
+    async def run(self, max_steps: int = 100) -> AgentHistoryList:
+        # the state messages show the step number out of max_steps
+        self.message_manager.max_steps = max_steps
+        return await super().run(max_steps=max_steps)
+
+    def _make_history_item(
+            self,
+            model_output: AgentOutput | None,
+            state: 'BrowserState',
+            result: list[ActionResult],
+    ) -> None:
+        super()._make_history_item(model_output, state, result)
+        self.history_summary.add(self.history.history[-1])
+        if self.history_writer is not None:
+            try:
+                self.history_writer.append(self.history.history[-1])
+            except Exception as e:
+                logger.warning(f"Failed to write history step: {e}")
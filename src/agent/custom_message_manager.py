@@ -6,7 +6,7 @@ from typing import List, Optional, Type, Dict
 from browser_use.agent.message_manager.service import MessageManager
 from browser_use.agent.message_manager.views import MessageHistory
 from browser_use.agent.prompts import SystemPrompt, AgentMessagePrompt
-from browser_use.agent.views import ActionResult, AgentStepInfo, ActionModel
+from browser_use.agent.views import ActionResult, AgentStepInfo, ActionModel, AgentOutput
 from browser_use.browser.views import BrowserState
 from langchain_core.language_models import BaseChatModel
 from langchain_anthropic import ChatAnthropic
@@ -20,6 +20,9 @@ from langchain_core.messages import (
 from langchain_openai import ChatOpenAI
 from ..utils.llm import DeepSeekR1ChatOpenAI
 from .custom_prompts import CustomAgentMessagePrompt
+from .custom_views import CustomAgentStepInfo, CustomMessageHistory
+from ..utils.element_diff import ElementTreeDiffer, ElementTreeView
+from ..utils.screenshot import hash_distance
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +43,16 @@ class CustomMessageManager(MessageManager):
             max_actions_per_step: int = 10,
             message_context: Optional[str] = None,
             sensitive_data: Optional[Dict[str, str]] = None,
+            use_context_compaction: bool = False,
+            compaction_keep_screenshots: int = 1,
+            max_history_messages: int = 40,
+            compaction_summary_tokens: int = 2000,
+            use_element_diff: bool = False,
+            element_diff_snapshot_interval: int = 5,
+            skip_unchanged_screenshots: bool = False,
+            screenshot_hash_threshold: int = 0,
+            add_infos: str = "",
+            max_steps: int = 100,
     ):
         super().__init__(
             llm=llm,
@@ -57,31 +70,161 @@ class CustomMessageManager(MessageManager):
         )
         self.agent_prompt_class = agent_prompt_class
         # Custom: Move Task info to state_message
-        self.history = MessageHistory()
+        self.history = CustomMessageHistory()
         self._add_message_with_tokens(self.system_prompt)
         
         if self.message_context:
             context_message = HumanMessage(content=self.message_context)
             self._add_message_with_tokens(context_message)
 
+        task_message = self.task_instructions(task)
+        self._add_message_with_tokens(task_message)
+
+        # the custom prompts also carry the task, the hints and the memory in every state message
+        self.add_infos = add_infos
+        self.max_steps = max_steps
+        self._last_actions: Optional[List[ActionModel]] = None
+
+        # Context compaction: old spans are replaced by a rolling summary of the agent brain
+        self.use_context_compaction = use_context_compaction
+        self.compaction_keep_screenshots = compaction_keep_screenshots
+        self.max_history_messages = max_history_messages
+        self.compaction_summary_tokens = compaction_summary_tokens
+        self.important_contents: List[str] = []
+        self.task_progress = ""
+        self._has_summary_message = False
+
+        # Element diff: state messages only carry changes against a retained element snapshot
+        self.element_differ = ElementTreeDiffer(
+            full_snapshot_interval=element_diff_snapshot_interval
+        ) if use_element_diff else None
+        self._element_snapshot_message: Optional[HumanMessage] = None
+        self._n_state_messages = 0
+
+        # Skip unchanged screenshots: compare perceptual hashes against the last screenshot sent
+        self.skip_unchanged_screenshots = skip_unchanged_screenshots
+        self.screenshot_hash_threshold = screenshot_hash_threshold
+        self._sent_screenshot_hash: Optional[int] = None
+        self._sent_screenshot_step = 0
+
     def cut_messages(self):
         """Get current message list, potentially trimmed to max tokens"""
-        diff = self.history.total_tokens - self.max_input_tokens
-        min_message_len = 2 if self.message_context is not None else 1
-        
-        while diff > 0 and len(self.history.messages) > min_message_len:
-            self.history.remove_message(min_message_len)  # always remove the oldest message
-            diff = self.history.total_tokens - self.max_input_tokens
-        
+        if self.use_context_compaction:
+            self.compact_messages()
+            return
+        min_message_len = 3 if self.message_context is not None else 2
+        # drop the oldest messages in one slice, keeping the system prompt and context
+        self.history.trim_to(self.max_input_tokens, keep=min_message_len)
+
+    def get_messages(self) -> List[BaseMessage]:
+        """Get current message list, compacted first when compaction mode is on"""
+        if self.use_context_compaction:
+            self.compact_messages()
+        return super().get_messages()
+
+    def add_model_output(self, model_output: AgentOutput) -> None:
+        """Add model output as AI message and remember its brain for the rolling summary"""
+        current_state = getattr(model_output, "current_state", None)
+        important_contents = getattr(current_state, "important_contents", "")
+        if important_contents and important_contents not in self.important_contents:
+            self.important_contents.append(important_contents)
+        task_progress = getattr(current_state, "task_progress", "")
+        if task_progress:
+            self.task_progress = task_progress
+        self._last_actions = model_output.action
+        super().add_model_output(model_output)
+
+    def compact_messages(self) -> None:
+        """Strip old screenshots, then fold the oldest messages into a rolling summary
+        when the history is over the token budget or the message limit"""
+        self._strip_old_screenshots()
+
+        min_message_len = 3 if self.message_context is not None else 2
+        keep = min_message_len + (1 if self._has_summary_message else 0)
+        over_tokens = self.history.total_tokens > self.max_input_tokens
+        over_count = len(self.history.messages) > self.max_history_messages
+        if not over_tokens and not over_count:
+            return
+
+        # leave room for the summary that replaces the dropped span, never drop the current state
+        removed = self.history.trim_to(
+            self.max_input_tokens - self.compaction_summary_tokens, keep=keep, keep_last=1
+        )
+        extra = len(self.history.messages) - self.max_history_messages + (0 if self._has_summary_message else 1)
+        if extra > 0:
+            # the remaining budget is fine but there are too many messages: drop the oldest by count
+            for _ in range(min(extra, len(self.history.messages) - keep - 1)):
+                self.history.remove_message(keep)
+                removed += 1
+        if not removed:
+            return
+
+        if self._has_summary_message:
+            self.history.remove_message(min_message_len)
+        self._add_message_with_tokens(self._build_summary_message(), position=min_message_len)
+        self._has_summary_message = True
+        logger.debug(
+            f"Compacted {removed} messages into summary - total tokens now: "
+            f"{self.history.total_tokens}/{self.max_input_tokens} - total messages: {len(self.history.messages)}"
+        )
+
+    def _build_summary_message(self) -> HumanMessage:
+        """Rolling summary of the compacted steps, newest important contents first within budget"""
+        budget = self.compaction_summary_tokens * self.estimated_characters_per_token
+        text = "[Summary of earlier steps - the original messages were compacted]\n"
+        if self.task_progress:
+            text += f"Task progress:\n{self.task_progress}\n"
+        contents = []
+        used = len(text)
+        for content in reversed(self.important_contents):
+            if used + len(content) > budget:
+                break
+            contents.append(content)
+            used += len(content) + 1
+        if contents:
+            text += "Important contents:\n" + "\n".join(reversed(contents))
+        return HumanMessage(content=text[:budget])
+
+    def _strip_old_screenshots(self) -> None:
+        """Replace the image parts of all but the last K state messages with their text"""
+        seen = 0
+        messages = list(self.history.messages)
+        for i in range(len(messages) - 1, -1, -1):
+            content = messages[i].message.content
+            if not isinstance(content, list) or not any(
+                    isinstance(item, dict) and "image_url" in item for item in content):
+                continue
+            seen += 1
+            if seen <= self.compaction_keep_screenshots:
+                continue
+            text = "".join(
+                item["text"] for item in content if isinstance(item, dict) and item.get("type") == "text"
+            )
+            self.history.remove_message(i)
+            self._add_message_with_tokens(HumanMessage(content=text), position=i)
+
     def add_state_message(
             self,
             state: BrowserState,
-            actions: Optional[List[ActionModel]] = None,
             result: Optional[List[ActionResult]] = None,
             step_info: Optional[AgentStepInfo] = None,
             use_vision=True,
+            actions: Optional[List[ActionModel]] = None,
     ) -> None:
-        """Add browser state as human message"""
+        """Add browser state as human message, with the actions of result (by default those of the last model output)"""
+        self._n_state_messages += 1
+        step_info = self._custom_step_info(step_info)
+        if actions is None:
+            actions = self._last_actions
+        prompt_kwargs = {}
+        if self.element_differ is not None:
+            prompt_kwargs["element_view"] = self._render_element_view(state, step_info)
+        if self.skip_unchanged_screenshots and use_vision and state.screenshot:
+            unchanged_since = self._unchanged_screenshot_step(state, step_info)
+            if unchanged_since is not None:
+                use_vision = False
+                prompt_kwargs["unchanged_screenshot_step"] = unchanged_since
+
         # otherwise add state message and result to next message (which will not stay in memory)
         state_message = self.agent_prompt_class(
             state,
@@ -90,9 +233,58 @@ class CustomMessageManager(MessageManager):
             include_attributes=self.include_attributes,
             max_error_length=self.max_error_length,
             step_info=step_info,
+            **prompt_kwargs,
         ).get_user_message(use_vision)
         self._add_message_with_tokens(state_message)
     
+    def _custom_step_info(self, step_info: Optional[AgentStepInfo]) -> CustomAgentStepInfo:
+        """Step info of the custom prompts; Agent.step passes none or a plain AgentStepInfo"""
+        if isinstance(step_info, CustomAgentStepInfo):
+            return step_info
+        return CustomAgentStepInfo(
+            step_number=step_info.step_number if step_info else self._n_state_messages,
+            max_steps=step_info.max_steps if step_info else self.max_steps,
+            task=self.task,
+            add_infos=self.add_infos,
+            memory="\n".join(self.important_contents),
+            task_progress=self.task_progress,
+            future_plans="",
+        )
+
+    def _render_element_view(self, state: BrowserState, step_info: Optional[AgentStepInfo]) -> ElementTreeView:
+        """Diff the element tree against the retained snapshot, replacing the snapshot when a new one is taken"""
+        if self._element_snapshot_message is not None and not self.history.contains(self._element_snapshot_message):
+            # the snapshot was compacted or trimmed away, the model can no longer resolve a diff
+            self.element_differ.reset()
+        step_number = step_info.step_number if step_info else self._n_state_messages
+        element_view = self.element_differ.render(state, self.include_attributes, step_number)
+        if element_view.is_snapshot:
+            if self._element_snapshot_message is not None:
+                index = self.history.index_of(self._element_snapshot_message)
+                if index >= 0:
+                    self.history.remove_message(index)
+            self._element_snapshot_message = HumanMessage(
+                content=f"[Element snapshot of step {step_number} - url: {state.url}]\n{element_view.text}"
+            )
+            self._add_message_with_tokens(self._element_snapshot_message)
+        return element_view
+
+    def _unchanged_screenshot_step(self, state: BrowserState, step_info: Optional[AgentStepInfo]) -> Optional[int]:
+        """Step of the last screenshot sent if the screen has not changed since, otherwise record this one"""
+        screenshot_hash = getattr(state, "screenshot_hash", None)
+        if screenshot_hash is None:
+            # only CustomBrowserContext hashes screenshots
+            return None
+        if (
+                self._sent_screenshot_hash is not None
+                and hash_distance(screenshot_hash, self._sent_screenshot_hash) <= self.screenshot_hash_threshold
+        ):
+            logger.debug(f"Screen unchanged since step {self._sent_screenshot_step}, skipping screenshot")
+            return self._sent_screenshot_step
+        self._sent_screenshot_hash = screenshot_hash
+        self._sent_screenshot_step = step_info.step_number if step_info else self._n_state_messages
+        return None
+
     def _count_text_tokens(self, text: str) -> int:
         if isinstance(self.llm, (ChatOpenAI, ChatAnthropic, DeepSeekR1ChatOpenAI)):
             try:
@@ -109,12 +301,4 @@ class CustomMessageManager(MessageManager):
 
     def _remove_state_message_by_index(self, remove_ind=-1) -> None:
         """Remove last state message from history"""
-        i = len(self.history.messages) - 1
-        remove_cnt = 0
-        while i >= 0:
-            if isinstance(self.history.messages[i].message, HumanMessage): 
-                remove_cnt += 1
-            if remove_cnt == abs(remove_ind):
-                self.history.remove_message(i)
-                break
-            i -= 1
+        self.history.remove_human_message(remove_ind)
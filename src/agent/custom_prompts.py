@@ -8,6 +8,42 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from datetime import datetime
 
 from .custom_views import CustomAgentStepInfo
+from ..utils.element_diff import ElementTreeView
+from ..utils.screenshot import screenshot_mime_type
+
+
+def format_elements_text(
+        state: BrowserState,
+        include_attributes: list[str],
+        element_view: Optional[ElementTreeView] = None,
+) -> str:
+    """Interactive elements section of a state message, full list or diff against the element snapshot"""
+    if element_view is None:
+        elements_text = state.element_tree.clickable_elements_to_string(include_attributes=include_attributes)
+    elif element_view.is_snapshot:
+        elements_text = f"See the element snapshot of step {element_view.snapshot_step} above." if element_view.text else ''
+    else:
+        elements_text = element_view.text
+
+    has_content_above = (state.pixels_above or 0) > 0
+    has_content_below = (state.pixels_below or 0) > 0
+
+    if elements_text != '':
+        if has_content_above:
+            elements_text = (
+                f'... {state.pixels_above} pixels above - scroll or extract content to see more ...\n{elements_text}'
+            )
+        else:
+            elements_text = f'[Start of page]\n{elements_text}'
+        if has_content_below:
+            elements_text = (
+                f'{elements_text}\n... {state.pixels_below} pixels below - scroll or extract content to see more ...'
+            )
+        else:
+            elements_text = f'{elements_text}\n[End of page]'
+    else:
+        elements_text = 'empty page'
+    return elements_text
 
 
 class CustomSystemPrompt(SystemPrompt):
@@ -145,6 +181,7 @@ class HashDealsSystemPrompt(SystemPrompt):
    - Extraction Actions:
        - **"extract_deals_information": \{\}** - Use this action FREQUENTLY on pages that you suspect contain deals (deals pages, category pages, home page sections). This is your PRIMARY action for getting deal data.
        - **"handle_image_carousel_deals": \{\}** - Use this action when you encounter image carousels or sliders, as these often contain visually presented deals.
+       - **"crawl_deals_pages": \{\}** - Use this action once to visit the deals, specials and pagination pages linked from the current site in parallel and extract the deals of all of them. Afterwards only explore pages it did not list.
        - **"extract_page_content": \{\}** - Use this action as a FALLBACK if you are unsure where deals might be on the current page, or if other extraction methods are not yielding results. It extracts all page content for broader analysis.
    - Utility Actions:
        - **"handle_age_verification": \{\}** - ALWAYS use this action at the beginning to handle age verification prompts before proceeding with deal finding.
@@ -215,6 +252,87 @@ Notes:
     """
 
 
+class CustomAgentMessagePrompt(AgentMessagePrompt):
+    def __init__(
+            self,
+            state: BrowserState,
+            actions: Optional[List[ActionModel]] = None,
+            result: Optional[List[ActionResult]] = None,
+            include_attributes: list[str] = [],
+            max_error_length: int = 400,
+            step_info: Optional[CustomAgentStepInfo] = None,
+            element_view: Optional[ElementTreeView] = None,
+            unchanged_screenshot_step: Optional[int] = None,
+    ):
+        super(CustomAgentMessagePrompt, self).__init__(state=state,
+                                                       result=result,
+                                                       include_attributes=include_attributes,
+                                                       max_error_length=max_error_length,
+                                                       step_info=step_info
+                                                       )
+        self.actions = actions
+        self.element_view = element_view
+        self.unchanged_screenshot_step = unchanged_screenshot_step
+
+    def get_user_message(self, use_vision: bool = True) -> HumanMessage:
+        if self.step_info:
+            step_info_description = f'Current step: {self.step_info.step_number}/{self.step_info.max_steps}\n'
+        else:
+            step_info_description = ''
+
+        time_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+        step_info_description += f"Current date and time: {time_str}"
+
+        elements_text = format_elements_text(self.state, self.include_attributes, self.element_view)
+
+        state_description = f"""
+{step_info_description}
+1. Task: {self.step_info.task}. 
+2. Hints(Optional): 
+{self.step_info.add_infos}
+3. Memory: 
+{self.step_info.memory}
+4. Current url: {self.state.url}
+5. Available tabs:
+{self.state.tabs}
+6. Interactive elements:
+{elements_text}
+        """
+
+        if self.unchanged_screenshot_step is not None:
+            state_description += f"\nScreen unchanged since step {self.unchanged_screenshot_step} - screenshot omitted.\n"
+
+        if self.actions and self.result:
+            state_description += "\n **Previous Actions** \n"
+            state_description += f'Previous step: {self.step_info.step_number-1}/{self.step_info.max_steps} \n'
+            for i, result in enumerate(self.result):
+                action = self.actions[i]
+                state_description += f"Previous action {i + 1}/{len(self.result)}: {action.model_dump_json(exclude_unset=True)}\n"
+                if result.error:
+                    # only use last 300 characters of error
+                    error = result.error[-self.max_error_length:]
+                    state_description += (
+                        f"Error of previous action {i + 1}/{len(self.result)}: ...{error}\n"
+                    )
+                if result.include_in_memory:
+                    if result.extracted_content:
+                        state_description += f"Result of previous action {i + 1}/{len(self.result)}: {result.extracted_content}\n"
+
+        if self.state.screenshot and use_vision == True:
+            # Format message for vision model
+            return HumanMessage(
+                content=[
+                    {'type': 'text', 'text': state_description},
+                    {
+                        'type': 'image_url',
+                        'image_url': {'url': f'data:{screenshot_mime_type(self.state.screenshot)};base64,{self.state.screenshot}'},
+                    },
+                ]
+            )
+
+        return HumanMessage(content=state_description)
+
+
 class HashDealsAgentMessagePrompt(AgentMessagePrompt):
     def __init__(
             self,
@@ -224,6 +342,8 @@ class HashDealsAgentMessagePrompt(AgentMessagePrompt):
             include_attributes: list[str] = [],
             max_error_length: int = 400,
             step_info: Optional[CustomAgentStepInfo] = None,
+            element_view: Optional[ElementTreeView] = None,
+            unchanged_screenshot_step: Optional[int] = None,
     ):
         super().__init__(state=state,
                          result=result,
@@ -232,6 +352,8 @@ class HashDealsAgentMessagePrompt(AgentMessagePrompt):
                          step_info=step_info
                          )
         self.actions = actions
+        self.element_view = element_view
+        self.unchanged_screenshot_step = unchanged_screenshot_step
 
     def get_user_message(self, use_vision: bool = True) -> HumanMessage:
         if self.step_info:
@@ -242,26 +364,7 @@ class HashDealsAgentMessagePrompt(AgentMessagePrompt):
         time_str = datetime.now().strftime("%Y-%m-%d %H:%M")
         step_info_description += f"Current date and time: {time_str}"
 
-        elements_text = self.state.element_tree.clickable_elements_to_string(include_attributes=self.include_attributes)
-
-        has_content_above = (self.state.pixels_above or 0) > 0
-        has_content_below = (self.state.pixels_below or 0) > 0
-
-        if elements_text != '':
-            if has_content_above:
-                elements_text = (
-                    f'... {self.state.pixels_above} pixels above - scroll or extract content to see more ...\n{elements_text}'
-                )
-            else:
-                elements_text = f'[Start of page]\n{elements_text}'
-            if has_content_below:
-                elements_text = (
-                    f'{elements_text}\n... {self.state.pixels_below} pixels below - scroll or extract content to see more ...'
-                )
-            else:
-                elements_text = f'{elements_text}\n[End of page]'
-        else:
-            elements_text = 'empty page'
+        elements_text = format_elements_text(self.state, self.include_attributes, self.element_view)
 
         state_description = f"""
 {step_info_description}
@@ -293,6 +396,9 @@ class HashDealsAgentMessagePrompt(AgentMessagePrompt):
 **Be STRATEGIC, VISUALLY-DRIVEN, and DYNAMIC in your approach to maximize deal discovery.**
         """ # Even stronger emphasis on dynamic decision-making and visual cues
 
+        if self.unchanged_screenshot_step is not None:
+            state_description += f"\nScreen unchanged since step {self.unchanged_screenshot_step} - screenshot omitted.\n"
+
         if self.actions and self.result:
             state_description += "\n **Previous Actions & Results** \n"
             state_description += f'Previous step: {self.step_info.step_number-1}/{self.step_info.max_steps} \n'
@@ -316,7 +422,7 @@ class HashDealsAgentMessagePrompt(AgentMessagePrompt):
                     {'type': 'text', 'text': state_description},
                     {
                         'type': 'image_url',
-                        'image_url': {'url': f'data:image/png;base64,{self.state.screenshot}'},
+                        'image_url': {'url': f'data:{screenshot_mime_type(self.state.screenshot)};base64,{self.state.screenshot}'},
                     },
                 ]
             )
@@ -1,8 +1,11 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
-from typing import Type
+from typing import Any, Dict, Iterator, List, Optional, Type
 
-from browser_use.agent.views import AgentOutput
+from browser_use.agent.message_manager.views import ManagedMessage, MessageMetadata
+from browser_use.agent.views import ActionResult, AgentOutput
 from browser_use.controller.registry.views import ActionModel
+from langchain_core.messages import BaseMessage, HumanMessage
 from pydantic import BaseModel, ConfigDict, Field, create_model
 
 
@@ -17,6 +20,12 @@ class CustomAgentStepInfo:
     future_plans: str
 
 
+class DealsActionResult(ActionResult):
+    """Result of a deals action: the deals as text for the model and as records for the runners"""
+
+    structured_content: List[Dict[str, Any]] = Field(default_factory=list)
+
+
 class CustomAgentBrain(BaseModel):
     """Current state of the agent"""
 
@@ -53,3 +62,224 @@ class CustomAgentOutput(AgentOutput):
             ),  # Properly annotated field with no default
             __module__=CustomAgentOutput.__module__,
         )
+
+
+class _FenwickTree:
+    """Prefix sums of a growing list of non-negative values, each operation in O(log n)"""
+
+    def __init__(self, values: Optional[List[int]] = None):
+        self._tree = [0] + list(values or [])
+        n = len(self._tree) - 1
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                self._tree[j] += self._tree[i]
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def append(self, value: int) -> None:
+        i = len(self._tree)
+        self._tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+
+    def add(self, index: int, delta: int) -> None:
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Sum of the first count values"""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def search(self, target: int) -> int:
+        """Smallest index whose prefix sum, itself included, reaches target; len(self) if none"""
+        pos = 0
+        step = 1 << (len(self).bit_length() - 1) if len(self) else 0
+        while step:
+            if pos + step <= len(self) and self._tree[pos + step] < target:
+                pos += step
+                target -= self._tree[pos]
+            step >>= 1
+        return pos
+
+
+class _MessageView(Sequence):
+    """Read access to the history's messages by position, the `messages` list of MessageHistory"""
+
+    def __init__(self, history: "CustomMessageHistory"):
+        self._history = history
+
+    def __len__(self) -> int:
+        return self._history._live.prefix(len(self._history._live))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self._history._slots[self._history._slot_of(index)]
+
+    def __setitem__(self, index: int, managed: ManagedMessage) -> None:
+        self._history._replace(self._history._slot_of(index), managed)
+
+    def __iter__(self) -> Iterator[ManagedMessage]:
+        return (managed for managed in self._history._slots if managed is not None)
+
+    def __reversed__(self) -> Iterator[ManagedMessage]:
+        return (managed for managed in reversed(self._history._slots) if managed is not None)
+
+
+class CustomMessageHistory:
+    """Message history with running token sums and an index of HumanMessage positions
+
+    Drop-in replacement for browser_use's MessageHistory: it exposes the same
+    `messages`, `total_tokens`, `add_message` and `remove_message` surface, so the
+    base MessageManager keeps working on top of it.
+
+    Messages live in slots; a removed message leaves an empty slot behind, so positions
+    of the others need no shifting. Fenwick trees over the slots count tokens, messages
+    and HumanMessages, which makes lookups by position, removals and finding the span
+    trim_to drops O(log n). An insert reuses the empty slot in front of its position if
+    there is one (a replaced message, a summary in place of dropped messages), anything
+    else is an append or rebuilds the slots, as do too many empty slots.
+    """
+
+    def __init__(self):
+        self.messages = _MessageView(self)
+        self.total_tokens: int = 0
+        self._slots: List[Optional[ManagedMessage]] = []
+        self._tokens = _FenwickTree()
+        self._live = _FenwickTree()
+        self._humans = _FenwickTree()
+        # tokens each slot was counted with in _tokens
+        self._slot_tokens: List[int] = []
+        self._slot_of_message: Dict[int, int] = {}
+        self._empty_slots = 0
+
+    def add_message(self, message: BaseMessage, metadata: MessageMetadata, position: Optional[int] = None) -> None:
+        """Add a message with metadata, `position` follows list.insert semantics"""
+        managed = ManagedMessage(message=message, metadata=metadata)
+        n = len(self.messages)
+        if position is None or position >= n:
+            position = n
+        elif position < 0:
+            position = max(n + position, 0)
+
+        slot = self._slot_of(position) if position < n else len(self._slots)
+        if slot > 0 and self._slots[slot - 1] is None:
+            self._fill(slot - 1, managed)
+            self._empty_slots -= 1
+        elif position == n:
+            self._slots.append(None)
+            self._slot_tokens.append(0)
+            for tree in (self._tokens, self._live, self._humans):
+                tree.append(0)
+            self._fill(slot, managed)
+        else:
+            live = list(self.messages)
+            live.insert(position, managed)
+            self._rebuild(live)
+        self.total_tokens += metadata.input_tokens
+
+    def remove_message(self, index: int = -1) -> None:
+        """Remove message at index (last message by default)"""
+        if not len(self.messages):
+            return
+        self._clear(self._slot_of(index))
+        self._compact()
+
+    def remove_human_message(self, remove_ind: int = -1) -> None:
+        """Remove the abs(remove_ind)-th HumanMessage counted from the end of the history"""
+        humans = self.human_message_count()
+        if abs(remove_ind) > humans:
+            return
+        self._clear(self._humans.search(humans - abs(remove_ind) + 1))
+        self._compact()
+
+    def trim_to(self, max_tokens: int, keep: int = 1, keep_last: int = 0) -> int:
+        """Drop the oldest messages after the first `keep` ones until total_tokens <= max_tokens
+
+        The last message to drop is found by a search of the running token sums; the
+        last `keep_last` messages are never dropped. Returns the number of removed messages.
+        """
+        excess = self.total_tokens - max_tokens
+        end = len(self.messages) - keep_last
+        if excess <= 0 or end <= keep:
+            return 0
+
+        first = self._slot_of(keep)
+        last = min(self._tokens.search(self._tokens.prefix(first) + excess), self._slot_of(end - 1))
+        count = 0
+        for slot in range(first, last + 1):
+            if self._slots[slot] is not None:
+                self._clear(slot)
+                count += 1
+        self._compact()
+        return count
+
+    def human_message_count(self) -> int:
+        return self._humans.prefix(len(self._humans))
+
+    def contains(self, message: BaseMessage) -> bool:
+        return id(message) in self._slot_of_message
+
+    def index_of(self, message: BaseMessage) -> int:
+        """Position of message in the history; -1 if absent"""
+        slot = self._slot_of_message.get(id(message))
+        return -1 if slot is None else self._live.prefix(slot)
+
+    def _slot_of(self, index: int) -> int:
+        n = len(self.messages)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("message index out of range")
+        return self._live.search(index + 1)
+
+    def _fill(self, slot: int, managed: ManagedMessage) -> None:
+        tokens = managed.metadata.input_tokens
+        self._slots[slot] = managed
+        self._slot_tokens[slot] = tokens
+        self._slot_of_message[id(managed.message)] = slot
+        self._tokens.add(slot, tokens)
+        self._live.add(slot, 1)
+        if isinstance(managed.message, HumanMessage):
+            self._humans.add(slot, 1)
+
+    def _clear(self, slot: int) -> None:
+        managed = self._slots[slot]
+        self._slots[slot] = None
+        self._slot_of_message.pop(id(managed.message), None)
+        self._tokens.add(slot, -self._slot_tokens[slot])
+        self._slot_tokens[slot] = 0
+        self._live.add(slot, -1)
+        if isinstance(managed.message, HumanMessage):
+            self._humans.add(slot, -1)
+        self.total_tokens -= managed.metadata.input_tokens
+        self._empty_slots += 1
+
+    def _replace(self, slot: int, managed: ManagedMessage) -> None:
+        """Put managed in the place of the slot's message, total_tokens is left to the caller like a list"""
+        old = self._slots[slot]
+        self._slot_of_message.pop(id(old.message), None)
+        self._tokens.add(slot, -self._slot_tokens[slot])
+        self._live.add(slot, -1)
+        if isinstance(old.message, HumanMessage):
+            self._humans.add(slot, -1)
+        self._fill(slot, managed)
+
+    def _compact(self) -> None:
+        if self._empty_slots > max(64, len(self.messages)):
+            self._rebuild(list(self.messages))
+
+    def _rebuild(self, live: List[ManagedMessage]) -> None:
+        self._slots = list(live)
+        self._slot_tokens = [managed.metadata.input_tokens for managed in live]
+        self._slot_of_message = {id(managed.message): slot for slot, managed in enumerate(live)}
+        self._tokens = _FenwickTree(self._slot_tokens)
+        self._live = _FenwickTree([1] * len(live))
+        self._humans = _FenwickTree([int(isinstance(managed.message, HumanMessage)) for managed in live])
+        self._empty_slots = 0
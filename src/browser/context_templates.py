@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from browser_use.browser.browser import BrowserConfig
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+
+logger = logging.getLogger(__name__)
+
+# fills in the template's localStorage of the page origin, keys the site has set itself win
+_LOCAL_STORAGE_SCRIPT = """
+(() => {
+    const origins = %s;
+    const items = origins[window.location.origin];
+    if (!items) return;
+    try {
+        for (const { name, value } of items) {
+            if (window.localStorage.getItem(name) === null) window.localStorage.setItem(name, value);
+        }
+    } catch (e) {}
+})();
+"""
+
+
+class ContextTemplateStore:
+    """
+    Named Playwright storage-state snapshots (cookies and localStorage), saved as JSON files.
+
+    A template is captured once from a logged-in context and applied to any number of new
+    contexts, so authenticated tasks run in parallel in isolated contexts instead of sharing
+    one Chrome user-data-dir.
+
+    Loaded templates are cached with the modification time of their file, so a template
+    recaptured by another process (e.g. the capture command) is read again.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("CONTEXT_TEMPLATE_DIR", "./tmp/context_templates")
+        # name -> (st_mtime_ns of the file, storage state)
+        self._cache: Dict[str, Tuple[int, dict]] = {}
+
+    def _path(self, name: str) -> str:
+        if not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"Invalid context template name: {name}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def list(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[:-len(".json")] for f in os.listdir(self.directory) if f.endswith(".json"))
+
+    def load(self, name: str) -> dict:
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._cache.pop(name, None)
+            raise FileNotFoundError(f"No context template named {name} in {self.directory}") from None
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = self._cache[name] = (mtime, json.load(f))
+        return cached[1]
+
+    def save(self, name: str, storage_state: dict) -> str:
+        path = self._path(name)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(storage_state, f)
+        os.replace(tmp_path, path)
+        self._cache[name] = (os.stat(path).st_mtime_ns, storage_state)
+        logger.info(
+            f"Saved context template {name}: {len(storage_state.get('cookies', []))} cookies, "
+            f"{len(storage_state.get('origins', []))} origins"
+        )
+        return path
+
+    def delete(self, name: str) -> None:
+        self._cache.pop(name, None)
+        path = self._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def capture(self, name: str, context: PlaywrightBrowserContext) -> str:
+        return self.save(name, await context.storage_state())
+
+    async def apply(self, name: str, context: PlaywrightBrowserContext) -> None:
+        """Add the template's cookies to the context and its localStorage to every page opened in it"""
+        storage_state = self.load(name)
+        if storage_state.get("cookies"):
+            await context.add_cookies(storage_state["cookies"])
+        origins = {
+            origin["origin"]: origin.get("localStorage", [])
+            for origin in storage_state.get("origins", [])
+            if origin.get("localStorage")
+        }
+        if origins:
+            await context.add_init_script(_LOCAL_STORAGE_SCRIPT % json.dumps(origins))
+        logger.debug(f"Applied context template {name}")
+
+
+async def _capture_interactively(name: str, url: str, store: ContextTemplateStore) -> None:
+    from .custom_browser import CustomBrowser
+
+    browser = CustomBrowser(config=BrowserConfig(headless=False))
+    browser_context = await browser.new_context()
+    try:
+        page = await browser_context.get_current_page()
+        await page.goto(url)
+        await asyncio.to_thread(input, f"Log in to {url} in the browser window, then press Enter to save '{name}'...")
+        session = await browser_context.get_session()
+        print(await store.capture(name, session.context))
+    finally:
+        await browser_context.close()
+        await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage saved browser context templates")
+    parser.add_argument("--dir", type=str, default=None, help="Template directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    capture_parser = subparsers.add_parser("capture", help="Open a browser, log in, save the state")
+    capture_parser.add_argument("name")
+    capture_parser.add_argument("url")
+    subparsers.add_parser("list", help="List templates")
+    delete_parser = subparsers.add_parser("delete", help="Delete a template")
+    delete_parser.add_argument("name")
+    args = parser.parse_args()
+
+    store = ContextTemplateStore(args.dir)
+    if args.command == "capture":
+        asyncio.run(_capture_interactively(args.name, args.url, store))
+    elif args.command == "list":
+        print("\n".join(store.list()))
+    elif args.command == "delete":
+        store.delete(args.name)
+
+
+if __name__ == '__main__':
+    main()
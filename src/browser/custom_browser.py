@@ -1,5 +1,7 @@
 import asyncio
+import os
 import pdb
+from typing import Dict, List, Optional, Tuple
 
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import (
@@ -9,7 +11,7 @@ from playwright.async_api import (
     Playwright,
     async_playwright,
 )
-from browser_use.browser.browser import Browser
+from browser_use.browser.browser import Browser, BrowserConfig
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
 import logging
@@ -19,9 +21,88 @@ from .custom_context import CustomBrowserContext
 logger = logging.getLogger(__name__)
 
 class CustomBrowser(Browser):
+    """
+    Browser whose contexts can hand cookies of selected domains on to the next context.
+
+    preserve_cookie_domains: cookies of these domains (and their subdomains) are kept when a
+    context closes and added to every new context, everything else starts clean
+    """
+
+    def __init__(
+        self,
+        config: BrowserConfig = BrowserConfig(),
+        preserve_cookie_domains: Optional[List[str]] = None,
+    ):
+        super(CustomBrowser, self).__init__(config=config)
+        self.preserve_cookie_domains = [d.strip().lstrip(".").lower() for d in preserve_cookie_domains or [] if d.strip()]
+        self.preserved_cookies: List[dict] = []
 
     async def new_context(
         self,
         config: BrowserContextConfig = BrowserContextConfig()
     ) -> CustomBrowserContext:
         return CustomBrowserContext(config=config, browser=self)
+
+    def is_preserved_domain(self, cookie_domain: str) -> bool:
+        domain = cookie_domain.lstrip(".").lower()
+        return any(domain == d or domain.endswith("." + d) for d in self.preserve_cookie_domains)
+
+    def preserve_cookies(self, cookies: List[dict]) -> None:
+        """Keep the cookies of the preserved domains for the next context"""
+        self.preserved_cookies = [c for c in cookies if self.is_preserved_domain(c.get("domain", ""))]
+
+
+def preserve_cookie_domains_from_env() -> List[str]:
+    """Domains of the comma separated CHROME_PRESERVE_COOKIE_DOMAINS, empty when it is not set"""
+    return [d.strip() for d in os.getenv("CHROME_PRESERVE_COOKIE_DOMAINS", "").split(",") if d.strip()]
+
+
+# warm browsers kept for the life of the process, see get_warm_browser
+_warm_browsers: Dict[Tuple, CustomBrowser] = {}
+_warm_browsers_lock = asyncio.Lock()
+
+
+async def get_warm_browser(
+    config: BrowserConfig = BrowserConfig(),
+    preserve_cookie_domains: Optional[List[str]] = None,
+    owner: Optional[str] = None,
+) -> CustomBrowser:
+    """
+    Launched browser shared by all tasks with the same browser settings.
+    Every task opens its own CustomBrowserContext on it and closes it afterwards, so tasks
+    start without a browser launch and without the state of the previous task.
+
+    Preserved cookies are the state of whoever logged in, so a browser preserving cookies is
+    only shared by the tasks of its owner (e.g. a UI session); close it with close_warm_browsers.
+    """
+    preserve_cookie_domains = [d for d in preserve_cookie_domains or [] if d.strip()]
+    key = (
+        owner if preserve_cookie_domains else None,
+        config.headless,
+        config.disable_security,
+        config.chrome_instance_path,
+        config.cdp_url,
+        config.wss_url,
+        tuple(config.extra_chromium_args),
+        tuple(preserve_cookie_domains),
+    )
+    async with _warm_browsers_lock:
+        browser = _warm_browsers.get(key)
+        if browser is not None and browser.playwright_browser is not None and not browser.playwright_browser.is_connected():
+            logger.info("Warm browser disconnected, launching a new one")
+            await browser.close()
+            browser = None
+        if browser is None:
+            browser = CustomBrowser(config=config, preserve_cookie_domains=preserve_cookie_domains)
+            await browser.get_playwright_browser()
+            _warm_browsers[key] = browser
+        return browser
+
+
+async def close_warm_browsers(owner: Optional[str] = None) -> None:
+    """Close all warm browsers, or only the cookie preserving ones of owner"""
+    async with _warm_browsers_lock:
+        keys = [key for key in _warm_browsers if owner is None or key[0] == owner]
+        browsers = [_warm_browsers.pop(key) for key in keys]
+    for browser in browsers:
+        await browser.close()
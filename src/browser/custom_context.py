@@ -1,19 +1,219 @@
+import asyncio
 import json
 import logging
 import os
+from dataclasses import dataclass, fields, replace
 
 from browser_use.browser.browser import Browser
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.views import BrowserState
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+from playwright.async_api import Page
+
+from ..utils.artifact_index import artifact_index
+from .context_templates import ContextTemplateStore
+from .page_activity import PageActivityTracker
+from .recorder import CappedVideoBrowser, FailureRecorder, RecordingConfig
+from .response_capture import ResponseCapture, ResponseCaptureConfig
+
+from ..utils.screenshot import ScreenshotConfig, element_region, encode_screenshot
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class CustomBrowserState(BrowserState):
+    """BrowserState with the perceptual hash of its screenshot"""
+
+    screenshot_hash: int | None = None
+
+
+@dataclass
+class CustomBrowserContextConfig(BrowserContextConfig):
+    """
+    BrowserContextConfig with the screenshot pipeline settings used for LLM state screenshots.
+
+    screenshot_config: None keeps the full-resolution PNG screenshot from browser_use
+    hash_screenshots: hash screenshots also without a screenshot_config (skip_unchanged_screenshots of CustomAgent)
+    context_template: name of a saved storage state (see ContextTemplateStore) the context starts from
+    run_id: id the recordings and trace of this context are indexed under (defaults to the context id)
+    recording_config: None keeps the full-size video of save_recording_path and the full trace
+    response_capture: which JSON API responses to record (see ResponseCapture), None records none
+    """
+
+    screenshot_config: ScreenshotConfig | None = None
+    hash_screenshots: bool = False
+    context_template: str | None = None
+    run_id: str | None = None
+    recording_config: RecordingConfig | None = None
+    response_capture: ResponseCaptureConfig | None = None
+
+
+# shared so templates are read from disk once per process
+context_templates = ContextTemplateStore()
+
+
 class CustomBrowserContext(BrowserContext):
     def __init__(
         self,
         browser: "Browser",
         config: BrowserContextConfig = BrowserContextConfig()
     ):
+        recording_config = getattr(config, "recording_config", None)
+        self.recording_dir = config.save_recording_path
+        if recording_config is not None:
+            self.recording_dir = recording_config.output_dir or config.save_recording_path
+            # Playwright only records video in "always" mode, the other modes use the screencast recorder
+            save_recording_path = self.recording_dir if recording_config.mode == "always" else None
+            config = replace(config, save_recording_path=save_recording_path)
         super(CustomBrowserContext, self).__init__(browser=browser, config=config)
+        # per-step screenshot sizes, reported in the logs and available to callers
+        self.screenshot_stats: list[dict] = []
+        self.page_tracker = PageActivityTracker()
+        self.recorder: FailureRecorder | None = None
+        response_capture_config = getattr(config, "response_capture", None)
+        self.response_capture = ResponseCapture(response_capture_config) if response_capture_config else None
+
+    @property
+    def recording_config(self) -> RecordingConfig | None:
+        return getattr(self.config, "recording_config", None)
+
+    async def _create_context(self, browser: PlaywrightBrowser):
+        recording_config = self.recording_config
+        if recording_config is None:
+            return await super()._create_context(browser)
+        if self.config.save_recording_path:
+            browser = CappedVideoBrowser(browser, recording_config.video_size(self.config.browser_window_size))
+        # the base class traces everything, start the trace with the configured parts instead
+        trace_path = self.config.trace_path
+        self.config.trace_path = None
+        try:
+            context = await super()._create_context(browser)
+        finally:
+            self.config.trace_path = trace_path
+        if trace_path:
+            await context.tracing.start(
+                screenshots=recording_config.trace_screenshots,
+                snapshots=recording_config.trace_snapshots,
+                sources=recording_config.trace_sources,
+            )
+        return context
+
+    async def _initialize_session(self):
+        session = await super()._initialize_session()
+        await self.page_tracker.attach(session.context)
+        self.page_tracker.touch(session.current_page)
+        if self.response_capture is not None:
+            await self.response_capture.attach(session.context)
+        context_template = getattr(self.config, "context_template", None)
+        if context_template:
+            await context_templates.apply(context_template, session.context)
+        preserved_cookies = getattr(self.browser, "preserved_cookies", None)
+        if preserved_cookies:
+            await session.context.add_cookies(preserved_cookies)
+            logger.debug(f"Restored {len(preserved_cookies)} preserved cookies")
+        recording_config = self.recording_config
+        if recording_config is not None and recording_config.mode == "on_failure" and self.recording_dir:
+            self.recorder = FailureRecorder(recording_config, self.recording_dir, self.run_id)
+            await self.recorder.attach(session.current_page)
+            self.page_tracker.add_listener(self.recorder.follow)
+        return session
+
+    def mark_failed(self) -> None:
+        """Keep the on-failure recording of this context when it is closed"""
+        if self.recorder is not None:
+            self.recorder.mark_failed()
+
+    @property
+    def active_page(self) -> Page | None:
+        """The page the agent works on, or the most recently active open page once it is closed"""
+        if self.session is not None and not self.session.current_page.is_closed():
+            return self.session.current_page
+        return self.page_tracker.current_page
+
+    async def get_current_page(self) -> Page:
+        session = await self.get_session()
+        if session.current_page.is_closed() and self.page_tracker.current_page is not None:
+            session.current_page = self.page_tracker.current_page
+        return session.current_page
+
+    async def switch_to_tab(self, page_id: int) -> None:
+        await super().switch_to_tab(page_id)
+        self.page_tracker.touch(self.session.current_page)
+
+    async def create_new_tab(self, url: str | None = None) -> None:
+        await super().create_new_tab(url)
+        self.page_tracker.touch(self.session.current_page)
+
+    @property
+    def run_id(self) -> str:
+        return getattr(self.config, "run_id", None) or self.context_id
+
+    async def close(self):
+        artifacts = []
+        if self.session is not None:
+            if getattr(self.browser, "preserve_cookie_domains", None):
+                try:
+                    self.browser.preserve_cookies(await self.session.context.cookies())
+                except Exception as e:
+                    logger.debug(f"Failed to preserve cookies: {e}")
+            if self.config.save_recording_path:
+                for page in self.session.context.pages:
+                    if page.video:
+                        try:
+                            artifacts.append(await page.video.path())
+                        except Exception as e:
+                            logger.debug(f"Failed to get recording path: {e}")
+            if self.config.trace_path:
+                artifacts.append(os.path.join(self.config.trace_path, f"{self.context_id}.zip"))
+        if self.recorder is not None:
+            try:
+                recording = await self.recorder.save()
+            except Exception as e:
+                recording = None
+                logger.warning(f"Failed to save the failure recording: {e}")
+            if recording:
+                artifacts.append(recording)
+            self.recorder = None
+        await super().close()
+        self.page_tracker.clear()
+        # recordings and traces are complete once the context is closed
+        for path in artifacts:
+            artifact_index.register(str(path), run_id=self.run_id)
+
+    async def get_state(self) -> CustomBrowserState:
+        """Get the current browser state, with the screenshot hashed and re-encoded per screenshot_config"""
+        base_state = await super().get_state()
+        state = CustomBrowserState(**{f.name: getattr(base_state, f.name) for f in fields(base_state)})
+        if self.session is not None:
+            self.session.cached_state = state
+        screenshot_config = getattr(self.config, "screenshot_config", None)
+        if not state.screenshot or (screenshot_config is None and not getattr(self.config, "hash_screenshots", False)):
+            # nothing to re-encode and nobody compares screenshots, the PNG is not even decoded
+            return state
+
+        screenshot_config = screenshot_config or ScreenshotConfig()
+        region = element_region(state, screenshot_config.crop_margin) if screenshot_config.crop_to_elements else None
+        viewport_width = self.config.browser_window_size.get("width") if self.config.browser_window_size else None
+        try:
+            # decoding, hashing and re-encoding are CPU bound, keep them off the event loop
+            encoded = await asyncio.to_thread(
+                encode_screenshot, state.screenshot, screenshot_config, region, viewport_width
+            )
+        except Exception as e:
+            logger.warning(f"Failed to process screenshot, sending the original: {e}")
+            return state
+        state.screenshot_hash = encoded.dhash
+        if not screenshot_config.is_passthrough:
+            state.screenshot = encoded.data
+            self.screenshot_stats.append({
+                "original_bytes": encoded.original_bytes,
+                "encoded_bytes": encoded.encoded_bytes,
+                "mime_type": encoded.mime_type,
+            })
+            logger.info(
+                f"📸 Screenshot {encoded.mime_type}: {encoded.original_bytes / 1024:.1f} KB -> "
+                f"{encoded.encoded_bytes / 1024:.1f} KB"
+            )
+        return state
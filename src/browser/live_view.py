@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from playwright.async_api import CDPSession, Page
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LiveViewMetrics:
+    frames_received: int = 0
+    frames_delivered: int = 0
+    frames_dropped: int = 0
+    fps: float = 0.0
+    latency_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ScreencastStream:
+    """
+    One CDP `Page.startScreencast` stream of a page, fanned out to any number of viewers.
+
+    Chrome only sends the next frame once the previous one is acked, so the ack is held
+    back until 1 / max_fps has passed: the renderer never produces more frames than the
+    viewers are shown. Every viewer gets a queue of size one; a viewer that has not read
+    its previous frame gets it replaced by the newest one (the old frame is dropped).
+    """
+
+    def __init__(
+            self,
+            page: Page,
+            max_fps: float = 5.0,
+            quality: int = 60,
+            max_width: Optional[int] = None,
+            max_height: Optional[int] = None,
+    ):
+        self.page = page
+        self.max_fps = max_fps
+        self.quality = quality
+        self.max_width = max_width
+        self.max_height = max_height
+        self.latest_frame: Optional[str] = None
+        self.metrics = LiveViewMetrics()
+        self._cdp: Optional[CDPSession] = None
+        self._viewers: List[asyncio.Queue] = []
+        self._listeners: List[Callable[[str, float], None]] = []
+        self._last_frame_at = 0.0
+        self._ack_tasks: set = set()
+        # last time a viewer polled or subscribed, see LiveViewHub.release_idle
+        self.last_read_at = time.time()
+
+    @property
+    def is_running(self) -> bool:
+        return self._cdp is not None
+
+    async def start(self) -> None:
+        if self._cdp is not None:
+            return
+        self._cdp = await self.page.context.new_cdp_session(self.page)
+        self._cdp.on("Page.screencastFrame", self._on_frame)
+        params = {"format": "jpeg", "quality": self.quality, "everyNthFrame": 1}
+        if self.max_width:
+            params["maxWidth"] = self.max_width
+        if self.max_height:
+            params["maxHeight"] = self.max_height
+        await self._cdp.send("Page.startScreencast", params)
+        logger.debug(f"Started screencast for {self.page.url}")
+
+    async def stop(self) -> None:
+        if self._cdp is None:
+            return
+        cdp, self._cdp = self._cdp, None
+        for task in list(self._ack_tasks):
+            task.cancel()
+        try:
+            await cdp.send("Page.stopScreencast")
+            await cdp.detach()
+        except Exception as e:
+            # the page may already be closed
+            logger.debug(f"Failed to stop screencast: {e}")
+
+    def subscribe(self) -> asyncio.Queue:
+        self.last_read_at = time.time()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.latest_frame is not None:
+            queue.put_nowait(self.latest_frame)
+        self._viewers.append(queue)
+        return queue
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        """Call listener(frame, timestamp) for every frame, for consumers that keep all frames"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._viewers:
+            self._viewers.remove(queue)
+
+    @property
+    def viewer_count(self) -> int:
+        return len(self._viewers)
+
+    def _on_frame(self, params: dict) -> None:
+        now = time.time()
+        self.metrics.frames_received += 1
+        frame_timestamp = params.get("metadata", {}).get("timestamp")
+        if frame_timestamp:
+            self.metrics.latency_ms = max((now - frame_timestamp) * 1000, 0.0)
+        if self._last_frame_at:
+            interval = now - self._last_frame_at
+            if interval > 0:
+                # exponential moving average of the delivered frame rate
+                self.metrics.fps = 0.8 * self.metrics.fps + 0.2 * (1 / interval)
+        self._last_frame_at = now
+
+        self.latest_frame = params["data"]
+        for queue in self._viewers:
+            if queue.full():
+                queue.get_nowait()
+                self.metrics.frames_dropped += 1
+            queue.put_nowait(self.latest_frame)
+            self.metrics.frames_delivered += 1
+        for listener in self._listeners:
+            listener(self.latest_frame, now)
+
+        task = asyncio.create_task(self._ack(params["sessionId"]))
+        self._ack_tasks.add(task)
+        task.add_done_callback(self._ack_tasks.discard)
+
+    async def _ack(self, session_id: int) -> None:
+        # holding the ack back is what throttles the renderer to max_fps
+        await asyncio.sleep(1 / self.max_fps if self.max_fps else 0)
+        if self._cdp is None:
+            return
+        try:
+            await self._cdp.send("Page.screencastFrameAck", {"sessionId": session_id})
+        except Exception as e:
+            logger.debug(f"Failed to ack screencast frame: {e}")
+
+
+class LiveViewHub:
+    """Screencast streams shared by all viewers, one per page that is being watched"""
+
+    def __init__(self, max_fps: float = 5.0, quality: int = 60, max_width: Optional[int] = None):
+        self.max_fps = max_fps
+        self.quality = quality
+        self.max_width = max_width
+        self._streams: Dict[int, ScreencastStream] = {}
+
+    async def stream_for_page(self, page: Page) -> ScreencastStream:
+        key = id(page)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = ScreencastStream(page, max_fps=self.max_fps, quality=self.quality, max_width=self.max_width)
+            self._streams[key] = stream
+            page.once("close", lambda _: self._streams.pop(key, None))
+        if not stream.is_running:
+            await stream.start()
+        return stream
+
+    async def latest_frame(self, page: Page) -> Optional[str]:
+        """Latest base64 JPEG frame of the page, starting its screencast on first use"""
+        try:
+            stream = await self.stream_for_page(page)
+        except Exception as e:
+            logger.debug(f"Failed to start screencast: {e}")
+            return None
+        stream.last_read_at = time.time()
+        return stream.latest_frame
+
+    def metrics(self) -> Dict[str, dict]:
+        return {stream.page.url: stream.metrics.to_dict() for stream in self._streams.values()}
+
+    async def release_idle(self, max_idle: float = 10.0) -> None:
+        """Stop streams without subscribers that nobody polled for max_idle seconds"""
+        now = time.time()
+        for key, stream in list(self._streams.items()):
+            if stream.viewer_count or now - stream.last_read_at < max_idle:
+                continue
+            await stream.stop()
+            self._streams.pop(key, None)
+
+    async def release_pages(self, pages: Iterable[Page]) -> None:
+        """Stop the streams of pages, watched or not, before their context is closed"""
+        for page in pages:
+            stream = self._streams.pop(id(page), None)
+            if stream is not None:
+                await stream.stop()
+
+    async def close(self) -> None:
+        for stream in list(self._streams.values()):
+            await stream.stop()
+        self._streams.clear()
+
+
+# shared by the web UI, so every viewer of a page reads the same screencast
+live_view_hub = LiveViewHub()
@@ -0,0 +1,93 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+from playwright.async_api import Frame, Page
+
+logger = logging.getLogger(__name__)
+
+# called from the page when its window gains focus
+_FOCUS_BINDING = "__webUiPageFocused"
+_FOCUS_SCRIPT = f"""
+window.addEventListener('focus', () => {{
+    if (window.{_FOCUS_BINDING}) window.{_FOCUS_BINDING}();
+}});
+"""
+
+
+class PageActivityTracker:
+    """
+    Open pages of a Playwright context, ordered by their last activity.
+
+    A page becomes active when it opens, navigates its main frame, gains window focus
+    or is switched to by the agent; closing it hands the activity back to the page that
+    was active before. The most recently active page is read in O(1), without scanning
+    the pages of the context.
+    """
+
+    def __init__(self):
+        self._pages: "OrderedDict[int, Page]" = OrderedDict()
+        self._listeners: List[Callable[[Optional[Page]], None]] = []
+
+    def add_listener(self, listener: Callable[[Optional[Page]], None]) -> None:
+        """Call listener(page) whenever the most recently active page changes"""
+        self._listeners.append(listener)
+
+    def _notify(self, previous: Optional[Page]) -> None:
+        current = self.current_page
+        if current is not previous:
+            for listener in self._listeners:
+                listener(current)
+
+    async def attach(self, context: PlaywrightBrowserContext) -> None:
+        context.on("page", self.track)
+        for page in context.pages:
+            self.track(page)
+        try:
+            await context.expose_binding(_FOCUS_BINDING, lambda source: self.touch(source["page"]))
+            await context.add_init_script(_FOCUS_SCRIPT)
+        except Exception as e:
+            # a context that is reused over CDP may already have the binding
+            logger.debug(f"Page focus tracking unavailable: {e}")
+
+    def track(self, page: Page) -> None:
+        if id(page) in self._pages:
+            return
+        page.on("close", self._on_close)
+        page.on("framenavigated", lambda frame: self._on_navigated(page, frame))
+        self.touch(page)
+
+    def touch(self, page: Page) -> None:
+        """Mark the page as the most recently active one"""
+        if page.is_closed():
+            return
+        previous = self.current_page
+        key = id(page)
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        self._notify(previous)
+
+    @property
+    def current_page(self) -> Optional[Page]:
+        if not self._pages:
+            return None
+        return next(reversed(self._pages.values()))
+
+    @property
+    def pages(self) -> List[Page]:
+        """Open pages, least recently active first"""
+        return list(self._pages.values())
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+    def _on_close(self, page: Page) -> None:
+        previous = self.current_page
+        self._pages.pop(id(page), None)
+        self._notify(previous)
+        logger.debug(f"Page closed: {page.url}")
+
+    def _on_navigated(self, page: Page, frame: Frame) -> None:
+        if frame is page.main_frame:
+            self.touch(page)
@@ -0,0 +1,171 @@
+import asyncio
+import base64
+import io
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from PIL import Image
+from playwright.async_api import Browser as PlaywrightBrowser
+from playwright.async_api import Page
+
+from .live_view import ScreencastStream
+
+logger = logging.getLogger(__name__)
+
+RECORDING_MODES = ("off", "always", "on_failure")
+
+
+@dataclass
+class RecordingConfig:
+    """
+    How runs are recorded; replaces the full-size video of every context.
+
+    mode: off | always (Playwright video, downscaled to max_width x max_height) |
+        on_failure (capped screencast of the last buffer_seconds, saved only when the run failed)
+    fps / quality: screencast caps of on_failure mode; Playwright video has a fixed frame rate
+    output_dir: where recordings are written (defaults to the context's save_recording_path)
+    trace_screenshots / trace_snapshots / trace_sources: what a Playwright trace captures when
+    trace_path is set
+    """
+
+    mode: str = "always"
+    max_width: int = 960
+    max_height: int = 720
+    fps: float = 3.0
+    quality: int = 50
+    buffer_seconds: float = 20.0
+    output_dir: Optional[str] = None
+    trace_screenshots: bool = True
+    trace_snapshots: bool = False
+    trace_sources: bool = False
+
+    def video_size(self, window_size: Optional[Dict[str, int]]) -> Dict[str, int]:
+        """Window size scaled down to fit max_width x max_height, keeping the aspect ratio"""
+        width, height = (window_size or {}).get("width", 1280), (window_size or {}).get("height", 1100)
+        scale = min(self.max_width / width, self.max_height / height, 1.0)
+        # video encoders want even dimensions
+        return {"width": int(width * scale) // 2 * 2, "height": int(height * scale) // 2 * 2}
+
+
+def recording_config_from_env() -> Optional[RecordingConfig]:
+    """RecordingConfig from the RECORDING_* variables, None when RECORDING_MODE is not set"""
+    mode = os.getenv("RECORDING_MODE", "")
+    if not mode:
+        return None
+    if mode not in RECORDING_MODES:
+        raise ValueError(f"Invalid RECORDING_MODE {mode!r}, expected one of {', '.join(RECORDING_MODES)}")
+    defaults = RecordingConfig()
+    trace = {part.strip() for part in os.getenv("RECORDING_TRACE", "screenshots").split(",")}
+    return RecordingConfig(
+        mode=mode,
+        max_width=int(os.getenv("RECORDING_MAX_WIDTH", defaults.max_width)),
+        max_height=int(os.getenv("RECORDING_MAX_HEIGHT", defaults.max_height)),
+        fps=float(os.getenv("RECORDING_FPS", defaults.fps)),
+        buffer_seconds=float(os.getenv("RECORDING_BUFFER_SECONDS", defaults.buffer_seconds)),
+        trace_screenshots="screenshots" in trace,
+        trace_snapshots="snapshots" in trace,
+        trace_sources="sources" in trace,
+    )
+
+
+class CappedVideoBrowser:
+    """Playwright browser proxy whose new contexts record video at a capped size"""
+
+    def __init__(self, browser: PlaywrightBrowser, video_size: Dict[str, int]):
+        self._browser = browser
+        self._video_size = video_size
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+    async def new_context(self, **kwargs):
+        if kwargs.get("record_video_dir"):
+            kwargs["record_video_size"] = self._video_size
+        return await self._browser.new_context(**kwargs)
+
+
+class FailureRecorder:
+    """
+    Ring buffer of the last buffer_seconds of the active page, written out as an animated
+    WebP only when mark_failed() was called before save().
+
+    Frames come from a CDP screencast capped at fps and max size, and are kept JPEG encoded,
+    so a run that succeeds costs a few small frames per second and no disk I/O.
+    """
+
+    def __init__(self, config: RecordingConfig, output_dir: str, name: str):
+        self.config = config
+        self.output_dir = output_dir
+        self.name = name
+        self.failed = False
+        self._stream: Optional[ScreencastStream] = None
+        self._frames: Deque[Tuple[float, str]] = deque(maxlen=max(int(config.buffer_seconds * config.fps), 1))
+        self._switch_task: Optional[asyncio.Task] = None
+
+    async def attach(self, page: Optional[Page]) -> None:
+        """Record page from now on, instead of the previously recorded page"""
+        if self._stream is not None and self._stream.page is page:
+            return
+        await self._detach()
+        if page is None or page.is_closed():
+            return
+        stream = ScreencastStream(
+            page,
+            max_fps=self.config.fps,
+            quality=self.config.quality,
+            max_width=self.config.max_width,
+            max_height=self.config.max_height,
+        )
+        stream.add_listener(lambda frame, timestamp: self._frames.append((timestamp, frame)))
+        try:
+            await stream.start()
+        except Exception as e:
+            logger.debug(f"Failed to start recording of {page.url}: {e}")
+            return
+        self._stream = stream
+
+    def follow(self, page: Optional[Page]) -> None:
+        """Active-page listener, see PageActivityTracker.add_listener"""
+        if page is not None:
+            self._switch_task = asyncio.create_task(self.attach(page))
+
+    def mark_failed(self) -> None:
+        self.failed = True
+
+    async def _detach(self) -> None:
+        if self._stream is not None:
+            stream, self._stream = self._stream, None
+            await stream.stop()
+
+    async def save(self) -> Optional[str]:
+        """Stop recording; write the buffered frames if the run failed and return their path"""
+        if self._switch_task is not None:
+            self._switch_task.cancel()
+        await self._detach()
+        frames, self._frames = list(self._frames), deque(maxlen=self._frames.maxlen)
+        if not self.failed or not frames:
+            return None
+        path = os.path.join(self.output_dir, f"{self.name}.webp")
+        await asyncio.to_thread(self._write_webp, frames, path)
+        logger.info(f"🎞️ Saved the last {len(frames)} frames before the failure to {path}")
+        return path
+
+    def _write_webp(self, frames: list, path: str) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        # every frame is shown until the next one arrived
+        durations = [
+            max(int((frames[i + 1][0] - frames[i][0]) * 1000), 1) for i in range(len(frames) - 1)
+        ] + [int(1000 / self.config.fps)]
+        images = [Image.open(io.BytesIO(base64.b64decode(frame))).convert("RGB") for _, frame in frames]
+        images[0].save(
+            path,
+            format="WEBP",
+            save_all=True,
+            append_images=images[1:],
+            duration=durations,
+            quality=self.config.quality,
+            loop=0,
+        )
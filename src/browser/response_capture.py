@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, List, Optional, Set
+
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
+from playwright.async_api import Page, Response
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL_PATTERNS = (r"deal", r"special", r"promo", r"discount", r"product", r"menu", r"graphql", r"/api/")
+# a JSON key naming a price or discount, e.g. "price", "specialPrice", "discount_percent"
+DEFAULT_CONTENT_PATTERNS = (r'"[A-Za-z_]*(?:[Pp]rice|[Ss]pecial|[Dd]iscount)[A-Za-z_]*"\s*:',)
+
+
+@dataclass
+class ResponseCaptureConfig:
+    """
+    Which responses ResponseCapture keeps: JSON XHR/fetch responses whose URL matches one of
+    url_patterns and whose body matches one of content_patterns (regexes, any pattern list
+    left empty matches everything), of at most max_bytes, the latest max_responses of them.
+    """
+
+    url_patterns: List[str] = field(default_factory=lambda: list(DEFAULT_URL_PATTERNS))
+    content_patterns: List[str] = field(default_factory=lambda: list(DEFAULT_CONTENT_PATTERNS))
+    max_bytes: int = 2 * 1024 * 1024
+    max_responses: int = 200
+
+
+def response_capture_config_from_env() -> Optional[ResponseCaptureConfig]:
+    """ResponseCaptureConfig from the RESPONSE_CAPTURE* variables, None when RESPONSE_CAPTURE=false"""
+    if os.getenv("RESPONSE_CAPTURE", "true").lower() != "true":
+        return None
+    config = ResponseCaptureConfig()
+    if os.getenv("RESPONSE_CAPTURE_URL_PATTERNS"):
+        config.url_patterns = [p.strip() for p in os.getenv("RESPONSE_CAPTURE_URL_PATTERNS").split(",") if p.strip()]
+    if os.getenv("RESPONSE_CAPTURE_MAX_BYTES"):
+        config.max_bytes = int(os.getenv("RESPONSE_CAPTURE_MAX_BYTES"))
+    return config
+
+
+@dataclass
+class CapturedResponse:
+    url: str
+    status: int
+    data: Any
+    page: Optional[Page] = None
+    captured_at: float = 0.0
+
+
+class ResponseCapture:
+    """
+    Records the JSON API responses of every page of a browser context while it navigates,
+    so single-page apps' data can be read directly instead of scraped from the rendered DOM.
+    """
+
+    def __init__(self, config: Optional[ResponseCaptureConfig] = None):
+        self.config = config or ResponseCaptureConfig()
+        self._url_res = [re.compile(p, re.IGNORECASE) for p in self.config.url_patterns]
+        self._content_res = [re.compile(p) for p in self.config.content_patterns]
+        self._responses: Deque[CapturedResponse] = deque(maxlen=self.config.max_responses)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def attach(self, context: PlaywrightBrowserContext) -> None:
+        context.on("response", self._on_response)
+
+    def _wanted(self, response: Response) -> bool:
+        if response.request.resource_type not in ("xhr", "fetch") or not 200 <= response.status < 300:
+            return False
+        if "json" not in response.headers.get("content-type", ""):
+            return False
+        length = response.headers.get("content-length")
+        if length and length.isdigit() and int(length) > self.config.max_bytes:
+            return False
+        return not self._url_res or any(p.search(response.url) for p in self._url_res)
+
+    def _on_response(self, response: Response) -> None:
+        if not self._wanted(response):
+            return
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _read(self, response: Response) -> None:
+        try:
+            text = await response.text()
+        except Exception as e:
+            # the page navigated away before the body was read
+            logger.debug(f"Failed to read response of {response.url}: {e}")
+            return
+        if len(text) > self.config.max_bytes:
+            return
+        if self._content_res and not any(p.search(text) for p in self._content_res):
+            return
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+        try:
+            page = response.frame.page
+        except Exception:
+            page = None
+        self._responses.append(CapturedResponse(response.url, response.status, data, page, time.time()))
+        logger.debug(f"Captured API response {response.url}")
+
+    async def flush(self) -> None:
+        """Wait until the bodies of the responses received so far are read"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def responses(self, page: Optional[Page] = None) -> List[CapturedResponse]:
+        """Captured responses, oldest first, of one page or of all pages"""
+        return [r for r in self._responses if page is None or r.page is page]
+
+    def take(self, page: Optional[Page] = None) -> List[CapturedResponse]:
+        """Captured responses of one page or of all pages, removed from the capture"""
+        taken = self.responses(page)
+        if taken:
+            taken_ids = {id(r) for r in taken}
+            self._responses = deque((r for r in self._responses if id(r) not in taken_ids), maxlen=self.config.max_responses)
+        return taken
+
+    def clear(self) -> None:
+        self._responses.clear()
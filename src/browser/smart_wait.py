@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from playwright.async_api import Frame, Locator, Page, Request
+
+logger = logging.getLogger(__name__)
+
+# requests that never finish or do not affect what the page shows
+_BACKGROUND_RESOURCE_TYPES = {"websocket", "eventsource", "media", "ping"}
+
+# resolves true once the DOM had no mutations for quietMs, false after timeoutMs
+_DOM_STABLE_JS = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    let quiet, limit;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quiet);
+        quiet = setTimeout(() => done(true), quietMs);
+    });
+    const done = (stable) => {
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(limit);
+        resolve(stable);
+    };
+    observer.observe(document.documentElement || document, { childList: true, subtree: true, characterData: true });
+    quiet = setTimeout(() => done(true), quietMs);
+    limit = setTimeout(() => done(false), timeoutMs);
+})
+"""
+
+
+@dataclass
+class _Estimate:
+    mean: float
+    deviation: float
+
+
+class AdaptiveTimeouts:
+    """
+    Timeouts learned per domain and kind of wait, like a TCP retransmission timeout: the
+    smoothed duration of past waits plus four times their smoothed deviation, within
+    [min_ms, max_ms]. Unknown domains get default_ms; a wait that timed out doubles the
+    estimate, so slow sites get more time on the next wait.
+    """
+
+    def __init__(self, default_ms: int = 10000, min_ms: int = 1000, max_ms: int = 30000,
+                 alpha: float = 0.125, beta: float = 0.25):
+        self.default_ms = default_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.alpha = alpha
+        self.beta = beta
+        self._estimates: Dict[Tuple[str, str], _Estimate] = {}
+
+    def timeout(self, domain: str, kind: str) -> int:
+        estimate = self._estimates.get((domain, kind))
+        if estimate is None:
+            return self.default_ms
+        return int(min(max(estimate.mean + 4 * estimate.deviation, self.min_ms), self.max_ms))
+
+    def observe(self, domain: str, kind: str, elapsed_ms: float, timed_out: bool = False) -> None:
+        key = (domain, kind)
+        estimate = self._estimates.get(key)
+        if timed_out:
+            # the real duration is unknown, only that it is longer than this timeout
+            backoff = min(max(self.timeout(domain, kind), elapsed_ms) * 2, self.max_ms)
+            self._estimates[key] = _Estimate(backoff / 2, backoff / 8)
+        elif estimate is None:
+            self._estimates[key] = _Estimate(elapsed_ms, elapsed_ms / 2)
+        else:
+            estimate.deviation = (1 - self.beta) * estimate.deviation + self.beta * abs(estimate.mean - elapsed_ms)
+            estimate.mean = (1 - self.alpha) * estimate.mean + self.alpha * elapsed_ms
+
+
+def _domain(page: Page) -> str:
+    return (urlparse(page.url).hostname or "").lower()
+
+
+class SmartWait:
+    """
+    Waits of the controller actions that end as soon as the page is ready instead of after a
+    fixed timeout: the DOM being quiet (no mutations for quiet_ms), the network being idle (no
+    request for idle_ms, long polling and streams ignored) or an element appearing. Timeouts
+    adapt per domain, see AdaptiveTimeouts; waiting for a loaded page to go quiet is capped at
+    max_quiet_ms.
+    """
+
+    def __init__(self, timeouts: Optional[AdaptiveTimeouts] = None, quiet_ms: int = 300, idle_ms: int = 300,
+                 long_request_ms: int = 5000, max_quiet_ms: int = 5000):
+        self.timeouts = timeouts or AdaptiveTimeouts()
+        self.max_quiet_ms = max_quiet_ms
+        self.quiet_ms = quiet_ms
+        self.idle_ms = idle_ms
+        self.long_request_ms = long_request_ms
+
+    def timeout(self, page: Page, kind: str) -> int:
+        return self.timeouts.timeout(_domain(page), kind)
+
+    async def dom_stable(self, page: Union[Page, Frame], timeout: int, quiet_ms: Optional[int] = None) -> bool:
+        """Whether the DOM stopped changing within timeout ms"""
+        try:
+            return bool(await page.evaluate(_DOM_STABLE_JS, [quiet_ms or self.quiet_ms, timeout]))
+        except Exception as e:
+            # the page navigated, its new document is loading
+            logger.debug(f"DOM stability check interrupted: {e}")
+            return False
+
+    async def network_idle(self, page: Page, timeout: int, idle_ms: Optional[int] = None) -> bool:
+        """Whether no request was in flight for idle_ms within timeout ms, from now on"""
+        idle_s = (idle_ms or self.idle_ms) / 1000
+        loop = asyncio.get_running_loop()
+        in_flight: Dict[Request, float] = {}
+        last_activity = loop.time()
+
+        def on_request(request: Request) -> None:
+            nonlocal last_activity
+            if request.resource_type not in _BACKGROUND_RESOURCE_TYPES:
+                in_flight[request] = loop.time()
+                last_activity = loop.time()
+
+        def on_done(request: Request) -> None:
+            nonlocal last_activity
+            if in_flight.pop(request, None) is not None:
+                last_activity = loop.time()
+
+        page.on("request", on_request)
+        page.on("requestfinished", on_done)
+        page.on("requestfailed", on_done)
+        try:
+            deadline = loop.time() + timeout / 1000
+            while loop.time() < deadline:
+                now = loop.time()
+                pending = [r for r, started in in_flight.items() if now - started < self.long_request_ms / 1000]
+                if not pending and now - last_activity >= idle_s:
+                    return True
+                await asyncio.sleep(0.05)
+            return False
+        finally:
+            page.remove_listener("request", on_request)
+            page.remove_listener("requestfinished", on_done)
+            page.remove_listener("requestfailed", on_done)
+
+    async def settle(self, page: Page, network: bool = True) -> bool:
+        """
+        Wait until the page loaded its document and then its DOM or its network went quiet, after
+        a navigation or a click. Returns False when the document did not load within the adaptive
+        timeout, or when the page kept changing for max_quiet_ms (carousels, tickers, polling).
+        """
+        domain = _domain(page)
+        timeout = self.timeouts.timeout(domain, "settle")
+        started = time.monotonic()
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Waiting for {page.url} to load failed: {e}")
+            self.timeouts.observe(_domain(page) or domain, "settle", (time.monotonic() - started) * 1000,
+                                  timed_out=True)
+            return False
+        remaining = max(int(timeout - (time.monotonic() - started) * 1000), self.quiet_ms)
+        settled = await self._quiet(page, min(remaining, self.max_quiet_ms), network)
+        # a loaded page that never goes quiet took as long as the cap, it is not a slow site to
+        # back off from; the domain of a page that navigated away is the one it navigated to
+        self.timeouts.observe(_domain(page) or domain, "settle", (time.monotonic() - started) * 1000)
+        return settled
+
+    async def _quiet(self, page: Page, timeout: int, network: bool) -> bool:
+        """Whether the DOM or, with network, the network went quiet within timeout ms"""
+        waits = [asyncio.ensure_future(self.dom_stable(page, timeout))]
+        if network:
+            waits.append(asyncio.ensure_future(self.network_idle(page, timeout)))
+        try:
+            for wait in asyncio.as_completed(waits):
+                if await wait:
+                    return True
+            return False
+        finally:
+            for wait in waits:
+                wait.cancel()
+
+    async def element(self, page: Page, selector: str, root: Union[Page, Frame, Locator, None] = None,
+                      state: str = "visible") -> Optional[Locator]:
+        """The first element of selector under root (the page) once it is in state, None if it never is"""
+        locator = (root or page).locator(selector).first
+        domain = _domain(page)
+        timeout = self.timeouts.timeout(domain, "element")
+        started = time.monotonic()
+        try:
+            await locator.wait_for(state=state, timeout=timeout)
+        except Exception:
+            # a missing element says nothing about how fast the site is
+            return None
+        self.timeouts.observe(domain, "element", (time.monotonic() - started) * 1000)
+        return locator
+
+    @staticmethod
+    async def present(root: Union[Page, Frame, Locator], selectors: Iterable[str]) -> Optional[Tuple[str, Locator]]:
+        """
+        The first of selectors with an element under root right now, and that element. Use
+        after settle(), when what is missing is not going to appear, so misses cost no time.
+        """
+        for selector in selectors:
+            locator = root.locator(selector).first
+            if await locator.count() > 0:
+                return selector, locator
+        return None
+
+
+# shared so timeouts learned on a site apply to every agent and tab visiting it
+smart_wait = SmartWait()
@@ -20,6 +20,14 @@ from browser_use.controller.views import (
     SwitchTabAction,
 )
 import logging
+import os
+
+from src.agent.custom_views import DealsActionResult
+from src.utils.deal_changes import deals_fingerprint
+from src.browser.smart_wait import smart_wait
+from src.utils.deal_crawler import crawl_deals, extract_item_deal, extract_page_deals
+from src.utils.deal_dedup import DealDedupIndex, without_provenance
+from src.utils.site_profiles import pass_age_gate, profile_registry
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +37,10 @@ class CustomController(Controller):
                  output_model: Optional[Type[BaseModel]] = None
                  ):
         super().__init__(exclude_actions=exclude_actions, output_model=output_model)
+        # deals extracted by this controller so far, each deal is returned to the agent once
+        self.deal_index = DealDedupIndex()
+        # content hash of the deals container of every page deals were extracted from, by url
+        self.page_fingerprints: Dict[str, str] = {}
         self._register_custom_actions()
 
     def _register_custom_actions(self):
@@ -55,38 +67,36 @@ class CustomController(Controller):
             page = await browser.get_current_page()
             try:
                 logger.info("Attempting to handle age verification...")
+                profile = await profile_registry.detect(page)
+                if profile is not None and profile.age_gate and await pass_age_gate(page, profile):
+                    return ActionResult(extracted_content=f"Confirmed the {profile.name} age gate.")
                 selectors = ['.age-gate', '#age-verification', '#verify-age-modal', '.age-check']
                 confirm_yes_selectors = ['button.verify-yes', 'a.age-gate-confirm', 'button:has-text("Yes, I am")', 'input[type="radio"][value="yes"] + label']
                 dob_input_selectors = ['input#age-input', 'input[name="birthdate"]', 'input[type="date"]#dob']
                 confirm_dob_button_selectors = ['button#age-verify-submit', 'button:has-text("Submit Age")', '.verify-button']
 
-                age_verification_detected = False
-                for selector in selectors:
-                    if await page.locator(selector, timeout=5000).count() > 0:
-                        age_verification_detected = True
-                        logger.info(f"Age verification detected using selector: {selector}")
-                        break
-
-                if age_verification_detected:
-                    for confirm_selector in confirm_yes_selectors:
-                        yes_button = await page.locator(confirm_selector, timeout=5000).first()
-                        if await yes_button.count() > 0:
-                            await yes_button.click(timeout=10000)
-                            logger.info(f"Clicked 'Yes' for age verification using selector: {confirm_selector}")
-                            return ActionResult(extracted_content="Clicked 'Yes' for age verification.")
-
-                    for dob_selector in dob_input_selectors:
-                        dob_input = await page.locator(dob_selector, timeout=5000).first()
-                        if await dob_input.count() > 0:
-                            await dob_input.fill('07/25/1994', timeout=10000)
-                            logger.info(f"Filled Date of Birth using selector: {dob_selector}")
-                            for confirm_button_selector in confirm_dob_button_selectors:
-                                confirm_button = await page.locator(confirm_button_selector, timeout=5000).first()
-                                if await confirm_button.count() > 0:
-                                    await confirm_button.click(timeout=10000)
-                                    logger.info(f"Confirmed Date of Birth using selector: {confirm_button_selector}")
-                                    return ActionResult(extracted_content="Filled and confirmed Date of Birth.")
-                            break
+                await smart_wait.settle(page)
+                detected = await smart_wait.present(page, selectors)
+                if detected:
+                    logger.info(f"Age verification detected using selector: {detected[0]}")
+                    click_timeout = smart_wait.timeout(page, "element")
+                    yes_button = await smart_wait.present(page, confirm_yes_selectors)
+                    if yes_button:
+                        await yes_button[1].click(timeout=click_timeout)
+                        logger.info(f"Clicked 'Yes' for age verification using selector: {yes_button[0]}")
+                        await smart_wait.settle(page)
+                        return ActionResult(extracted_content="Clicked 'Yes' for age verification.")
+
+                    dob_input = await smart_wait.present(page, dob_input_selectors)
+                    if dob_input:
+                        await dob_input[1].fill('07/25/1994', timeout=click_timeout)
+                        logger.info(f"Filled Date of Birth using selector: {dob_input[0]}")
+                        confirm_button = await smart_wait.present(page, confirm_dob_button_selectors)
+                        if confirm_button:
+                            await confirm_button[1].click(timeout=click_timeout)
+                            logger.info(f"Confirmed Date of Birth using selector: {confirm_button[0]}")
+                            await smart_wait.settle(page)
+                            return ActionResult(extracted_content="Filled and confirmed Date of Birth.")
                 else:
                     logger.info("No age verification pop-up found.")
                     return ActionResult(extracted_content="No age verification pop-up found.")
@@ -105,26 +115,28 @@ class CustomController(Controller):
             menu_selectors = ['#main-nav', '.nav-menu', '#top-menu', '.header-navigation', '#menu', '.site-header nav']
 
             try:
+                await smart_wait.settle(page)
+                keyword_links = [f'a:has-text("{keyword}")' for keyword in deal_keywords]
                 for menu_selector in menu_selectors:
-                    menu = await page.locator(menu_selector, timeout=5000).first()
-                    if await menu.count() > 0:
+                    menu = await smart_wait.present(page, [menu_selector])
+                    if menu:
                         logger.info(f"Searching for deals links in menu: {menu_selector}")
-                        for keyword in deal_keywords:
-                            deal_link_in_menu = await menu.locator(f'a:has-text("{keyword}")', timeout=3000).first()
-                            if await deal_link_in_menu.count() > 0:
-                                logger.info(f"Navigating to {keyword} page from menu.")
-                                await deal_link_in_menu.click(timeout=10000)
-                                await page.wait_for_load_state(timeout=20000)
-                                return ActionResult(extracted_content=f"Navigated to {keyword} page from menu.")
+                        deal_link_in_menu = await smart_wait.present(menu[1], keyword_links)
+                        if deal_link_in_menu:
+                            keyword = deal_keywords[keyword_links.index(deal_link_in_menu[0])]
+                            logger.info(f"Navigating to {keyword} page from menu.")
+                            await deal_link_in_menu[1].click(timeout=smart_wait.timeout(page, "element"))
+                            await smart_wait.settle(page)
+                            return ActionResult(extracted_content=f"Navigated to {keyword} page from menu.")
 
                 logger.info("Searching body for deals links if not found in menus.")
-                for keyword in deal_keywords:
-                    deal_link_body = await page.locator(f'a:has-text("{keyword}")', timeout=3000).first()
-                    if await deal_link_body.count() > 0:
-                        logger.info(f"Navigating to {keyword} page from body.")
-                        await deal_link_body.click(timeout=10000)
-                        await page.wait_for_load_state(timeout=20000)
-                        return ActionResult(extracted_content=f"Navigated to {keyword} page from body.")
+                deal_link_body = await smart_wait.present(page, keyword_links)
+                if deal_link_body:
+                    keyword = deal_keywords[keyword_links.index(deal_link_body[0])]
+                    logger.info(f"Navigating to {keyword} page from body.")
+                    await deal_link_body[1].click(timeout=smart_wait.timeout(page, "element"))
+                    await smart_wait.settle(page)
+                    return ActionResult(extracted_content=f"Navigated to {keyword} page from body.")
 
                 error_msg = "No deals/discounts page link found in menus or body."
                 logger.info(error_msg)
@@ -141,48 +153,45 @@ class CustomController(Controller):
         )
         async def extract_deals_information(browser: BrowserContext) -> ActionResult:
             page = await browser.get_current_page()
-            deals_container_selectors = [
-                '#deals-section', '.deals-container', '.discount-offers', '#promotions', '.specials-area',
-                '.deals-list', '.discounts-grid', '#offer-items', '.promotion-block', '.shop-deals',
-                '#daily-deals', '.weekly-specials', '.featured-deals', '.onsale'
-            ]
-            deal_item_selectors = ['.deal-item', '.discount-item', '.offer', '.promotion', '.product-card', '.deal-block', '.offer-card']
-
-            extracted_deals: List[Dict[str, Any]] = []
-
-            for container_selector in deals_container_selectors:
-                deals_container = await page.locator(container_selector, timeout=5000).first()
-                if await deals_container.count() > 0:
-                    logger.info(f"Extracting deals from container: {container_selector}")
-                    deal_items = await deals_container.locator(','.join(deal_item_selectors), timeout=5000).all()
-                    if not deal_items:
-                        deal_items = await deals_container.locator('div', timeout=5000).all()
-
-                    for item in deal_items:
-                        try:
-                            title_element_text = await item.locator('h2, h3, .deal-title, .discount-title, .offer-title').first().inner_text(timeout=3000)
-                            description_element_text = await item.locator('p, .deal-description, .discount-description, .offer-description, .description').first().inner_text(timeout=3000)
-                            price_element_text = await item.locator('.price, .deal-price, .discount-price, .offer-price, .current-price, .sale-price').first().inner_text(timeout=3000)
-                            original_price_element_text = await item.locator('.original-price, .regular-price, .list-price, .was-price').first().inner_text(timeout=3000)
-
-                            deal_data = {
-                                "title": title_element_text.strip() if title_element_text else "No Title",
-                                "description": description_element_text.strip() if description_element_text else "No Description",
-                                "price": price_element_text.strip() if price_element_text else "Price N/A",
-                                "original_price": original_price_element_text.strip() if original_price_element_text else "N/A",
-                            }
-                            extracted_deals.append(deal_data)
-                        except Exception as extract_item_err:
-                            logger.warning(f"Error extracting deal item: {type(extract_item_err).__name__} - {extract_item_err}") # Improved logging
-
-                    if extracted_deals:
-                        return ActionResult(extracted_content=f"Extracted Deals Content from {container_selector}: {extracted_deals}", structured_content=extracted_deals)
-
-            logger.info("No specific deals container found, extracting deals from page body (fallback).")
-            body_content = await page.locator('body').inner_text(timeout=10000)
-            fallback_deal_data = {"full_page_deals_text": body_content.strip() if body_content else "No Page Content"}
-            extracted_deals.append(fallback_deal_data)
-            return ActionResult(extracted_content=f"Extracted Deals Content from page body (fallback)", structured_content=extracted_deals)
+            await smart_wait.settle(page)
+            source, extracted_deals = await extract_page_deals(page, capture=getattr(browser, "response_capture", None))
+            if source != "body":
+                fingerprint = deals_fingerprint(extracted_deals)
+                if fingerprint:
+                    self.page_fingerprints[page.url] = fingerprint
+                new_deals = self.deal_index.add_many(extracted_deals, website_url=page.url, source=source)
+                if not new_deals:
+                    return ActionResult(extracted_content=f"No new deals in {source}, all {len(extracted_deals)} were extracted before.")
+                return DealsActionResult(extracted_content=f"Extracted Deals Content from {source}: {without_provenance(new_deals)}", structured_content=new_deals)
+
+            new_deals = self.deal_index.add_many(extracted_deals, website_url=page.url, source="body")
+            if not new_deals:
+                return ActionResult(extracted_content="Page body unchanged since it was last extracted (fallback)")
+            return DealsActionResult(extracted_content="Extracted Deals Content from page body (fallback)", structured_content=new_deals)
+
+        @self.registry.action(
+            "Crawl the deals pages of the current site and extract their deals."
+        )
+        async def crawl_deals_pages(browser: BrowserContext) -> ActionResult:
+            page = await browser.get_current_page()
+            try:
+                result = await crawl_deals(
+                    browser,
+                    page.url,
+                    deal_index=self.deal_index,
+                    max_pages=int(os.getenv("HASH_DEALS_CRAWL_MAX_PAGES", "10")),
+                    max_depth=int(os.getenv("HASH_DEALS_CRAWL_MAX_DEPTH", "2")),
+                    concurrency=int(os.getenv("HASH_DEALS_CRAWL_TABS", "3")),
+                )
+            except Exception as e:
+                error_msg = f"Error crawling deals pages: {type(e).__name__} - {e}"
+                logger.warning(error_msg)
+                return ActionResult(error=error_msg)
+            self.page_fingerprints.update(result.fingerprints)
+            summary = f"Crawled {len(result.pages)} pages: {', '.join(result.pages)}."
+            if not result.deals:
+                return ActionResult(extracted_content=f"{summary} No new deals found.")
+            return DealsActionResult(extracted_content=f"{summary} Extracted deals: {without_provenance(result.deals)}", structured_content=result.deals)
 
 
         @self.registry.action(
@@ -197,48 +206,41 @@ class CustomController(Controller):
             extracted_carousel_deals: List[Dict[str, Any]] = []
             carousel_found = False
 
+            await smart_wait.settle(page)
             for carousel_selector in carousel_selectors:
-                carousel = await page.locator(carousel_selector, timeout=5000).first()
-                if await carousel.count() > 0:
+                carousel = await smart_wait.present(page, [carousel_selector])
+                if carousel:
+                    carousel = carousel[1]
                     carousel_found = True
                     logger.info(f"Image carousel detected using selector: {carousel_selector}. Clicking through slides...")
 
                     for _ in range(5):
-                        next_button_clicked = False
-                        for next_button_selector in next_button_selectors:
-                            carousel_next_button = await carousel.locator(next_button_selector, timeout=3000).first()
-                            if await carousel_next_button.count() > 0:
-                                try:
-                                    deal_items_carousel = await carousel.locator(','.join(deal_item_carousel_selectors), timeout=5000).all()
-                                    for item in deal_items_carousel:
-                                        try:
-                                            title_element_text = await item.locator('h2, h3, .deal-title, .discount-title, .offer-title').first().inner_text(timeout=3000)
-                                            description_element_text = await item.locator('p, .deal-description, .discount-description, .offer-description, .description').first().inner_text(timeout=3000)
-                                            price_element_text = await item.locator('.price, .deal-price, .discount-price, .offer-price, .current-price, .sale-price').first().inner_text(timeout=3000)
-                                            original_price_element_text = await item.locator('.original-price, .regular-price, .list-price, .was-price').first().inner_text(timeout=3000)
-
-                                            deal_data = {
-                                                "title": title_element_text.strip() if title_element_text else "No Title",
-                                                "description": description_element_text.strip() if description_element_text else "No Description",
-                                                "price": price_element_text.strip() if price_element_text else "Price N/A",
-                                                "original_price": original_price_element_text.strip() if original_price_element_text else "N/A",
-                                            }
-                                            extracted_carousel_deals.append(deal_data)
-                                        except Exception as extract_carousel_item_err:
-                                            logger.warning(f"Error extracting carousel deal item: {type(extract_carousel_item_err).__name__} - {extract_carousel_item_err}") # Improved logging
-
-                                    await carousel_next_button.click(timeout=10000)
-                                    next_button_clicked = True
-                                    await asyncio.sleep(1)
-                                    break
-                                except Exception as carousel_nav_err:
-                                    logger.warning(f"Carousel navigation issue or no more slides: {type(carousel_nav_err).__name__} - {carousel_nav_err}") # Improved logging
-                                    break
-                        if not next_button_clicked:
+                        carousel_next_button = await smart_wait.present(carousel, next_button_selectors)
+                        if not carousel_next_button:
                             logger.info("No more next buttons found in carousel.")
                             break
+                        try:
+                            deal_items_carousel = await carousel.locator(','.join(deal_item_carousel_selectors)).all()
+                            for item in deal_items_carousel:
+                                try:
+                                    deal_data = await extract_item_deal(item)
+                                    if deal_data:
+                                        extracted_carousel_deals.append(deal_data)
+                                except Exception as extract_carousel_item_err:
+                                    logger.warning(f"Error extracting carousel deal item: {type(extract_carousel_item_err).__name__} - {extract_carousel_item_err}") # Improved logging
+
+                            await carousel_next_button[1].click(timeout=smart_wait.timeout(page, "element"))
+                            # the slide transition is done once the carousel stops changing, autoplaying ones never do
+                            await smart_wait.dom_stable(page, 2000)
+                        except Exception as carousel_nav_err:
+                            logger.warning(f"Carousel navigation issue or no more slides: {type(carousel_nav_err).__name__} - {carousel_nav_err}") # Improved logging
+                            break
                     if extracted_carousel_deals:
-                        return ActionResult(extracted_content=f"Extracted deals from carousel: {extracted_carousel_deals}", structured_content=extracted_carousel_deals)
+                        # slides repeat as the carousel wraps around, and may repeat the deals of the page
+                        new_deals = self.deal_index.add_many(extracted_carousel_deals, website_url=page.url, source=carousel_selector)
+                        if not new_deals:
+                            return ActionResult(extracted_content=f"No new deals in the carousel, all {len(extracted_carousel_deals)} were extracted before.")
+                        return DealsActionResult(extracted_content=f"Extracted deals from carousel: {without_provenance(new_deals)}", structured_content=new_deals)
                     else:
                         return ActionResult(extracted_content="No deals extracted from carousel or carousel was empty.")
 
@@ -1,17 +1,11 @@
 import asyncio
 
 class AgentState:
-    _instance = None
+    """Stop flag and last valid browser state of one agent run; each UI session owns its own"""
 
     def __init__(self):
-        if not hasattr(self, '_stop_requested'):
-            self._stop_requested = asyncio.Event()
-            self.last_valid_state = None  # store the last valid browser state
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(AgentState, cls).__new__(cls)
-        return cls._instance
+        self._stop_requested = asyncio.Event()
+        self.last_valid_state = None  # store the last valid browser state
 
     def request_stop(self):
         self._stop_requested.set()
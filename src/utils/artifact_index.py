@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional, the index then rescans a directory every rescan_interval seconds
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _DirectoryIndex:
+    files: Dict[str, Tuple[str, float]] = field(default_factory=dict)  # path -> (extension, mtime)
+    latest: Dict[str, Tuple[float, str]] = field(default_factory=dict)  # extension -> (mtime, path)
+    scanned_at: float = 0.0
+    watched: bool = False
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower()
+
+
+class _WatchHandler(FileSystemEventHandler):
+    def __init__(self, index: "ArtifactIndex"):
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.register(event.src_path)
+
+    on_modified = on_created
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.forget(event.src_path)
+            self.index.register(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.forget(event.src_path)
+
+
+class ArtifactIndex:
+    """
+    In-memory index of recordings, traces and agent histories.
+
+    Files are registered by the code that writes them, with the id of the run they belong
+    to, and by a watchdog observer where the package is installed. A directory is walked
+    once when it is first queried; without watchdog it is walked again at most every
+    rescan_interval seconds. "Latest file of a directory" and "files of a run" are
+    dictionary lookups, and concurrent runs never see each other's files by run id.
+
+    A run is forgotten when its last file is, by forget_run once its files were read, or
+    when more than max_runs newer runs were registered.
+    """
+
+    def __init__(self, rescan_interval: float = 30.0, max_runs: int = 1000):
+        self.rescan_interval = rescan_interval
+        self.max_runs = max_runs
+        self._directories: Dict[str, _DirectoryIndex] = {}
+        self._runs: "OrderedDict[str, Dict[str, List[str]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._observer = None
+
+    def register(self, path: str, run_id: Optional[str] = None) -> None:
+        path = os.path.abspath(path)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+        ext = _extension(path)
+        with self._lock:
+            if run_id is not None:
+                run = self._runs.get(run_id)
+                if run is None:
+                    run = self._runs[run_id] = defaultdict(list)
+                    while len(self._runs) > self.max_runs:
+                        self._runs.popitem(last=False)
+                if path not in run[ext]:
+                    run[ext].append(path)
+            for directory, entry in self._directories.items():
+                if path.startswith(directory + os.sep):
+                    entry.files[path] = (ext, mtime)
+                    latest = entry.latest.get(ext)
+                    if latest is None or mtime >= latest[0]:
+                        entry.latest[ext] = (mtime, path)
+
+    def forget(self, path: str) -> None:
+        path = os.path.abspath(path)
+        with self._lock:
+            for entry in self._directories.values():
+                removed = entry.files.pop(path, None)
+                if removed is None:
+                    continue
+                ext = removed[0]
+                if entry.latest.get(ext, (0, None))[1] == path:
+                    candidates = [(m, p) for p, (e, m) in entry.files.items() if e == ext]
+                    if candidates:
+                        entry.latest[ext] = max(candidates)
+                    else:
+                        entry.latest.pop(ext, None)
+            for run_id, run in list(self._runs.items()):
+                for paths in run.values():
+                    if path in paths:
+                        paths.remove(path)
+                if not any(run.values()):
+                    del self._runs[run_id]
+
+    def latest(self, directory: str, ext: str) -> Optional[Tuple[float, str]]:
+        """(mtime, path) of the newest file with this extension anywhere under directory"""
+        entry = self._directory(directory)
+        with self._lock:
+            return entry.latest.get(ext.lower())
+
+    def files(self, directory: str, extensions: Iterable[str]) -> List[str]:
+        extensions = {ext.lower() for ext in extensions}
+        entry = self._directory(directory)
+        with self._lock:
+            return [path for path, (ext, _) in entry.files.items() if ext in extensions]
+
+    def run_files(self, run_id: str, ext: Optional[str] = None) -> List[str]:
+        with self._lock:
+            run = self._runs.get(run_id, {})
+            if ext is not None:
+                return list(run.get(ext.lower(), []))
+            return [path for paths in run.values() for path in paths]
+
+    def latest_for_run(self, run_id: str, ext: str) -> Optional[str]:
+        with self._lock:
+            paths = self._runs.get(run_id, {}).get(ext.lower())
+            return paths[-1] if paths else None
+
+    def forget_run(self, run_id: str) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def _directory(self, directory: str) -> _DirectoryIndex:
+        directory = os.path.abspath(directory)
+        with self._lock:
+            entry = self._directories.get(directory)
+            if entry is None:
+                entry = self._directories[directory] = _DirectoryIndex()
+                entry.watched = self._watch(directory)
+            elif entry.watched or time.time() - entry.scanned_at < self.rescan_interval:
+                return entry
+        self._scan(directory, entry)
+        return entry
+
+    def _scan(self, directory: str, entry: _DirectoryIndex) -> None:
+        files: Dict[str, Tuple[str, float]] = {}
+        latest: Dict[str, Tuple[float, str]] = {}
+        if os.path.isdir(directory):
+            for path in Path(directory).rglob("*"):
+                try:
+                    if not path.is_file():
+                        continue
+                    mtime = path.stat().st_mtime
+                except OSError:
+                    continue
+                ext = _extension(path.name)
+                files[str(path)] = (ext, mtime)
+                if ext not in latest or mtime >= latest[ext][0]:
+                    latest[ext] = (mtime, str(path))
+        with self._lock:
+            entry.files, entry.latest, entry.scanned_at = files, latest, time.time()
+
+    def _watch(self, directory: str) -> bool:
+        if Observer is None:
+            return False
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            self._observer.schedule(_WatchHandler(self), directory, recursive=True)
+            return True
+        except Exception as e:
+            logger.debug(f"Cannot watch {directory}, falling back to rescans: {e}")
+            return False
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+
+# shared by the UI, the browser contexts and the agents of this process
+artifact_index = ArtifactIndex()
@@ -0,0 +1,286 @@
+import asyncio
+import gzip
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used instead
+    zstandard = None
+
+from .artifact_index import ArtifactIndex, artifact_index
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    What is kept of one artifact directory. Limits left at None are not enforced.
+
+    extensions: files the policy applies to, anywhere under directory (empty: all files)
+    per_directory: treat every top-level sub-directory as one artifact (deep research runs)
+    max_age_days / max_total_bytes / max_count: oldest artifacts are deleted first
+    compress: "gzip" or "zstd" to compress files older than compress_after_seconds
+    min_age_seconds: newer artifacts are never touched, they may still be written
+    """
+
+    directory: str
+    extensions: Tuple[str, ...] = ()
+    per_directory: bool = False
+    max_age_days: Optional[float] = None
+    max_total_bytes: Optional[int] = None
+    max_count: Optional[int] = None
+    compress: Optional[str] = None
+    compress_after_seconds: float = 3600
+    min_age_seconds: float = 60
+
+
+@dataclass
+class RetentionStats:
+    directory: str
+    artifacts: int = 0
+    bytes: int = 0
+    deleted: int = 0
+    freed_bytes: int = 0
+    compressed: int = 0
+    saved_bytes: int = 0
+    disk_free_bytes: int = 0
+    disk_total_bytes: int = 0
+    finished_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Artifact:
+    path: str
+    size: int
+    mtime: float
+    is_dir: bool = False
+
+
+def _directory_size(path: str) -> Tuple[int, float]:
+    size, mtime = 0, os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def _compressed_suffix(method: str) -> str:
+    return ".zst" if method == "zstd" and zstandard is not None else ".gz"
+
+
+def compress_file(path: str, method: str = "gzip") -> str:
+    """Compress path next to itself and remove the original; returns the new path"""
+    target = path + _compressed_suffix(method)
+    tmp_target = target + ".tmp"
+    with open(path, "rb") as src, open(tmp_target, "wb") as dst:
+        if target.endswith(".zst"):
+            zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(src, gz)
+    shutil.copystat(path, tmp_target)
+    os.replace(tmp_target, target)
+    os.remove(path)
+    return target
+
+
+def open_artifact(path: str):
+    """Binary file object of an artifact that may have been compressed by the retention manager"""
+    for suffix in ("", ".gz", ".zst"):
+        if os.path.exists(path + suffix):
+            path = path + suffix
+            break
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+
+def read_artifact(path: str) -> bytes:
+    """Contents of an artifact that may have been compressed by the retention manager"""
+    with open_artifact(path) as f:
+        return f.read()
+
+
+class RetentionManager:
+    """Applies retention policies to the artifact directories, once or periodically in the background"""
+
+    def __init__(self, policies: List[RetentionPolicy], interval: float = 3600, index: ArtifactIndex = artifact_index):
+        self.policies = policies
+        self.interval = interval
+        self.index = index
+        self.last_stats: Dict[str, RetentionStats] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def run_once(self) -> Dict[str, RetentionStats]:
+        for policy in self.policies:
+            try:
+                self.last_stats[policy.directory] = self._apply(policy)
+            except Exception as e:
+                logger.error(f"Retention of {policy.directory} failed: {e}")
+        return self.last_stats
+
+    def metrics(self) -> Dict[str, dict]:
+        return {directory: stats.__dict__.copy() for directory, stats in self.last_stats.items()}
+
+    def _collect(self, policy: RetentionPolicy) -> List[_Artifact]:
+        artifacts = []
+        if policy.per_directory:
+            for entry in os.scandir(policy.directory):
+                if entry.is_dir():
+                    size, mtime = _directory_size(entry.path)
+                    artifacts.append(_Artifact(entry.path, size, mtime, is_dir=True))
+            return artifacts
+        extensions = tuple(ext.lower() for ext in policy.extensions)
+        compressed_extensions = tuple(ext + suffix for ext in extensions for suffix in (".gz", ".zst"))
+        for root, _, files in os.walk(policy.directory):
+            for name in files:
+                lowered = name.lower()
+                if extensions and not lowered.endswith(extensions + compressed_extensions):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                artifacts.append(_Artifact(path, stat.st_size, stat.st_mtime))
+        return artifacts
+
+    def _apply(self, policy: RetentionPolicy) -> RetentionStats:
+        stats = RetentionStats(directory=policy.directory)
+        if not os.path.isdir(policy.directory):
+            return stats
+        now = time.time()
+        artifacts = sorted(self._collect(policy), key=lambda a: a.mtime)
+        removable = [a for a in artifacts if now - a.mtime >= policy.min_age_seconds]
+        total_bytes = sum(a.size for a in artifacts)
+        count = len(artifacts)
+
+        # oldest first, until every limit holds
+        for artifact in removable:
+            too_old = policy.max_age_days is not None and now - artifact.mtime > policy.max_age_days * 86400
+            too_many = policy.max_count is not None and count > policy.max_count
+            too_big = policy.max_total_bytes is not None and total_bytes > policy.max_total_bytes
+            if not (too_old or too_many or too_big):
+                break
+            if self._delete(artifact):
+                count -= 1
+                total_bytes -= artifact.size
+                stats.deleted += 1
+                stats.freed_bytes += artifact.size
+
+        if policy.compress:
+            for artifact in removable:
+                if (
+                        artifact.is_dir
+                        or artifact.path.endswith((".gz", ".zst"))
+                        or not os.path.exists(artifact.path)
+                        or now - artifact.mtime < policy.compress_after_seconds
+                ):
+                    continue
+                try:
+                    target = compress_file(artifact.path, policy.compress)
+                except OSError as e:
+                    logger.warning(f"Failed to compress {artifact.path}: {e}")
+                    continue
+                self.index.forget(artifact.path)
+                self.index.register(target)
+                saved = artifact.size - os.path.getsize(target)
+                total_bytes -= saved
+                stats.compressed += 1
+                stats.saved_bytes += saved
+
+        stats.artifacts = count
+        stats.bytes = total_bytes
+        usage = shutil.disk_usage(policy.directory)
+        stats.disk_free_bytes, stats.disk_total_bytes = usage.free, usage.total
+        if stats.deleted or stats.compressed:
+            logger.info(
+                f"🧹 {policy.directory}: deleted {stats.deleted} ({stats.freed_bytes / 1e6:.1f} MB), "
+                f"compressed {stats.compressed} ({stats.saved_bytes / 1e6:.1f} MB saved), "
+                f"{stats.artifacts} left ({stats.bytes / 1e6:.1f} MB), disk free {usage.free / 1e9:.1f} GB"
+            )
+        return stats
+
+    def _delete(self, artifact: _Artifact) -> bool:
+        try:
+            if artifact.is_dir:
+                shutil.rmtree(artifact.path)
+            else:
+                os.remove(artifact.path)
+        except OSError as e:
+            logger.warning(f"Failed to delete {artifact.path}: {e}")
+            return False
+        self.index.forget(artifact.path)
+        return True
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> asyncio.Task:
+        """Run in the background of the current event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    def start_thread(self) -> threading.Thread:
+        """Run in a daemon thread, for processes whose event loop is owned by a framework"""
+        if self._thread is None:
+            def loop():
+                while not self._stop.is_set():
+                    self.run_once()
+                    self._stop.wait(self.interval)
+
+            self._thread = threading.Thread(target=loop, name="artifact-retention", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name, "")
+    return float(value) if value else None
+
+
+def default_retention_policies() -> List[RetentionPolicy]:
+    """Policies for the default artifact directories, limits read from RETENTION_* variables"""
+    max_age_days = _env_float("RETENTION_MAX_AGE_DAYS")
+    max_gb = _env_float("RETENTION_MAX_GB_PER_TYPE")
+    max_bytes = int(max_gb * 1e9) if max_gb else None
+    max_count = _env_float("RETENTION_MAX_COUNT_PER_TYPE")
+    max_count = int(max_count) if max_count else None
+    compress = os.getenv("RETENTION_COMPRESS_HISTORY", "gzip") or None
+    common = dict(max_age_days=max_age_days, max_total_bytes=max_bytes, max_count=max_count)
+    return [
+        RetentionPolicy("./tmp/record_videos", extensions=(".webm", ".mp4", ".webp"), **common),
+        RetentionPolicy("./tmp/traces", extensions=(".zip",), **common),
+        RetentionPolicy("./tmp/agent_history", extensions=(".json", ".jsonl"), compress=compress, **common),
+        # screenshots of the streamed histories, shared between runs by content hash
+        RetentionPolicy("./tmp/agent_history/screenshots", max_age_days=max_age_days),
+        RetentionPolicy("./tmp/deep_research", per_directory=True, **common),
+    ]
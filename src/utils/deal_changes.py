@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .deal_dedup import deal_words
+from .deal_normalizer import parse_price
+
+logger = logging.getLogger(__name__)
+
+# containers the deals of a page are looked for in, most specific first
+DEALS_CONTAINER_SELECTORS = [
+    '#deals-section', '.deals-container', '.discount-offers', '#promotions', '.specials-area',
+    '.deals-list', '.discounts-grid', '#offer-items', '.promotion-block', '.shop-deals',
+    '#daily-deals', '.weekly-specials', '.featured-deals', '.onsale'
+]
+
+
+@dataclass
+class SiteSnapshot:
+    """What the last full scrape of a site found, and how to tell whether its deals page changed"""
+
+    website_url: str
+    location: str
+    deals_page_url: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    # how the deals of the deals page were extracted, see extract_page_deals
+    source: Optional[str] = None
+    deals: List[Dict[str, Any]] = field(default_factory=list)
+    scraped_at: float = 0.0
+    checked_at: float = 0.0
+
+
+class SnapshotStore:
+    """Site snapshots of recurring hash deals runs, in one JSON file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DEALS_SNAPSHOT_FILE", "./tmp/deal_snapshots.json")
+        self._snapshots: Optional[Dict[str, SiteSnapshot]] = None
+
+    @staticmethod
+    def _key(website_url: str, location: str) -> str:
+        return f"{location} - {website_url}"
+
+    def _load(self) -> Dict[str, SiteSnapshot]:
+        if self._snapshots is None:
+            self._snapshots = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._snapshots = {key: SiteSnapshot(**value) for key, value in json.load(f).items()}
+        return self._snapshots
+
+    def get(self, website_url: str, location: str) -> Optional[SiteSnapshot]:
+        return self._load().get(self._key(website_url, location))
+
+    def put(self, snapshot: SiteSnapshot) -> None:
+        snapshots = self._load()
+        snapshots[self._key(snapshot.website_url, snapshot.location)] = snapshot
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: asdict(value) for key, value in snapshots.items()}, f, default=str)
+        os.replace(tmp_path, self.path)
+
+
+_FINGERPRINT_FIELDS = ("title", "description", "price", "original_price", "full_page_deals_text")
+
+
+def deals_fingerprint(deals: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Hash of the deals of one extraction of a page, whichever way they were read: a deals
+    container, the frame of a site profile or captured API responses. None without deals.
+    """
+    records = sorted(
+        json.dumps({key: re.sub(r"\s+", " ", str(deal[key])).strip() for key in _FINGERPRINT_FIELDS if deal.get(key)},
+                   sort_keys=True)
+        for deal in deals
+    )
+    if not records:
+        return None
+    return hashlib.sha256("\n".join(records).encode()).hexdigest()
+
+
+def validated_by_http(source: Optional[str]) -> bool:
+    """
+    Whether HTTP validators of a page tell if its deals changed: only when they were read
+    from a deals container of the document itself, not from API responses or an iframe.
+    """
+    return source in DEALS_CONTAINER_SELECTORS
+
+
+async def fetch_validators(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Conditional HEAD request of url. Returns the current etag and last_modified of the page
+    and whether the server confirmed that it is unchanged (304 or identical validators).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=10) as client:
+            response = await client.head(url, headers=headers)
+    except httpx.HTTPError as e:
+        logger.debug(f"Validator request for {url} failed: {e}")
+        return {"etag": None, "last_modified": None, "unchanged": False}
+    current_etag = response.headers.get("etag") or (etag if response.status_code == 304 else None)
+    current_last_modified = response.headers.get("last-modified") or (last_modified if response.status_code == 304 else None)
+    unchanged = response.status_code == 304 or (
+        response.status_code == 200
+        and bool(current_etag or current_last_modified)
+        and (current_etag, current_last_modified) == (etag, last_modified)
+    )
+    return {"etag": current_etag, "last_modified": current_last_modified, "unchanged": unchanged}
+
+
+def deals_page_url(deals: List[Dict[str, Any]], default: str) -> str:
+    """The page most of the deals were extracted from, according to their sources"""
+    urls = Counter(source["website_url"] for deal in deals for source in deal.get("sources", []) if source.get("website_url"))
+    return urls.most_common(1)[0][0] if urls else default
+
+
+def deals_page_source(deals: List[Dict[str, Any]], page_url: str) -> Optional[str]:
+    """How most of the deals of page_url were extracted, according to their sources"""
+    sources = Counter(
+        source["source"] for deal in deals for source in deal.get("sources", [])
+        if source.get("website_url") == page_url and source.get("source")
+    )
+    return sources.most_common(1)[0][0] if sources else None
+
+
+def _deal_key(deal: Dict[str, Any]) -> Optional[str]:
+    words = deal_words(deal.get("title"))
+    return " ".join(words) if words else None
+
+
+def diff_deals(before: List[Dict[str, Any]], after: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Deals added, removed and changed between two scrapes of a site, matched by normalized
+    title; a deal changed when its price, original price or description did.
+    """
+    old = {key: deal for deal in before if (key := _deal_key(deal))}
+    new = {key: deal for deal in after if (key := _deal_key(deal))}
+    changed = []
+    for key in old.keys() & new.keys():
+        a, b = old[key], new[key]
+        if (
+                parse_price(a.get("price")) != parse_price(b.get("price"))
+                or parse_price(a.get("original_price")) != parse_price(b.get("original_price"))
+                or deal_words(a.get("description")) != deal_words(b.get("description"))
+        ):
+            changed.append({"before": a, "after": b})
+    return {
+        "added": [deal for key, deal in new.items() if key not in old],
+        "removed": [deal for key, deal in old.items() if key not in new],
+        "changed": changed,
+    }
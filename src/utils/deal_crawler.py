@@ -0,0 +1,279 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from browser_use.browser.context import BrowserContext
+from playwright.async_api import Locator, Page
+
+from .deal_changes import DEALS_CONTAINER_SELECTORS, deals_fingerprint
+from ..browser.response_capture import ResponseCapture
+from ..browser.smart_wait import smart_wait
+from .deal_dedup import DealDedupIndex
+from .deal_json import deals_from_json
+from .site_profiles import ProfileRegistry, extract_profile_deals, profile_registry
+
+logger = logging.getLogger(__name__)
+
+DEAL_ITEM_SELECTORS = ['.deal-item', '.discount-item', '.offer', '.promotion', '.product-card', '.deal-block', '.offer-card']
+_TITLE_SELECTOR = 'h2, h3, .deal-title, .discount-title, .offer-title'
+_DESCRIPTION_SELECTOR = 'p, .deal-description, .discount-description, .offer-description, .description'
+_PRICE_SELECTOR = '.price, .deal-price, .discount-price, .offer-price, .current-price, .sale-price'
+_ORIGINAL_PRICE_SELECTOR = '.original-price, .regular-price, .list-price, .was-price'
+
+# anchor text keywords of deal pages and their weight; url path words count half
+LINK_KEYWORDS = {
+    "deal": 5, "deals": 5, "special": 4, "specials": 4, "discount": 4, "discounts": 4, "promo": 4, "promotion": 4,
+    "promotions": 4, "sale": 3, "sales": 3, "offer": 3, "offers": 3, "savings": 3, "coupon": 3, "coupons": 3,
+    "bogo": 3, "clearance": 3, "weekly": 2, "daily": 2, "happy": 1, "hour": 1,
+    # categories and pagination of deals pages
+    "next": 2, "more": 1, "page": 1, "shop": 1, "menu": 1, "flower": 1, "edibles": 1, "vapes": 1,
+    "concentrates": 1, "prerolls": 1,
+}
+_WORD_RE = re.compile(r"[a-z]+")
+_PAGE_NUMBER_RE = re.compile(r"^\s*\d{1,3}\s*$")
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|ref|_ga)$", re.IGNORECASE)
+_SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".zip", ".mp4", ".css", ".js")
+_LINKS_JS = "els => els.map(a => [a.href, (a.innerText || a.getAttribute('aria-label') || a.title || '').trim(), a.rel || ''])"
+
+
+def canonicalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Absolute, normalized form of a link, so that one page is visited once: lowercase scheme
+    and host, no default port, fragment or tracking parameters, sorted query, no trailing
+    slash. None for links that are not web pages (mailto:, javascript:, files).
+    """
+    url = urljoin(base, url) if base else url
+    parts = urlparse(url.strip())
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if path.lower().endswith(_SKIPPED_EXTENSIONS):
+        return None
+    if len(path) > 1:
+        path = path.rstrip("/")
+    netloc = parts.hostname.lower()
+    if parts.port and (parts.scheme, parts.port) not in (("http", 80), ("https", 443)):
+        netloc += f":{parts.port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAMS.match(k)))
+    return urlunparse((parts.scheme.lower(), netloc, path, "", query, ""))
+
+
+def same_site(url: str, other: str) -> bool:
+    """Whether two urls are on the same host, with or without www."""
+    host, other_host = (urlparse(u).hostname or "" for u in (url, other))
+    return host.removeprefix("www.") == other_host.removeprefix("www.")
+
+
+def page_key(url: str) -> str:
+    """Key of a canonical url under which a page is visited once, with or without www."""
+    parts = urlparse(url)
+    return urlunparse(parts._replace(netloc=parts.netloc.removeprefix("www.")))
+
+
+def link_score(text: str, url: str, rel: str = "") -> float:
+    """How likely a link leads to deals, from its anchor text and url; 0 for unrelated links"""
+    score = sum(LINK_KEYWORDS.get(word, 0) for word in set(_WORD_RE.findall(text.lower())))
+    score += sum(LINK_KEYWORDS.get(word, 0) for word in set(_WORD_RE.findall(urlparse(url).path.lower()))) / 2
+    if "next" in rel.lower().split() or _PAGE_NUMBER_RE.match(text):
+        score += 2
+    return score
+
+
+class CrawlFrontier:
+    """
+    Bounded best-first frontier of the links of one site: highest scoring links first, then
+    shallowest. Links are canonicalized and queued once, a page under its www. host and under
+    the bare one too; links off the site, deeper than max_depth or scoring below min_score are
+    dropped, and at most max_pages are handed out.
+    """
+
+    def __init__(self, start_url: str, max_pages: int = 10, max_depth: int = 2, min_score: float = 1):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.min_score = min_score
+        self.start_url = canonicalize_url(start_url) or start_url
+        # page_key of every queued url
+        self.seen: Set[str] = {page_key(self.start_url)}
+        self.popped = 0
+        self._order = itertools.count()
+        self._heap: List[Tuple[float, int, int, str]] = [(0.0, 0, next(self._order), self.start_url)]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, url: str, text: str = "", depth: int = 1, rel: str = "", base: Optional[str] = None) -> bool:
+        """Queue a link found at depth - 1; returns whether it was queued"""
+        url = canonicalize_url(url, base)
+        if url is None or page_key(url) in self.seen or depth > self.max_depth or not same_site(url, self.start_url):
+            return False
+        score = link_score(text, url, rel)
+        if score < self.min_score:
+            return False
+        self.seen.add(page_key(url))
+        heapq.heappush(self._heap, (-score, depth, next(self._order), url))
+        return True
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """Next url to visit and its depth, None when the frontier is empty or the page budget spent"""
+        if not self._heap or self.popped >= self.max_pages:
+            return None
+        self.popped += 1
+        _, depth, _, url = heapq.heappop(self._heap)
+        return url, depth
+
+
+async def extract_item_deal(item: Locator) -> Optional[Dict[str, Any]]:
+    """Title, description, price and original price of a deal item, None unless it has all four"""
+    texts = []
+    for selector in (_TITLE_SELECTOR, _DESCRIPTION_SELECTOR, _PRICE_SELECTOR, _ORIGINAL_PRICE_SELECTOR):
+        element = item.locator(selector).first
+        # the page has settled, a field that is not there now is not coming
+        if await element.count() == 0:
+            return None
+        texts.append((await element.inner_text(timeout=3000)).strip())
+    title, description, price, original_price = texts
+    return {
+        "title": title or "No Title",
+        "description": description or "No Description",
+        "price": price or "Price N/A",
+        "original_price": original_price or "N/A",
+    }
+
+
+async def extract_page_deals(page: Page, registry: Optional[ProfileRegistry] = None,
+                             capture: Optional[ResponseCapture] = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Deals of the page and where they were found. Deals in the JSON API responses the page
+    received since the last extraction (with a capture) are taken as they are ("api"). Pages
+    of a known platform are read with its site profile ("profile:<name>"); otherwise, or when
+    the profile finds nothing, the deals of the first deals container with any (its
+    selector). Without one, the page body text as a single fallback record, with source "body".
+    """
+    if capture is not None:
+        await capture.flush()
+        deals = [deal for response in capture.take(page) for deal in deals_from_json(response.data)]
+        if deals:
+            logger.info(f"Extracted {len(deals)} deals from the API responses of {page.url}")
+            return "api", deals
+
+    registry = registry or profile_registry
+    profile = await registry.detect(page)
+    if profile is not None:
+        try:
+            deals = await extract_profile_deals(page, profile)
+            if deals:
+                return f"profile:{profile.name}", deals
+            logger.info(f"No deals found by the {profile.name} profile on {page.url}, using the generic selectors")
+        except Exception as e:
+            logger.warning(f"Error extracting deals by the {profile.name} profile: {type(e).__name__} - {e}")
+
+    for container_selector in DEALS_CONTAINER_SELECTORS:
+        deals_container = page.locator(container_selector).first
+        if await deals_container.count() == 0:
+            continue
+        logger.info(f"Extracting deals from container: {container_selector}")
+        deal_items = await deals_container.locator(','.join(DEAL_ITEM_SELECTORS)).all()
+        if not deal_items:
+            deal_items = await deals_container.locator('div').all()
+
+        extracted_deals: List[Dict[str, Any]] = []
+        for item in deal_items:
+            try:
+                deal_data = await extract_item_deal(item)
+                if deal_data:
+                    extracted_deals.append(deal_data)
+            except Exception as extract_item_err:
+                logger.warning(f"Error extracting deal item: {type(extract_item_err).__name__} - {extract_item_err}")
+        if extracted_deals:
+            return container_selector, extracted_deals
+
+    logger.info("No specific deals container found, extracting deals from page body (fallback).")
+    body_content = await page.locator('body').inner_text(timeout=10000)
+    return "body", [{"full_page_deals_text": body_content.strip() if body_content else "No Page Content"}]
+
+
+@dataclass
+class CrawlResult:
+    """Deals found by crawl_deals, new to its index, and the pages it visited"""
+
+    deals: List[Dict[str, Any]] = field(default_factory=list)
+    pages: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+
+
+async def crawl_deals(
+        browser: BrowserContext,
+        start_url: str,
+        deal_index: Optional[DealDedupIndex] = None,
+        max_pages: int = 10,
+        max_depth: int = 2,
+        concurrency: int = 3,
+        page_timeout: int = 30000,
+) -> CrawlResult:
+    """
+    Visit the deal pages of the site of start_url breadth first, up to max_pages pages and
+    max_depth links away, in concurrency tabs of the browser context, extracting the deals of
+    every page as it loads. Cookies of the context, e.g. a passed age gate, apply to all tabs.
+
+    Deals are merged into deal_index, so deals of the agent's own extractions are not
+    returned again. Fallback page texts are kept only for pages without any deals container.
+    """
+    deal_index = deal_index if deal_index is not None else DealDedupIndex()
+    session = await browser.get_session()
+    current_page = session.current_page
+    frontier = CrawlFrontier(start_url, max_pages=max_pages, max_depth=max_depth)
+    result = CrawlResult()
+    in_flight = 0
+
+    async def visit(page: Page, url: str, depth: int) -> None:
+        await page.goto(url, wait_until="domcontentloaded", timeout=page_timeout)
+        await smart_wait.settle(page)
+        result.pages.append(page.url)
+        if depth < max_depth:
+            for href, text, rel in await page.eval_on_selector_all("a[href]", _LINKS_JS):
+                frontier.add(href, text, depth + 1, rel, base=page.url)
+        source, deals = await extract_page_deals(page, capture=getattr(browser, "response_capture", None))
+        if source != "body":
+            fingerprint = deals_fingerprint(deals)
+            if fingerprint:
+                result.fingerprints[page.url] = fingerprint
+        result.deals.extend(deal_index.add_many(deals, website_url=page.url, source=source))
+
+    async def worker() -> None:
+        nonlocal in_flight
+        page = await session.context.new_page()
+        try:
+            while True:
+                entry = frontier.pop()
+                if entry is None:
+                    # pages still loading may queue more links
+                    if in_flight == 0 or frontier.popped >= max_pages:
+                        return
+                    await asyncio.sleep(0.2)
+                    continue
+                in_flight += 1
+                try:
+                    await visit(page, *entry)
+                except Exception as e:
+                    logger.warning(f"Error crawling {entry[0]}: {type(e).__name__} - {e}")
+                    result.errors[entry[0]] = f"{type(e).__name__} - {e}"
+                finally:
+                    in_flight -= 1
+        finally:
+            await page.close()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    finally:
+        # new tabs become the current page of the session, the agent continues on its own
+        session.current_page = current_page
+    if any(deal.get("title") for deal in result.deals):
+        result.deals = [deal for deal in result.deals if "full_page_deals_text" not in deal]
+    logger.info(f"Crawled {len(result.pages)} pages of {start_url}, {len(result.deals)} new deals")
+    return result
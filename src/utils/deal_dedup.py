@@ -0,0 +1,165 @@
+import hashlib
+import json
+import re
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .deal_normalizer import parse_price
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PLACEHOLDERS = {"no title", "no description", "price n/a", "n/a"}
+
+# MinHash signature of _BANDS bands of _ROWS values; deals sharing a band are compared
+_BANDS = 16
+_ROWS = 2
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+    for i in range(_BANDS * _ROWS)
+]
+
+
+def deal_words(text: Optional[str]) -> List[str]:
+    """Lowercase words of a deal field, none for placeholders like \"No Title\""""
+    if not text or text.strip().lower() in _PLACEHOLDERS:
+        return []
+    return _WORD_RE.findall(text.lower())
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash(words: Iterable[str]) -> Tuple[int, ...]:
+    """MinHash signature of a set of words"""
+    hashes = [int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "big") for w in set(words)]
+    if not hashes:
+        return (0,) * len(_PERMUTATIONS)
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _site(website_url: Optional[str]) -> str:
+    return urlparse(website_url).netloc.lower() if website_url else ""
+
+
+class DealDedupIndex:
+    """
+    Merges duplicate deals as they are extracted, keeping where each was seen.
+
+    Two deals are the same when their normalized title and unit price match, or when the
+    price matches and the words of the titles and of title plus description overlap by at
+    least title_similarity and similarity (Jaccard), i.e. the same promotion worded slightly
+    differently on two pages. Near-duplicate candidates are found through MinHash bands, not
+    by comparing against every deal.
+
+    Deals are merged per site, or across all sites and locations with cross_location.
+    Records without a title (page text fallbacks, errors) are only merged when identical.
+    """
+
+    def __init__(self, similarity: float = 0.7, title_similarity: float = 0.6, cross_location: bool = False):
+        self.similarity = similarity
+        self.title_similarity = title_similarity
+        self.cross_location = cross_location
+        self._deals: List[Dict[str, Any]] = []
+        self._exact: Dict[Tuple, int] = {}
+        self._bands: Dict[Tuple, List[int]] = defaultdict(list)
+        # per deal: unit price, title words and title plus description words, for candidates
+        self._features: List[Optional[Tuple[Optional[float], FrozenSet[str], FrozenSet[str]]]] = []
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._deals)
+
+    def add(
+            self,
+            deal: Dict[str, Any],
+            website_url: Optional[str] = None,
+            location: Optional[str] = None,
+            source: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Index a deal; returns the merged record and whether the deal was new"""
+        scope = "" if self.cross_location else _site(website_url or deal.get("website_url"))
+        provenance = {k: v for k, v in (("website_url", website_url), ("location", location), ("source", source)) if v}
+        # deals merged by an earlier index carry their sources along
+        sources = [{**provenance, **s} for s in deal.get("sources") or [{}]]
+        sources = [s for s in sources if s]
+        occurrences = deal.get("occurrences", 1)
+        deal = {k: v for k, v in deal.items() if k not in ("sources", "occurrences")}
+
+        title_words = deal_words(deal.get("title"))
+        if not title_words:
+            key = (scope, "raw", json.dumps(deal, sort_keys=True, default=str))
+            features, signature = None, None
+        else:
+            price = parse_price(deal.get("price"))
+            key = (scope, " ".join(title_words), price)
+            words = frozenset(title_words + deal_words(deal.get("description")))
+            features = (price, frozenset(title_words), words)
+            signature = minhash(words)
+
+        index = self._exact.get(key)
+        if index is None and features is not None:
+            index = self._near_duplicate(scope, features, signature)
+        if index is not None:
+            record = self._deals[index]
+            record["occurrences"] += occurrences
+            record["sources"].extend(s for s in sources if s not in record["sources"])
+            self._exact.setdefault(key, index)
+            self.duplicates += 1
+            return record, False
+
+        record = {**deal, "sources": sources, "occurrences": occurrences}
+        index = len(self._deals)
+        self._deals.append(record)
+        self._features.append(features)
+        self._exact[key] = index
+        if signature is not None:
+            for band in range(_BANDS):
+                self._bands[(scope, band, signature[band * _ROWS:(band + 1) * _ROWS])].append(index)
+        return record, True
+
+    def add_many(self, deals: List[Dict[str, Any]], **provenance) -> List[Dict[str, Any]]:
+        """Index deals; returns the ones that were new"""
+        return [record for record, new in (self.add(deal, **provenance) for deal in deals) if new]
+
+    def _near_duplicate(self, scope: str, features: Tuple, signature: Tuple[int, ...]) -> Optional[int]:
+        price, title_words, words = features
+        checked = set()
+        for band in range(_BANDS):
+            for index in self._bands.get((scope, band, signature[band * _ROWS:(band + 1) * _ROWS]), ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                other_price, other_title_words, other_words = self._features[index]
+                if (
+                        other_price == price
+                        and _jaccard(title_words, other_title_words) >= self.title_similarity
+                        and _jaccard(words, other_words) >= self.similarity
+                ):
+                    return index
+        return None
+
+    def deals(self) -> List[Dict[str, Any]]:
+        """Merged deals in the order they were first seen, with their sources and occurrences"""
+        return list(self._deals)
+
+
+def without_provenance(deals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Deals without the sources and occurrences of the index, as the LLM is shown them"""
+    return [{k: v for k, v in deal.items() if k not in ("sources", "occurrences")} for deal in deals]
+
+
+def dedupe_report(report: Dict[str, List[Dict[str, Any]]], cross_location: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Deduplicated copy of a multi-site report ({"<location> - <url>": [deal, ...]}). With
+    cross_location, a deal offered at several locations is listed once, under the first,
+    and its sources name the other locations.
+    """
+    index = DealDedupIndex(cross_location=cross_location)
+    deduped: Dict[str, List[Dict[str, Any]]] = {}
+    for key, deals in report.items():
+        location, _, website_url = key.partition(" - ")
+        deduped[key] = index.add_many(deals, website_url=website_url or None, location=location or None)
+    return deduped
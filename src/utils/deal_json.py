@@ -0,0 +1,139 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# keys of a deal's fields in API responses, compared lowercase without "_" and "-", first present wins
+_TITLE_KEYS = ("name", "title", "productname", "dealname", "specialname", "heading", "displayname")
+_DESCRIPTION_KEYS = ("description", "shortdescription", "subtitle", "brandname", "brand", "category", "straintype", "type")
+# prices of the deal first, then the regular price, which is the original price of such a deal
+_SPECIAL_PRICE_KEYS = (
+    "specialprice", "saleprice", "dealprice", "discountedprice", "finalprice", "currentprice", "recspecialprice",
+    "recspecialprices",
+)
+_REGULAR_PRICE_KEYS = ("price", "recprice", "prices", "unitprice", "amount")
+_PRICE_KEYS = _SPECIAL_PRICE_KEYS + _REGULAR_PRICE_KEYS
+_ORIGINAL_PRICE_KEYS = ("originalprice", "regularprice", "listprice", "compareatprice", "baseprice", "msrp", "wasprice")
+_DISCOUNT_KEYS = ("discountpercent", "percentoff", "discount", "discountvalue")
+# a key marking an item as on special, e.g. "isSpecial", "specialPrice", "dealName", "onSale"
+_SPECIAL_KEY_RE = re.compile(r"special|deal|promo|onsale|saleprice|discount")
+_KEY_RE = re.compile(r"[_\-\s]")
+_AMOUNT_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+# nested containers are searched this deep for deal lists
+_MAX_DEPTH = 8
+
+
+def _key(key: str) -> str:
+    return _KEY_RE.sub("", key).lower()
+
+
+def _field(item: Dict[str, Any], keys) -> Any:
+    normalized = {_key(k): v for k, v in item.items() if isinstance(k, str)}
+    for key in keys:
+        value = normalized.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _text(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, dict):
+        return _text(_field(value, _TITLE_KEYS))
+    if isinstance(value, list) and value:
+        return _text(value[0])
+    return None
+
+
+def _price_text(value: Any) -> Optional[str]:
+    """Price of a numeric, text, {amount: ...} or [price, ...] value, formatted like a page shows it"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        # integer cents are common, but indistinguishable from whole dollar prices; take them as dollars
+        return f"${value:,.2f}"
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        return value if "$" in value or not re.fullmatch(r"\d[\d,]*(?:\.\d+)?", value) else f"${value}"
+    if isinstance(value, dict):
+        return _price_text(_field(value, _PRICE_KEYS + ("value",)))
+    if isinstance(value, list):
+        prices = [p for p in (_price_text(v) for v in value) if p]
+        return prices[0] if prices else None
+    return None
+
+
+def _amount(price: Optional[str]) -> Optional[float]:
+    match = _AMOUNT_RE.search(price or "")
+    return float(match.group().replace(",", "")) if match else None
+
+
+def _on_special(item: Dict[str, Any], price: Optional[str], original_price: Optional[str], discount: Any) -> bool:
+    """Whether the item is a deal rather than a product at its regular price"""
+    if discount is not None and not (isinstance(discount, (int, float)) and discount <= 0):
+        return True
+    amount, original_amount = _amount(price), _amount(original_price)
+    if amount is not None and original_amount is not None and original_amount > amount:
+        return True
+    return any(
+        isinstance(key, str) and _SPECIAL_KEY_RE.search(_key(key)) and value not in (None, False, 0, "", [], {})
+        for key, value in item.items()
+    )
+
+
+def _product(item: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], bool]]:
+    """Deal record of an item with a name and a price or discount, and whether it is on special"""
+    title = _text(_field(item, _TITLE_KEYS))
+    special_price = _price_text(_field(item, _SPECIAL_PRICE_KEYS))
+    regular_price = _price_text(_field(item, _REGULAR_PRICE_KEYS))
+    price = special_price or regular_price
+    discount = _field(item, _DISCOUNT_KEYS)
+    if not title or (price is None and discount is None):
+        return None
+    original_price = _price_text(_field(item, _ORIGINAL_PRICE_KEYS))
+    if original_price is None and special_price is not None and regular_price != special_price:
+        original_price = regular_price
+    description = _text(_field(item, _DESCRIPTION_KEYS))
+    if isinstance(discount, (int, float)) and not isinstance(discount, bool) and 0 < discount < 100:
+        description = f"{description} - {discount:g}% off" if description else f"{discount:g}% off"
+    return {
+        "title": title,
+        "description": description or "No Description",
+        "price": price or "Price N/A",
+        "original_price": original_price or "N/A",
+    }, _on_special(item, price, original_price, discount)
+
+
+def _collect(data: Any, deals: List[Dict[str, Any]], limit: int, depth: int = 0) -> None:
+    if depth > _MAX_DEPTH or len(deals) >= limit:
+        return
+    if isinstance(data, list):
+        objects = [item for item in data if isinstance(item, dict)]
+        products = [product for product in map(_product, objects) if product]
+        if products and len(products) * 2 >= len(objects):
+            # a list of products: only those on special are deals; variants and options
+            # nested in the products are not products of their own
+            deals.extend(deal for deal, on_special in products if on_special)
+            return
+        for item in objects:
+            _collect(item, deals, limit, depth + 1)
+    elif isinstance(data, dict):
+        for value in data.values():
+            _collect(value, deals, limit, depth + 1)
+
+
+def deals_from_json(data: Any, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Deal records ({"title", "description", "price", "original_price"}, as the DOM extraction
+    returns them) of a JSON API response: the objects of any list in it, REST or GraphQL,
+    that have a name and a price or discount and are on special: with a discount, an
+    original price above the price or a special/deal key. Products at their regular price
+    are not deals, a menu of them leaves the page to the site profile and DOM extraction.
+    Lists in which most objects are not products (categories, filters, images) are ignored,
+    and so are lists nested in products (variants).
+    """
+    deals: List[Dict[str, Any]] = []
+    _collect(data, deals, limit)
+    return deals[:limit]
@@ -0,0 +1,177 @@
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# "2 for $40", "3/$25"
+_MULTI_BUY_RE = re.compile(r"(?P<quantity>\d+)\s*(?:for|/)\s*\$\s*(?P<total>\d[\d,]*(?:\.\d+)?)", re.IGNORECASE)
+# first dollar amount, "$25", "$1,299.99"; a bare number only when it is the whole text, "25.00"
+_PRICE_RE = re.compile(r"\$\s*(?P<price>\d[\d,]*(?:\.\d+)?)")
+_BARE_PRICE_RE = re.compile(r"^\s*(?P<price>\d[\d,]*(?:\.\d+)?)\s*$")
+_PERCENT_OFF_RE = re.compile(r"(?P<percent>\d+(?:\.\d+)?)\s*%\s*off", re.IGNORECASE)
+_BOGO_RE = re.compile(r"\bbogo\b|buy\s+one\s*,?\s+get\s+one", re.IGNORECASE)
+_WEIGHT_RE = re.compile(
+    r"(?P<amount>\d+(?:\.\d+)?|1/8|1/4|1/2)\s*(?P<unit>mg|g|grams?|oz|ounces?|ml)\b"
+    r"|\b(?P<named>eighth|quarter|half\s+ounce|half\s+oz)\b",
+    re.IGNORECASE,
+)
+
+# mg and ml are doses and volumes of edibles and drinks, they have no price per gram
+_GRAMS_PER_UNIT = {"g": 1.0, "gram": 1.0, "grams": 1.0, "oz": 28.0, "ounce": 28.0, "ounces": 28.0}
+_NAMED_WEIGHTS = {"eighth": (3.5, "g"), "quarter": (7.0, "g"), "half ounce": (14.0, "g"), "half oz": (14.0, "g")}
+_FRACTIONS = {"1/8": 0.125, "1/4": 0.25, "1/2": 0.5}
+
+# first matching category wins, checked against title and description
+CATEGORIES: Sequence[Tuple[str, Tuple[str, ...]]] = (
+    ("pre-roll", ("pre-roll", "preroll", "pre roll", "joint", "blunt")),
+    ("vape", ("vape", "cartridge", "cart", "pod", "disposable")),
+    ("edible", ("edible", "gummy", "gummies", "chocolate", "cookie", "candy", "chew", "mint")),
+    ("concentrate", ("concentrate", "wax", "shatter", "rosin", "resin", "badder", "budder", "crumble", "diamonds", "hash", "kief", "dab")),
+    ("tincture", ("tincture", "oil drops", "sublingual")),
+    ("topical", ("topical", "lotion", "balm", "salve", "cream", "patch")),
+    ("beverage", ("beverage", "drink", "soda", "seltzer", "tea")),
+    ("accessory", ("accessory", "accessories", "grinder", "pipe", "bong", "papers", "lighter", "battery")),
+    ("flower", ("flower", "bud", "eighth", "ounce", "smalls", "shake", "indica", "sativa", "hybrid")),
+)
+_CATEGORY_RES = [
+    (category, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")s?\b", re.IGNORECASE))
+    for category, keywords in CATEGORIES
+]
+
+COLUMNS = [
+    "location", "website_url", "kind", "title", "description", "category",
+    "price_text", "price", "quantity", "unit_price", "original_price_text", "original_price",
+    "discount_pct", "weight", "weight_unit", "weight_grams", "price_per_gram",
+]
+
+
+def _records(report: Dict[str, List[Dict[str, Any]]]) -> Iterable[Dict[str, Any]]:
+    for key, deals in report.items():
+        location, _, website_url = key.partition(" - ")
+        for deal in deals:
+            if "error" in deal:
+                kind = "error"
+            elif "full_page_deals_text" in deal:
+                kind = "fallback"
+            else:
+                kind = "deal"
+            yield {
+                "location": location,
+                "website_url": deal.get("website_url") or website_url,
+                "kind": kind,
+                "title": deal.get("title"),
+                "description": deal.get("description") or deal.get("error") or deal.get("full_page_deals_text"),
+                "price_text": deal.get("price"),
+                "original_price_text": deal.get("original_price"),
+            }
+
+
+def _price(texts: pd.Series) -> pd.Series:
+    return _to_number(texts.str.extract(_PRICE_RE)["price"]).fillna(
+        _to_number(texts.str.extract(_BARE_PRICE_RE)["price"])
+    )
+
+
+def parse_price(text: Optional[str]) -> Optional[float]:
+    """Unit price of a single price text, the scalar counterpart of the price columns"""
+    if not text:
+        return None
+    multi_buy = _MULTI_BUY_RE.search(text)
+    if multi_buy:
+        return float(multi_buy["total"].replace(",", "")) / max(int(multi_buy["quantity"]), 1)
+    match = _PRICE_RE.search(text) or _BARE_PRICE_RE.search(text)
+    return float(match["price"].replace(",", "")) if match else None
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce").astype("float64")
+
+
+def _category(texts: pd.Series) -> pd.Series:
+    categories = pd.Series(None, index=texts.index, dtype="object")
+    for category, pattern in _CATEGORY_RES:
+        unassigned = categories.isna()
+        if not unassigned.any():
+            break
+        categories[unassigned & texts.str.contains(pattern, na=False)] = category
+    return categories.fillna("other")
+
+
+def _weights(texts: pd.Series) -> pd.DataFrame:
+    match = texts.str.extract(_WEIGHT_RE)
+    amount = match["amount"].map(lambda v: _FRACTIONS.get(v, v) if isinstance(v, str) else v)
+    amount = pd.to_numeric(amount, errors="coerce").astype("float64")
+    unit = match["unit"].str.lower()
+    named = match["named"].str.lower().str.replace(r"\s+", " ", regex=True)
+    named_weights = named.map(lambda v: _NAMED_WEIGHTS.get(v, (None, None)) if isinstance(v, str) else (None, None))
+    # fill with columns of the filled column's dtype, filling from object columns is deprecated
+    amount = amount.fillna(named_weights.str[0].astype("float64"))
+    unit = unit.where(unit.notna(), named_weights.str[1])
+    grams = amount * unit.map(_GRAMS_PER_UNIT).astype("float64")
+    return pd.DataFrame({"weight": amount, "weight_unit": unit, "weight_grams": grams})
+
+
+def normalize_deals(report: Dict[str, List[Dict[str, Any]]]) -> pd.DataFrame:
+    """
+    Columnar table of the deals of a multi-site report ({"<location> - <url>": [deal, ...]},
+    as run_hash_deals_agents_ui builds it), one row per deal with COLUMNS.
+
+    Prices, multi-buy offers ("2 for $40"), percentages off, weights and categories are parsed
+    with compiled patterns applied to whole columns at once; unparsable values are NaN, so
+    the table can be filtered, sorted and aggregated directly.
+    """
+    df = pd.DataFrame.from_records(list(_records(report)), columns=[
+        "location", "website_url", "kind", "title", "description", "price_text", "original_price_text",
+    ])
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    text = (df["title"].fillna("") + " " + df["description"].fillna("") + " " + df["price_text"].fillna(""))
+
+    multi_buy = df["price_text"].str.extract(_MULTI_BUY_RE)
+    quantity = pd.to_numeric(multi_buy["quantity"], errors="coerce").astype("float64")
+    total = _to_number(multi_buy["total"])
+    df["price"] = total.fillna(_price(df["price_text"]))
+    df["quantity"] = quantity.fillna(1).where(df["price"].notna())
+    df["unit_price"] = df["price"] / df["quantity"]
+    df["original_price"] = _price(df["original_price_text"])
+
+    discount = (1 - df["unit_price"] / df["original_price"]) * 100
+    discount = discount.where(df["original_price"] > 0)
+    percent_off = pd.to_numeric(text.str.extract(_PERCENT_OFF_RE)["percent"], errors="coerce").astype("float64")
+    bogo = pd.Series(50.0, index=df.index).where(text.str.contains(_BOGO_RE, na=False))
+    df["discount_pct"] = discount.fillna(percent_off).fillna(bogo).round(1)
+
+    df = df.join(_weights(text))
+    df["price_per_gram"] = df["unit_price"] / df["weight_grams"]
+    df["category"] = _category(text)
+    not_deal = df["kind"] != "deal"
+    df.loc[not_deal, "category"] = None
+    return df[COLUMNS]
+
+
+def aggregate_deals(df: pd.DataFrame, by: Sequence[str] = ("location", "category")) -> pd.DataFrame:
+    """Number of deals and price statistics per group"""
+    deals = df[df["kind"] == "deal"]
+    return (
+        deals.groupby(list(by), dropna=False)
+        .agg(
+            deals=("title", "size"),
+            min_unit_price=("unit_price", "min"),
+            median_unit_price=("unit_price", "median"),
+            max_discount_pct=("discount_pct", "max"),
+            min_price_per_gram=("price_per_gram", "min"),
+        )
+        .reset_index()
+    )
+
+
+def export_deals(df: pd.DataFrame, path: str) -> str:
+    """Write the table as CSV, or as Parquet for a .parquet path (needs pyarrow or fastparquet)"""
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
@@ -0,0 +1,166 @@
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .deal_dedup import deal_words
+from .deal_normalizer import normalize_deals
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    website_url TEXT,
+    location TEXT,
+    title TEXT,
+    title_key TEXT,
+    description TEXT,
+    category TEXT,
+    price_text TEXT,
+    price REAL,
+    quantity REAL,
+    unit_price REAL,
+    original_price REAL,
+    discount_pct REAL,
+    weight_grams REAL,
+    price_per_gram REAL
+);
+CREATE INDEX IF NOT EXISTS idx_deals_title_observed ON deals (title_key, observed_at);
+CREATE INDEX IF NOT EXISTS idx_deals_site_observed ON deals (website_url, location, observed_at);
+CREATE INDEX IF NOT EXISTS idx_deals_category_observed ON deals (category, observed_at);
+CREATE INDEX IF NOT EXISTS idx_deals_run ON deals (run_id);
+"""
+
+_COLUMNS = (
+    "website_url", "location", "title", "description", "category", "price_text", "price", "quantity",
+    "unit_price", "original_price", "discount_pct", "weight_grams", "price_per_gram",
+)
+
+# best deal metrics, lower is better
+METRICS = ("unit_price", "price_per_gram", "price")
+
+
+def title_key(title: Optional[str]) -> str:
+    return " ".join(deal_words(title))
+
+
+class DealStore:
+    """
+    Every normalized deal of every hash deals run, with its site, location and time, in a
+    local SQLite file. Indexed for the price history of a deal and for the current deals of
+    each site, so reports and analytics run against stored data instead of a new scrape.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("DEALS_DB", "./tmp/deals.db")
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def record(self, deals: pd.DataFrame, observed_at: Optional[float] = None, run_id: Optional[str] = None) -> str:
+        """Store the deal rows of a normalize_deals table as one run; returns the run id"""
+        run_id = run_id or str(uuid.uuid4())
+        observed_at = observed_at or time.time()
+        rows = deals[deals["kind"] == "deal"]
+        # NaN and missing values are stored as NULL
+        values = rows[list(_COLUMNS)].astype(object).where(rows[list(_COLUMNS)].notna(), None)
+        records = [
+            (run_id, observed_at, title_key(row[2]), *row)
+            for row in values.itertuples(index=False, name=None)
+        ]
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT INTO deals (run_id, observed_at, title_key, {', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 3))})",
+                records,
+            )
+            conn.execute("COMMIT")
+        logger.info(f"Stored {len(records)} deals of run {run_id}")
+        return run_id
+
+    def record_report(self, report: Dict[str, List[Dict[str, Any]]], observed_at: Optional[float] = None) -> str:
+        """Normalize and store a multi-site report ({"<location> - <url>": [deal, ...]})"""
+        return self.record(normalize_deals(report), observed_at=observed_at)
+
+    def price_history(self, title: str, website_url: Optional[str] = None, location: Optional[str] = None,
+                      partial: bool = False) -> List[Dict[str, Any]]:
+        """Observations of a deal over time, oldest first. With partial, titles containing title match too."""
+        key = title_key(title)
+        query = "SELECT observed_at, website_url, location, title, price, unit_price, original_price, discount_pct, " \
+                "price_per_gram FROM deals WHERE "
+        if partial:
+            query += "(title_key = ? OR title_key LIKE ?)"
+            params: List[Any] = [key, f"%{key}%"]
+        else:
+            query += "title_key = ?"
+            params = [key]
+        if website_url:
+            query += " AND website_url = ?"
+            params.append(website_url)
+        if location:
+            query += " AND location = ?"
+            params.append(location)
+        query += " ORDER BY observed_at"
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def best_current_deals(self, category: Optional[str] = None, metric: str = "unit_price",
+                           location: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Lowest metric per category among the current deals, i.e. those of the latest run of
+        every site and location.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Invalid metric {metric}, expected one of {', '.join(METRICS)}")
+        filters, params = [f"d.{metric} IS NOT NULL"], []
+        if category:
+            filters.append("d.category = ?")
+            params.append(category)
+        if location:
+            filters.append("d.location = ?")
+            params.append(location)
+        query = f"""
+            WITH latest AS (
+                SELECT website_url, location, MAX(observed_at) AS observed_at
+                FROM deals GROUP BY website_url, location
+            ),
+            ranked AS (
+                SELECT d.*, ROW_NUMBER() OVER (PARTITION BY d.category ORDER BY d.{metric}, d.observed_at DESC) AS rank
+                FROM deals d JOIN latest l
+                    ON d.website_url IS l.website_url AND d.location IS l.location AND d.observed_at = l.observed_at
+                WHERE {' AND '.join(filters)}
+            )
+            SELECT * FROM ranked WHERE rank = 1 ORDER BY category
+        """
+        with self._connect() as conn:
+            return [
+                {k: row[k] for k in row.keys() if k not in ("id", "rank", "title_key")}
+                for row in conn.execute(query, params)
+            ]
+
+    def frame(self, since: Optional[float] = None) -> pd.DataFrame:
+        """All stored deals, or those observed since a timestamp, as a DataFrame for analytics"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM deals WHERE observed_at >= ? ORDER BY observed_at", conn, params=(since or 0,)
+            )
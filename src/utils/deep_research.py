@@ -24,7 +24,7 @@ from json_repair import repair_json
 from src.agent.custom_prompts import CustomSystemPrompt, CustomAgentMessagePrompt
 from src.controller.custom_controller import CustomController
 from src.browser.custom_browser import CustomBrowser
-from src.browser.custom_context import BrowserContextConfig, BrowserContext
+from src.browser.custom_context import BrowserContextConfig, BrowserContext, CustomBrowserContextConfig
 from browser_use.browser.context import (
     BrowserContextConfig,
     BrowserContextWindowSize,
@@ -43,8 +43,19 @@ async def deep_research(task, llm, agent_state=None, **kwargs):
     max_query_num = kwargs.get("max_query_num", 3)
 
     use_own_browser = kwargs.get("use_own_browser", False)
+    # name of a saved login state, see src/browser/context_templates.py
+    context_template = kwargs.get("context_template", None)
     extra_chromium_args = []
-    if use_own_browser:
+    if context_template:
+        # every query agent gets its own context cloned from the template, so they can still run in parallel
+        browser = CustomBrowser(
+            config=BrowserConfig(
+                headless=kwargs.get("headless", False),
+                disable_security=kwargs.get("disable_security", True),
+            )
+        )
+        browser_context = None
+    elif use_own_browser:
         # TODO: if use own browser, max query num must be 1 per iter, how to solve it?
         max_query_num = 1
         chrome_path = os.getenv("CHROME_PATH", None)
@@ -214,7 +225,7 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
             # Parallel BU agents
             add_infos = "1. Please click on the most relevant link to get information and go deeper, instead of just staying on the search page. \n" \
                         "2. When opening a PDF file, please remember to extract the content using extract_content instead of simply opening it for the user to view.\n"
-            if use_own_browser:
+            if use_own_browser and not context_template:
                 agent = CustomAgent(
                     task=query_tasks[0],
                     llm=llm,
@@ -237,20 +248,30 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
                     await page.close()
 
             else:
+                query_contexts = [
+                    await browser.new_context(config=CustomBrowserContextConfig(context_template=context_template))
+                    if context_template else browser_context
+                    for _ in query_tasks
+                ]
                 agents = [CustomAgent(
                     task=task,
                     llm=llm,
                     add_infos=add_infos,
                     browser=browser,
-                    browser_context=browser_context,
+                    browser_context=query_context,
                     use_vision=use_vision,
                     system_prompt_class=CustomSystemPrompt,
                     agent_prompt_class=CustomAgentMessagePrompt,
                     max_actions_per_step=5,
                     controller=controller,
-                ) for task in query_tasks]
-                query_results = await asyncio.gather(
-                    *[agent.run(max_steps=kwargs.get("max_steps", 10)) for agent in agents])
+                ) for task, query_context in zip(query_tasks, query_contexts)]
+                try:
+                    query_results = await asyncio.gather(
+                        *[agent.run(max_steps=kwargs.get("max_steps", 10)) for agent in agents])
+                finally:
+                    if context_template:
+                        for query_context in query_contexts:
+                            await query_context.close()
 
             if agent_state and agent_state.is_stop_requested():
                 # Stop
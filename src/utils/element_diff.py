@@ -0,0 +1,136 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ElementTreeView:
+    """What the state message shows for the interactive elements of one step"""
+
+    text: str
+    is_snapshot: bool
+    snapshot_step: int
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+@dataclass
+class _Snapshot:
+    url: str
+    step: int
+    lines: Dict[str, str] = field(default_factory=dict)
+
+
+class ElementTreeDiffer:
+    """
+    Renders the interactive elements of a page as a diff against the last full snapshot.
+
+    Elements are keyed by their branch-path and xpath hashes, so the key survives
+    attribute and text changes. An element whose rendered line differs from the snapshot
+    (text, attributes or highlight index) is reported as changed. A new full snapshot is
+    taken on the first step, on URL change, every `full_snapshot_interval` steps, or when
+    the diff would be larger than `max_diff_ratio` of the full list.
+    """
+
+    def __init__(self, full_snapshot_interval: int = 5, max_diff_ratio: float = 0.5):
+        self.full_snapshot_interval = full_snapshot_interval
+        self.max_diff_ratio = max_diff_ratio
+        self._snapshot: Optional[_Snapshot] = None
+
+    def reset(self) -> None:
+        """Force a full snapshot on the next render"""
+        self._snapshot = None
+
+    def render(self, state: BrowserState, include_attributes: list[str], step_number: int) -> ElementTreeView:
+        lines = self._element_lines(state, include_attributes)
+        snapshot = self._snapshot
+
+        if (
+                snapshot is None
+                or snapshot.url != state.url
+                or step_number - snapshot.step >= self.full_snapshot_interval
+        ):
+            return self._take_snapshot(state, include_attributes, lines, step_number)
+
+        added = [line for key, line in lines.items() if key not in snapshot.lines]
+        changed = [
+            line for key, line in lines.items()
+            if key in snapshot.lines and snapshot.lines[key] != line
+        ]
+        removed = [line for key, line in snapshot.lines.items() if key not in lines]
+        unchanged = len(lines) - len(added) - len(changed)
+
+        if len(added) + len(changed) + len(removed) > self.max_diff_ratio * max(len(lines), 1):
+            return self._take_snapshot(state, include_attributes, lines, step_number)
+
+        if not added and not changed and not removed:
+            text = f"No changes since the element snapshot of step {snapshot.step} ({unchanged} elements)."
+        else:
+            text = (
+                f"Changes since the element snapshot of step {snapshot.step}; "
+                f"the {unchanged} unchanged elements keep their index from the snapshot.\n"
+            )
+            if added:
+                text += "Added:\n" + "\n".join(added) + "\n"
+            if changed:
+                text += "Changed:\n" + "\n".join(changed) + "\n"
+            if removed:
+                # removed elements no longer have a valid index
+                text += "Removed (no longer on the page):\n" + "\n".join(
+                    line.split("]", 1)[-1] for line in removed
+                )
+        logger.debug(
+            f"Element diff vs step {snapshot.step}: +{len(added)} ~{len(changed)} -{len(removed)} ={unchanged}"
+        )
+        return ElementTreeView(
+            text=text.strip(),
+            is_snapshot=False,
+            snapshot_step=snapshot.step,
+            added=len(added),
+            changed=len(changed),
+            removed=len(removed),
+            unchanged=unchanged,
+        )
+
+    def _take_snapshot(
+            self,
+            state: BrowserState,
+            include_attributes: list[str],
+            lines: Dict[str, str],
+            step_number: int,
+    ) -> ElementTreeView:
+        self._snapshot = _Snapshot(url=state.url, step=step_number, lines=lines)
+        text = state.element_tree.clickable_elements_to_string(include_attributes=include_attributes)
+        return ElementTreeView(text=text, is_snapshot=True, snapshot_step=step_number, unchanged=len(lines))
+
+    @staticmethod
+    def _element_lines(state: BrowserState, include_attributes: list[str]) -> Dict[str, str]:
+        lines: Dict[str, str] = {}
+        for index, node in sorted(state.selector_map.items()):
+            lines[ElementTreeDiffer._element_key(node)] = ElementTreeDiffer._element_line(
+                index, node, include_attributes
+            )
+        return lines
+
+    @staticmethod
+    def _element_key(node: DOMElementNode) -> str:
+        hashed = node.hash
+        return f"{hashed.branch_path_hash}:{hashed.xpath_hash}"
+
+    @staticmethod
+    def _element_line(index: int, node: DOMElementNode, include_attributes: list[str]) -> str:
+        # same format as DOMElementNode.clickable_elements_to_string
+        attributes_str = ''
+        if include_attributes:
+            attributes_str = ' ' + ' '.join(
+                f'{key}="{value}"' for key, value in node.attributes.items() if key in include_attributes
+            )
+        text = node.get_all_text_till_next_clickable_element()
+        return f'[{index}]<{node.tag_name}{attributes_str}>{text}</{node.tag_name}>'
@@ -1,61 +1,62 @@
 import asyncio
 import logging
-from src.agent.custom_agent import CustomAgent
+import os
+import time
+from src.agent.custom_agent import CustomAgent, agent_options_from_env
 from src.utils import utils
 from src.agent.custom_prompts import CustomSystemPrompt, CustomAgentMessagePrompt, HashDealsSystemPrompt, HashDealsAgentMessagePrompt # Ensure HashDeals prompts are imported
 from src.controller.custom_controller import CustomController
+from src.browser.custom_browser import CustomBrowser
+from src.browser.custom_context import CustomBrowserContextConfig
+from src.browser.recorder import recording_config_from_env
+from src.browser.response_capture import response_capture_config_from_env
+from src.browser.smart_wait import smart_wait
+from src.utils.screenshot import ScreenshotConfig, screenshot_config_from_env
+from src.utils.deal_changes import (
+    SiteSnapshot, SnapshotStore, deals_fingerprint, deals_page_source, deals_page_url, diff_deals, fetch_validators,
+    validated_by_http,
+)
+from src.utils.deal_crawler import extract_page_deals
 from browser_use.browser.browser import BrowserConfig, Browser
 from browser_use.browser.context import BrowserContextConfig, BrowserContextWindowSize
 from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
-async def hash_deals_agent(website_url: str, location_name: str, llm, headless: bool = False, disable_security: bool = True) -> List[Dict[str, Any]]:
+async def hash_deals_agent(website_url: str, location_name: str, llm, headless: bool = False, disable_security: bool = True,
+                           screenshot_config: Optional[ScreenshotConfig] = None,
+                           browser: Optional[CustomBrowser] = None,
+                           controller: Optional[CustomController] = None,
+                           crawl: Optional[bool] = None) -> List[Dict[str, Any]]:
     """
     Agent to extract hash deals from a given dispensary website with dynamic navigation.
+    screenshot_config controls how vision screenshots are downscaled and encoded for the LLM (default SCREENSHOT_*).
+    browser: an already running browser to open the context in; it is left open afterwards
+    controller: a fresh CustomController to read the deal index and page fingerprints from afterwards
+    crawl: crawl the deals pages of the site before the agent's first step (default HASH_DEALS_CRAWL)
     """
     deals_list: List[Dict[str, Any]] = []
-    browser = None
+    owns_browser = browser is None
     browser_context = None
     try:
-        controller = CustomController()
+        # registers the age gate, deals page, extraction, crawl and carousel actions the agent uses
+        controller = controller or CustomController()
 
-        @controller.registry.action(
-            "Handle age verification if present using provided details."
-        )
-        async def handle_age_verification(browser: BrowserContext):
-            return await controller.registry.actions["Handle age verification if present using provided details."](browser=browser)
-
-        @controller.registry.action(
-            "Navigate to deals or discounts page if available."
-        )
-        async def navigate_to_deals_page(browser: BrowserContext):
-            return await controller.registry.actions["Navigate to deals or discounts page if available."](browser=browser)
-
-        @controller.registry.action(
-            "Extract deals and discounts information from the current page."
-        )
-        async def extract_deals_information(browser: BrowserContext):
-            return await controller.registry.actions["Extract deals and discounts information from the current page."](browser=browser)
-
-        @controller.registry.action(
-            "Handle image carousel for deals by clicking right arrow multiple times."
-        )
-        async def handle_image_carousel_deals(browser: BrowserContext):
-            return await controller.registry.actions["Handle image carousel for deals by clicking right arrow multiple times."](browser=browser)
-
-
-        browser = Browser(
-            config=BrowserConfig(
-                headless=headless,
-                disable_security=disable_security,
+        if owns_browser:
+            browser = CustomBrowser(
+                config=BrowserConfig(
+                    headless=headless,
+                    disable_security=disable_security,
+                )
             )
-        )
         try:
             browser_context = await browser.new_context(
-                config=BrowserContextConfig(
+                config=CustomBrowserContextConfig(
                     no_viewport=False,
                     browser_window_size=BrowserContextWindowSize(width=1280, height=1080),
+                    screenshot_config=screenshot_config or screenshot_config_from_env(),
+                    recording_config=recording_config_from_env(),
+                    response_capture=response_capture_config_from_env(),
                 )
             )
         except Exception as website_connect_error:
@@ -63,6 +64,16 @@ async def hash_deals_agent(website_url: str, location_name: str, llm, headless:
             logger.error(error_message)
             return [{"error": error_message, "website_url": website_url}]
 
+        initial_actions = [ # Simplified initial actions - only go_to_url and age verification
+            {"go_to_url": {"url": website_url}},
+            {"handle_age_verification": {}},
+        ]
+        if crawl is None:
+            crawl = os.getenv("HASH_DEALS_CRAWL", "false").lower() == "true"
+        if crawl:
+            # the agent starts with the deals of the whole site and only looks for what the crawl missed
+            initial_actions.append({"crawl_deals_pages": {}})
+
         agent = CustomAgent(
             task=f"Find deals and discounts on the dispensary website for {location_name}.",
             llm=llm,
@@ -72,32 +83,120 @@ async def hash_deals_agent(website_url: str, location_name: str, llm, headless:
             system_prompt_class=HashDealsSystemPrompt, # Use HashDealsSystemPrompt
             agent_prompt_class=HashDealsAgentMessagePrompt, # Use HashDealsAgentMessagePrompt
             max_actions_per_step=5,
-            is_hash_deals_agent=True # Ensure flag is set
+            is_hash_deals_agent=True, # Ensure flag is set
+            # converted to the controller's action models by the agent
+            initial_actions=initial_actions,
+            **agent_options_from_env(),
         )
 
-        initial_actions = [ # Simplified initial actions - only go_to_url and age verification
-            {"go_to_url": {"url": website_url}},
-            {"handle_age_verification": {}},
-        ]
-        agent.initial_actions = initial_actions # Set simplified initial actions
         history = await agent.run(max_steps=20)
+        if not history.is_done():
+            browser_context.mark_failed()
 
-        for step_history in history.history:
-            for result_item in step_history.result:
-                if result_item.structured_content:
-                    if isinstance(result_item.structured_content, list):
-                        deals_list.extend(result_item.structured_content)
-                    else:
-                        deals_list.append(result_item.structured_content)
+        # every deal the controller's actions extracted, the initial crawl's too: browser_use does
+        # not record the results of initial actions in the history
+        deals = controller.deal_index.deals()
+        if any(deal.get("title") for deal in deals):
+            # page text fallbacks only matter for sites without any deals container
+            deals = [deal for deal in deals if "full_page_deals_text" not in deal]
+        deals_list.extend(deals)
 
 
     except Exception as e:
         error_message = f"Error processing {website_url}: {type(e).__name__} - {e}"
         logger.error(error_message)
         deals_list.append({"error": error_message, "website_url": website_url})
+        if browser_context:
+            browser_context.mark_failed()
     finally:
         if browser_context:
             await browser_context.close()
-        if browser:
+        if browser and owns_browser:
             await browser.close()
     return deals_list
+
+
+async def _unchanged_since(snapshot: SiteSnapshot, browser: Optional[CustomBrowser], headless: bool,
+                           disable_security: bool) -> Optional[str]:
+    """How the deals page of snapshot was confirmed unchanged ("http" or "dom"), None if it changed"""
+    if validated_by_http(snapshot.source) and (snapshot.etag or snapshot.last_modified):
+        validators = await fetch_validators(snapshot.deals_page_url, snapshot.etag, snapshot.last_modified)
+        if validators["unchanged"]:
+            return "http"
+    if not snapshot.content_hash:
+        return None
+    owns_browser = browser is None
+    if owns_browser:
+        browser = CustomBrowser(config=BrowserConfig(headless=headless, disable_security=disable_security))
+    browser_context = None
+    try:
+        browser_context = await browser.new_context(config=CustomBrowserContextConfig(
+            no_viewport=False, response_capture=response_capture_config_from_env()
+        ))
+        page = await browser_context.get_current_page()
+        await page.goto(snapshot.deals_page_url, wait_until="domcontentloaded", timeout=30000)
+        await smart_wait.settle(page)
+        # read the deals the way the scrape did, so API and site profile deals are compared too
+        source, deals = await extract_page_deals(page, capture=browser_context.response_capture)
+        fingerprint = deals_fingerprint(deals) if source != "body" else None
+    except Exception as e:
+        logger.info(f"Change check of {snapshot.deals_page_url} failed, scraping it again: {e}")
+        return None
+    finally:
+        if browser_context:
+            await browser_context.close()
+        if owns_browser:
+            await browser.close()
+    return "dom" if fingerprint == snapshot.content_hash else None
+
+
+async def incremental_hash_deals_agent(website_url: str, location_name: str, llm, store: SnapshotStore,
+                                       headless: bool = False, disable_security: bool = True,
+                                       screenshot_config: Optional[ScreenshotConfig] = None,
+                                       browser: Optional[CustomBrowser] = None) -> Dict[str, Any]:
+    """
+    hash_deals_agent for recurring runs. A site whose deals page is unchanged since the last
+    scrape, by HTTP validators (for deals of the document's own deals container) or by the hash
+    of its deals read again, is not scraped again and its stored deals are returned. Otherwise the site is scraped and compared with the last run.
+
+    Returns {"status": "new" | "changed" | "unchanged" | "error", "deals": [...],
+    "changes": {"added": [...], "removed": [...], "changed": [...]}, "checked_by": "http" | "dom" | None}
+    """
+    snapshot = store.get(website_url, location_name)
+    if snapshot is not None and snapshot.deals_page_url:
+        checked_by = await _unchanged_since(snapshot, browser, headless, disable_security)
+        if checked_by:
+            logger.info(f"Deals of {website_url} unchanged ({checked_by} check), skipping the scrape")
+            snapshot.checked_at = time.time()
+            store.put(snapshot)
+            return {"status": "unchanged", "deals": snapshot.deals,
+                    "changes": {"added": [], "removed": [], "changed": []}, "checked_by": checked_by}
+
+    controller = CustomController()
+    deals = await hash_deals_agent(website_url, location_name, llm, headless, disable_security,
+                                   screenshot_config=screenshot_config, browser=browser, controller=controller)
+    if not deals or all("error" in deal for deal in deals):
+        # keep the last good snapshot
+        return {"status": "error", "deals": deals, "changes": {"added": [], "removed": [], "changed": []},
+                "checked_by": None}
+
+    page_url = deals_page_url(deals, website_url)
+    source = deals_page_source(deals, page_url)
+    validators = {"etag": None, "last_modified": None}
+    if validated_by_http(source):
+        validators = await fetch_validators(page_url)
+    now = time.time()
+    store.put(SiteSnapshot(
+        website_url=website_url,
+        location=location_name,
+        deals_page_url=page_url,
+        etag=validators["etag"],
+        last_modified=validators["last_modified"],
+        content_hash=controller.page_fingerprints.get(page_url),
+        source=source,
+        deals=deals,
+        scraped_at=now,
+        checked_at=now,
+    ))
+    changes = diff_deals(snapshot.deals if snapshot else [], deals)
+    return {"status": "changed" if snapshot else "new", "deals": deals, "changes": changes, "checked_by": None}
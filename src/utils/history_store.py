@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Type
+
+from browser_use.agent.views import AgentHistory, AgentHistoryList, AgentOutput
+
+from .artifact_retention import open_artifact
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = "screenshots"
+
+_IMAGE_EXTENSIONS = ((b"\x89PNG", ".png"), (b"\xff\xd8", ".jpg"), (b"RIFF", ".webp"))
+
+
+def _image_extension(data: bytes) -> str:
+    for magic, ext in _IMAGE_EXTENSIONS:
+        if data.startswith(magic):
+            return ext
+    return ".png"
+
+
+class HistoryWriter:
+    """
+    Append-only agent history: one JSON line per step in {directory}/{run_id}.jsonl, flushed
+    as soon as the step is recorded, so a crash loses at most the step in progress.
+
+    Screenshots are not inlined as base64; each is written once to
+    {directory}/screenshots/<sha256>.<ext> and the line references it by that relative path,
+    which also shares identical screenshots between steps and runs.
+    """
+
+    def __init__(self, directory: str, run_id: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self.steps = 0
+        os.makedirs(os.path.join(directory, SCREENSHOT_DIR), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _store_screenshot(self, screenshot: str) -> str:
+        data = base64.b64decode(screenshot)
+        name = hashlib.sha256(data).hexdigest() + _image_extension(data)
+        relative_path = f"{SCREENSHOT_DIR}/{name}"
+        path = os.path.join(self.directory, relative_path)
+        try:
+            # a screenshot shared with an earlier run is as recent as its newest reference for retention
+            os.utime(path)
+        except FileNotFoundError:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return relative_path
+
+    def append(self, item: AgentHistory) -> None:
+        step = item.model_dump()
+        screenshot = step["state"].pop("screenshot", None)
+        step["state"]["screenshot_file"] = self._store_screenshot(screenshot) if screenshot else None
+        self.steps += 1
+        step["step"] = self.steps
+        self._file.write(json.dumps(step, default=str) + "\n")
+        self._file.flush()
+
+    def extend(self, items: List[AgentHistory]) -> None:
+        for item in items:
+            self.append(item)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> "HistoryWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_history(history: AgentHistoryList, directory: str, run_id: str) -> str:
+    """Store a finished history in the streamed format; returns the .jsonl path"""
+    with HistoryWriter(directory, run_id) as writer:
+        writer.extend(history.history)
+    return writer.path
+
+
+class HistoryReader:
+    """
+    Lazy reader of a HistoryWriter file. Steps are parsed one line at a time and screenshots
+    are only read when asked for; final_result() and is_done() read just the last line.
+    Files compressed by the retention manager are read transparently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.directory = os.path.dirname(path)
+
+    def _lines(self) -> Iterator[bytes]:
+        with open_artifact(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    def steps(self) -> Iterator[Dict[str, Any]]:
+        for line in self._lines():
+            yield json.loads(line)
+
+    def step(self, number: int) -> Optional[Dict[str, Any]]:
+        """Step by its 1-based number"""
+        for index, line in enumerate(self._lines(), start=1):
+            if index == number:
+                return json.loads(line)
+        return None
+
+    def last_step(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            # compressed, it can only be read front to back
+            last = None
+            for last in self._lines():
+                pass
+            return json.loads(last) if last else None
+        with open(self.path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            block, data = 8192, b""
+            position = end
+            while position > 0:
+                read = min(block, position)
+                position -= read
+                f.seek(position)
+                data = f.read(read) + data
+                lines = [line for line in data.split(b"\n") if line.strip()]
+                # the first line of the buffer may be cut unless the start of the file was reached
+                if len(lines) > 1 or (lines and position == 0):
+                    return json.loads(lines[-1])
+        return None
+
+    def final_result(self) -> Optional[str]:
+        step = self.last_step()
+        if step and step["result"]:
+            return step["result"][-1].get("extracted_content")
+        return None
+
+    def is_done(self) -> bool:
+        step = self.last_step()
+        return bool(step and step["result"] and step["result"][-1].get("is_done"))
+
+    def errors(self) -> List[str]:
+        return [r["error"] for step in self.steps() for r in step["result"] if r.get("error")]
+
+    def model_actions(self) -> List[dict]:
+        actions = []
+        for step in self.steps():
+            if step["model_output"]:
+                for action, element in zip(step["model_output"]["action"], step["state"]["interacted_element"]):
+                    actions.append({**action, "interacted_element": element})
+        return actions
+
+    def model_thoughts(self) -> List[dict]:
+        return [step["model_output"]["current_state"] for step in self.steps() if step["model_output"]]
+
+    def screenshot(self, step: Dict[str, Any]) -> Optional[str]:
+        """Base64 screenshot of a step, read from the screenshot store; None if retention removed it"""
+        relative_path = step["state"].get("screenshot_file")
+        if not relative_path:
+            return None
+        try:
+            with open(os.path.join(self.directory, relative_path), "rb") as f:
+                return base64.b64encode(f.read()).decode()
+        except FileNotFoundError:
+            logger.debug(f"Screenshot {relative_path} of {self.path} was removed")
+            return None
+
+    def load(self, output_model: Type[AgentOutput]) -> AgentHistoryList:
+        """The full AgentHistoryList, screenshots included, as AgentHistoryList.load_from_file returns it"""
+        history = []
+        for step in self.steps():
+            step.pop("step", None)
+            step["state"]["screenshot"] = self.screenshot(step)
+            step["state"].pop("screenshot_file", None)
+            if step["model_output"]:
+                step["model_output"] = output_model.model_validate(step["model_output"])
+            history.append(step)
+        return AgentHistoryList.model_validate({"history": history})
@@ -0,0 +1,60 @@
+from typing import Any, List, Optional
+
+from browser_use.agent.views import AgentBrain, AgentHistory, AgentHistoryList
+
+from ..agent.custom_views import DealsActionResult
+
+
+class HistorySummary:
+    """
+    The views the runners read from an agent history (final_result, errors, model_actions,
+    model_thoughts, structured_content), computed in one traversal.
+
+    The summary is updated with add() as steps are recorded, so reading it after a run is
+    O(1) regardless of the number of steps. Values match the AgentHistoryList methods of
+    the same names.
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.final_result: Optional[str] = None
+        self.is_done = False
+        self.errors: List[str] = []
+        self.model_actions: List[dict] = []
+        self.model_thoughts: List[AgentBrain] = []
+        self.structured_content: List[Any] = []
+        self.urls: List[str] = []
+
+    @classmethod
+    def from_history(cls, history: AgentHistoryList) -> "HistorySummary":
+        summary = cls()
+        for item in history.history:
+            summary.add(item)
+        return summary
+
+    @classmethod
+    def for_agent(cls, agent, history: AgentHistoryList) -> "HistorySummary":
+        """The summary the agent kept while running, or one computed from history for other agents"""
+        summary = getattr(agent, "history_summary", None)
+        if summary is not None and summary.steps == len(history.history):
+            return summary
+        return cls.from_history(history)
+
+    def add(self, item: AgentHistory) -> None:
+        self.steps += 1
+        for result in item.result:
+            if result.error:
+                self.errors.append(result.error)
+            if isinstance(result, DealsActionResult):
+                self.structured_content.extend(result.structured_content)
+        last = item.result[-1] if item.result else None
+        self.final_result = last.extracted_content if last and last.extracted_content else None
+        self.is_done = bool(last and last.is_done)
+        if item.model_output:
+            self.model_thoughts.append(item.model_output.current_state)
+            for action, element in zip(item.model_output.action, item.state.interacted_element):
+                output = action.model_dump(exclude_none=True)
+                output["interacted_element"] = element
+                self.model_actions.append(output)
+        if item.state.url:
+            self.urls.append(item.state.url)
@@ -0,0 +1,163 @@
+import base64
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from browser_use.browser.views import BrowserState
+
+logger = logging.getLogger(__name__)
+
+# base64 prefixes of the image formats the browser or the encoder can produce
+_MIME_PREFIXES = {
+    "iVBOR": "image/png",
+    "/9j/": "image/jpeg",
+    "UklGR": "image/webp",
+}
+
+_PIL_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+@dataclass
+class ScreenshotConfig:
+    """
+    How screenshots are re-encoded before they are sent to the LLM.
+
+    max_dimension: longest side in pixels, larger screenshots are downscaled (None keeps the size)
+    image_format: png | jpeg | webp
+    quality: encoder quality for jpeg and webp
+    crop_to_elements: crop to the region holding the highlighted interactive elements
+    crop_margin: pixels kept around that region
+    """
+
+    max_dimension: Optional[int] = None
+    image_format: str = "png"
+    quality: int = 75
+    crop_to_elements: bool = False
+    crop_margin: int = 40
+
+    @property
+    def is_passthrough(self) -> bool:
+        return self.max_dimension is None and self.image_format == "png" and not self.crop_to_elements
+
+
+def screenshot_config_from_env() -> Optional[ScreenshotConfig]:
+    """ScreenshotConfig from the SCREENSHOT_* variables, None (full-resolution PNG) when none re-encodes"""
+    defaults = ScreenshotConfig()
+    max_dimension = os.getenv("SCREENSHOT_MAX_DIMENSION", "")
+    image_format = os.getenv("SCREENSHOT_FORMAT", "") or defaults.image_format
+    if image_format not in _PIL_FORMATS:
+        raise ValueError(f"Invalid SCREENSHOT_FORMAT {image_format!r}, expected one of {', '.join(_PIL_FORMATS)}")
+    config = ScreenshotConfig(
+        max_dimension=int(max_dimension) if max_dimension else None,
+        image_format=image_format,
+        quality=int(os.getenv("SCREENSHOT_QUALITY", defaults.quality)),
+        crop_to_elements=os.getenv("SCREENSHOT_CROP_TO_ELEMENTS", "false").lower() == "true",
+        crop_margin=int(os.getenv("SCREENSHOT_CROP_MARGIN", defaults.crop_margin)),
+    )
+    return None if config.is_passthrough else config
+
+
+@dataclass
+class EncodedScreenshot:
+    data: str
+    mime_type: str
+    original_bytes: int
+    encoded_bytes: int
+    dhash: Optional[int] = None
+
+
+def screenshot_mime_type(screenshot: str) -> str:
+    """MIME type of a base64 screenshot, read from its magic bytes"""
+    for prefix, mime_type in _MIME_PREFIXES.items():
+        if screenshot.startswith(prefix):
+            return mime_type
+    return "image/png"
+
+
+def screenshot_dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale copy"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hash_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def element_region(state: BrowserState, margin: int = 40) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box (left, top, right, bottom) of the highlighted elements inside the viewport"""
+    boxes = []
+    viewport = None
+    for node in state.selector_map.values():
+        coords = node.viewport_coordinates
+        if coords is None:
+            continue
+        viewport = viewport or node.viewport_info
+        boxes.append((coords.top_left.x, coords.top_left.y, coords.bottom_right.x, coords.bottom_right.y))
+    if not boxes:
+        return None
+
+    left = min(b[0] for b in boxes) - margin
+    top = min(b[1] for b in boxes) - margin
+    right = max(b[2] for b in boxes) + margin
+    bottom = max(b[3] for b in boxes) + margin
+    if viewport is not None:
+        right = min(right, viewport.width)
+        bottom = min(bottom, viewport.height)
+    return max(left, 0), max(top, 0), right, bottom
+
+
+def encode_screenshot(
+        screenshot: str,
+        config: ScreenshotConfig,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        viewport_width: Optional[int] = None,
+) -> EncodedScreenshot:
+    """Crop, downscale and re-encode a base64 screenshot and compute its perceptual hash.
+    CPU bound, run it in a worker thread."""
+    raw = base64.b64decode(screenshot)
+    image = Image.open(io.BytesIO(raw))
+    dhash = screenshot_dhash(image)
+    if config.is_passthrough:
+        return EncodedScreenshot(screenshot, screenshot_mime_type(screenshot), len(raw), len(raw), dhash)
+
+    pil_format, mime_type = _PIL_FORMATS.get(config.image_format.lower(), _PIL_FORMATS["png"])
+    if region is not None:
+        # region is in CSS pixels, the screenshot may be at a higher device scale
+        scale = image.width / viewport_width if viewport_width else 1
+        left, top, right, bottom = (int(v * scale) for v in region)
+        if right > left and bottom > top:
+            image = image.crop((left, top, min(right, image.width), min(bottom, image.height)))
+    if config.max_dimension and max(image.size) > config.max_dimension:
+        image.thumbnail((config.max_dimension, config.max_dimension), Image.LANCZOS)
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format=pil_format, optimize=True)
+    else:
+        image.save(buffer, format=pil_format, quality=config.quality)
+    encoded = buffer.getvalue()
+    return EncodedScreenshot(
+        data=base64.b64encode(encoded).decode("utf-8"),
+        mime_type=mime_type,
+        original_bytes=len(raw),
+        encoded_bytes=len(encoded),
+        dhash=dhash,
+    )
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from browser_use.agent.service import Agent
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from playwright.async_api import Page
+
+from ..browser.custom_browser import close_warm_browsers, get_warm_browser
+from .agent_state import AgentState
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLimitError(Exception):
+    """Raised when a new session would exceed the number of concurrent sessions"""
+
+
+@dataclass
+class AgentSession:
+    """Browser, context, agent and stop state owned by one UI session"""
+
+    session_id: str
+    agent_state: AgentState = field(default_factory=AgentState)
+    browser: Optional[Browser] = None
+    browser_context: Optional[BrowserContext] = None
+    agent: Optional[Agent] = None
+    last_active: float = field(default_factory=time.time)
+    running: bool = False
+    # False when the browser is a shared warm browser, see new_task_context
+    owns_browser: bool = True
+
+    def touch(self) -> None:
+        self.last_active = time.time()
+
+    def request_stop(self) -> None:
+        self.agent_state.request_stop()
+        if self.agent is not None:
+            self.agent.stop()
+
+    def pages(self) -> List[Page]:
+        """Open pages of the session's browser context"""
+        context_session = getattr(self.browser_context, "session", None)
+        return list(context_session.context.pages) if context_session is not None else []
+
+    async def new_task_context(
+            self,
+            browser_config: BrowserConfig,
+            context_config: BrowserContextConfig,
+            preserve_cookie_domains: Optional[list[str]] = None,
+    ) -> BrowserContext:
+        """Context recycling: close the context of the previous task and open a fresh one on the
+        process-wide warm browser, carrying over only the cookies of preserve_cookie_domains;
+        with those the warm browser is this session's own, cookies never reach other sessions"""
+        if self.browser_context is not None:
+            await self.browser_context.close()
+            self.browser_context = None
+        if self.browser is not None and self.owns_browser:
+            await self.browser.close()
+        self.browser = await get_warm_browser(browser_config, preserve_cookie_domains, owner=self.session_id)
+        self.owns_browser = False
+        self.browser_context = await self.browser.new_context(config=context_config)
+        return self.browser_context
+
+    async def close_browser(self) -> None:
+        if self.browser_context is not None:
+            await self.browser_context.close()
+            self.browser_context = None
+        if self.browser is not None:
+            if self.owns_browser:
+                await self.browser.close()
+            self.browser = None
+            self.owns_browser = True
+
+    async def close(self) -> None:
+        self.request_stop()
+        self.agent = None
+        try:
+            await self.close_browser()
+            await close_warm_browsers(owner=self.session_id)
+        except Exception as e:
+            logger.warning(f"Failed to close browser of session {self.session_id}: {e}")
+
+
+class SessionManager:
+    """
+    Agent sessions keyed by the Gradio session hash.
+
+    At most `max_sessions` sessions exist at once; a session that has not been used for
+    `idle_timeout` seconds and is not running an agent is closed to make room, and every
+    `eviction_interval` seconds in the background, so abandoned browsers do not stay open.
+    """
+
+    def __init__(self, max_sessions: int = 4, idle_timeout: float = 1800, eviction_interval: float = 60):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.eviction_interval = eviction_interval
+        self._sessions: Dict[str, AgentSession] = {}
+        self._lock = asyncio.Lock()
+        self._eviction_task: Optional[asyncio.Task] = None
+
+    def get(self, session_id: str) -> Optional[AgentSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    async def acquire(self, session_id: str) -> AgentSession:
+        """Return the session of session_id, creating it if there is room"""
+        # started here, in the event loop that serves the sessions
+        if self._eviction_task is None or self._eviction_task.done():
+            self._eviction_task = asyncio.create_task(self._evict_periodically())
+        async with self._lock:
+            session = self.get(session_id)
+            if session is not None:
+                return session
+            if len(self._sessions) >= self.max_sessions:
+                await self._evict_idle()
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(
+                    f"The server is busy with {len(self._sessions)} sessions, please try again later"
+                )
+            session = AgentSession(session_id=session_id)
+            self._sessions[session_id] = session
+            logger.info(f"Opened session {session_id} ({len(self._sessions)}/{self.max_sessions})")
+            return session
+
+    async def release(self, session_id: str) -> None:
+        async with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            await session.close()
+            logger.info(f"Closed session {session_id}")
+
+    async def evict_idle(self) -> int:
+        async with self._lock:
+            return await self._evict_idle()
+
+    async def _evict_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Failed to evict idle sessions: {e}")
+
+    async def _evict_idle(self) -> int:
+        now = time.time()
+        idle = [
+            session for session in self._sessions.values()
+            if not session.running and now - session.last_active >= self.idle_timeout
+        ]
+        for session in idle:
+            self._sessions.pop(session.session_id, None)
+            await session.close()
+            logger.info(f"Evicted idle session {session.session_id}")
+        return len(idle)
+
+    async def close_all(self) -> None:
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            self._eviction_task = None
+        async with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
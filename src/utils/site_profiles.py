@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+from playwright.async_api import Frame, Page
+
+from ..browser.smart_wait import smart_wait
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_PROFILE_DIR = os.path.join(os.path.dirname(__file__), "..", "controller", "profiles")
+DEAL_FIELDS = ("title", "description", "price", "original_price")
+
+# scores every profile's fingerprint against the page in one evaluation
+_DETECT_JS = """
+(fingerprints) => {
+    const sources = Array.from(document.querySelectorAll('script[src], iframe[src], link[href]'))
+        .map(el => el.src || el.href || '');
+    const present = (selector) => { try { return !!document.querySelector(selector); } catch (e) { return false; } };
+    return fingerprints.map(fp =>
+        fp.scripts.filter(s => sources.some(src => src.includes(s))).length
+        + fp.selectors.filter(present).length
+        + fp.globals.filter(g => g in window).length
+    );
+}
+"""
+
+# every field of every deal item of the page in one evaluation
+_EXTRACT_JS = """
+(deals) => {
+    const text = (root, selector) => {
+        if (!selector) return '';
+        try {
+            const el = root.querySelector(selector);
+            return el ? (el.innerText || el.textContent || '').trim() : '';
+        } catch (e) { return ''; }
+    };
+    const containers = deals.container ? Array.from(document.querySelectorAll(deals.container)) : [document];
+    const seen = new Set();
+    const items = [];
+    for (const container of containers) {
+        for (const item of container.querySelectorAll(deals.item)) {
+            if (seen.has(item)) continue;
+            seen.add(item);
+            const record = {};
+            for (const [name, selector] of Object.entries(deals.fields)) record[name] = text(item, selector);
+            items.push(record);
+        }
+    }
+    return items;
+}
+"""
+
+
+@dataclass
+class SiteProfile:
+    """
+    How deals are extracted from the sites of one platform: how to recognize the platform,
+    where its deal items and their fields are, how to page through them and how to pass
+    its age gate. Loaded from a JSON file, see src/controller/profiles.
+    """
+
+    name: str
+    fingerprint: Dict[str, List[str]]
+    deals: Dict[str, Any]
+    pagination: Dict[str, Any] = field(default_factory=dict)
+    age_gate: Dict[str, List[str]] = field(default_factory=dict)
+    # url part of the iframe the platform's menu is embedded in, if any
+    frame: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SiteProfile":
+        for key in ("name", "fingerprint", "deals"):
+            if key not in data:
+                raise ValueError(f"Site profile {data.get('name', '?')} has no {key}")
+        deals = data["deals"]
+        if not deals.get("item") or not deals.get("fields", {}).get("title"):
+            raise ValueError(f"Site profile {data['name']} needs a deals item selector and a title field")
+        unknown = set(deals["fields"]) - set(DEAL_FIELDS)
+        if unknown:
+            raise ValueError(f"Site profile {data['name']} has unknown deal fields {', '.join(sorted(unknown))}")
+        fingerprint = {key: list(data["fingerprint"].get(key, [])) for key in ("hosts", "scripts", "selectors", "globals")}
+        return cls(
+            name=data["name"],
+            fingerprint=fingerprint,
+            deals=deals,
+            pagination=data.get("pagination", {}),
+            age_gate=data.get("age_gate", {}),
+            frame=data.get("frame"),
+        )
+
+    def matches_host(self, url: str) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == h or host.endswith("." + h) for h in self.fingerprint["hosts"])
+
+
+class ProfileRegistry:
+    """
+    Site profiles of the built-in directory and of SITE_PROFILE_DIR; a profile of the latter
+    replaces a built-in one of the same name.
+
+    detect() identifies the platform of a page with one script evaluation for all profiles
+    and remembers the platform per host, so later pages of a site cost nothing. A host
+    without a known platform is checked again after unknown_host_ttl seconds: its first
+    page may have been an age gate or a landing page without the platform's scripts.
+    """
+
+    def __init__(self, directories: Optional[List[str]] = None, unknown_host_ttl: float = 300.0):
+        if directories is None:
+            directories = [BUILTIN_PROFILE_DIR]
+            if os.getenv("SITE_PROFILE_DIR"):
+                directories.append(os.getenv("SITE_PROFILE_DIR"))
+        self.directories = directories
+        self._profiles: Optional[Dict[str, SiteProfile]] = None
+        self._fingerprints: List[Dict[str, List[str]]] = []
+        self.unknown_host_ttl = unknown_host_ttl
+        self._by_host: Dict[str, SiteProfile] = {}
+        # host -> time.monotonic() of the detection that found no platform
+        self._unknown_hosts: Dict[str, float] = {}
+
+    @property
+    def profiles(self) -> Dict[str, SiteProfile]:
+        if self._profiles is None:
+            profiles = {}
+            for directory in self.directories:
+                if not os.path.isdir(directory):
+                    continue
+                for filename in sorted(os.listdir(directory)):
+                    if not filename.endswith(".json"):
+                        continue
+                    path = os.path.join(directory, filename)
+                    try:
+                        with open(path, "r", encoding="utf-8") as f:
+                            profile = SiteProfile.from_dict(json.load(f))
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping site profile {path}: {e}")
+                        continue
+                    profiles[profile.name] = profile
+            self._profiles = profiles
+            self._fingerprints = [profile.fingerprint for profile in profiles.values()]
+        return self._profiles
+
+    def add(self, profile: SiteProfile) -> None:
+        self.profiles[profile.name] = profile
+        self._fingerprints = [p.fingerprint for p in self.profiles.values()]
+        self._by_host.clear()
+        self._unknown_hosts.clear()
+
+    async def detect(self, page: Page) -> Optional[SiteProfile]:
+        """Profile of the platform the page runs on, None for unknown platforms"""
+        host = (urlparse(page.url).hostname or "").lower()
+        if host in self._by_host:
+            return self._by_host[host]
+        if time.monotonic() - self._unknown_hosts.get(host, float("-inf")) < self.unknown_host_ttl:
+            return None
+        profiles = list(self.profiles.values())
+        profile = next((p for p in profiles if p.matches_host(page.url)), None)
+        if profile is None and profiles:
+            try:
+                scores = await page.evaluate(_DETECT_JS, self._fingerprints)
+            except Exception as e:
+                # the page is navigating, try again on the next call
+                logger.debug(f"Platform detection on {page.url} failed: {e}")
+                return None
+            best = max(range(len(profiles)), key=lambda i: scores[i])
+            profile = profiles[best] if scores[best] > 0 else None
+        logger.info(f"Platform of {host}: {profile.name if profile else 'unknown'}")
+        if profile is not None:
+            self._by_host[host] = profile
+            self._unknown_hosts.pop(host, None)
+        else:
+            self._unknown_hosts[host] = time.monotonic()
+        return profile
+
+
+def _frame(page: Page, profile: SiteProfile) -> Union[Page, Frame]:
+    """The iframe of the profile's embedded menu, or the page itself"""
+    if profile.frame:
+        for frame in page.frames:
+            if profile.frame in (frame.url or ""):
+                return frame
+    return page
+
+
+async def pass_age_gate(page: Page, profile: SiteProfile) -> bool:
+    """Confirm the profile's age gate if it is shown; returns whether it was confirmed"""
+    frame = _frame(page, profile)
+    for root in (page, frame) if frame is not page else (page,):
+        for selector in profile.age_gate.get("detect", []):
+            if await root.locator(selector).count() == 0:
+                continue
+            for confirm_selector in profile.age_gate.get("confirm", []):
+                button = root.locator(confirm_selector).first
+                if await button.count() > 0:
+                    await button.click(timeout=smart_wait.timeout(page, "element"))
+                    await smart_wait.settle(page)
+                    logger.info(f"Confirmed the {profile.name} age gate using selector: {confirm_selector}")
+                    return True
+    return False
+
+
+async def extract_profile_deals(page: Page, profile: SiteProfile) -> List[Dict[str, Any]]:
+    """
+    Deals of the page by the profile's selectors, each page of results read in a single
+    evaluation, following the profile's pagination up to its max_pages.
+    """
+    root = _frame(page, profile)
+    deals: List[Dict[str, Any]] = []
+    next_selector = profile.pagination.get("next")
+    for page_number in range(max(int(profile.pagination.get("max_pages", 1)), 1)):
+        items = await root.evaluate(_EXTRACT_JS, {
+            "container": profile.deals.get("container"),
+            "item": profile.deals["item"],
+            "fields": profile.deals["fields"],
+        })
+        deals.extend(
+            {
+                "title": item.get("title") or "No Title",
+                "description": item.get("description") or "No Description",
+                "price": item.get("price") or "Price N/A",
+                "original_price": item.get("original_price") or "N/A",
+            }
+            for item in items
+            if item.get("title")
+        )
+        if not next_selector:
+            break
+        next_button = root.locator(next_selector).first
+        if await next_button.count() == 0 or not await next_button.is_visible():
+            break
+        await next_button.click(timeout=smart_wait.timeout(page, "element"))
+        await smart_wait.settle(page)
+        logger.debug(f"{profile.name} page {page_number + 2} of {page.url}")
+    return deals
+
+
+profile_registry = ProfileRegistry()
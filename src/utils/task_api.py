@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from .task_queue import CANCELLED, DONE, FAILED, TASK_KINDS, TASK_PARAMS, TaskQueue, validate_task_params
+
+logger = logging.getLogger(__name__)
+
+_FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class TaskRequest(BaseModel):
+    kind: str = Field("custom", description=f"One of {', '.join(TASK_KINDS)}")
+    params: Dict[str, Any] = Field(
+        default_factory=dict,
+        description=f"Task parameters, other keys are ignored: {', '.join(TASK_PARAMS)}",
+    )
+
+
+def _task_json(task) -> Dict[str, Any]:
+    return {
+        "id": task.id,
+        "kind": task.kind,
+        "status": task.status,
+        "progress": task.progress,
+        "result": task.result,
+        "error": task.error,
+        "attempts": task.attempts,
+        "created_at": task.created_at,
+        "started_at": task.started_at,
+        "finished_at": task.finished_at,
+    }
+
+
+def _artifacts(result: Any) -> Dict[str, str]:
+    """Files named in a task result (history, report, ...), by file name"""
+    files = {}
+    values = result.values() if isinstance(result, dict) else []
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        # the retention manager may have compressed the file since the task finished
+        for path in (value, value + ".gz", value + ".zst"):
+            if os.path.isfile(path):
+                files[os.path.basename(path)] = path
+                break
+    return files
+
+
+def create_task_router(queue: TaskQueue, api_token: Optional[str] = None, poll_interval: float = 1.0) -> APIRouter:
+    """
+    JSON API on top of the task queue: submit tasks, poll or stream their progress, download artifacts.
+    With api_token set, requests need an `Authorization: Bearer <api_token>` header.
+    """
+
+    def check_token(authorization: Optional[str] = Header(None)):
+        if api_token and authorization != f"Bearer {api_token}":
+            raise HTTPException(status_code=401, detail="Invalid or missing API token")
+
+    router = APIRouter(prefix="/api", dependencies=[Depends(check_token)])
+
+    def get_task(task_id: str):
+        task = queue.get(task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail=f"No task with id {task_id}")
+        return task
+
+    @router.post("/tasks", status_code=202)
+    async def submit_task(request: TaskRequest):
+        # base urls, api keys and paths would let a client send the server's keys or write files anywhere
+        params = {k: v for k, v in request.params.items() if k in TASK_PARAMS}
+        ignored = sorted(set(request.params) - set(params))
+        try:
+            validate_task_params(request.kind, params)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        task_id = await asyncio.to_thread(queue.submit, request.kind, params)
+        return {"id": task_id, "status": "queued", "ignored_params": ignored}
+
+    @router.get("/tasks")
+    async def list_tasks(status: Optional[str] = None, limit: int = 100):
+        tasks = await asyncio.to_thread(queue.list, status, min(limit, 1000))
+        return {"tasks": [_task_json(task) for task in tasks], "counts": await asyncio.to_thread(queue.counts)}
+
+    @router.get("/tasks/{task_id}")
+    async def read_task(task_id: str):
+        return _task_json(await asyncio.to_thread(get_task, task_id))
+
+    @router.delete("/tasks/{task_id}")
+    async def cancel_task(task_id: str):
+        await asyncio.to_thread(get_task, task_id)
+        if not await asyncio.to_thread(queue.cancel, task_id):
+            raise HTTPException(status_code=409, detail="Only queued tasks can be cancelled")
+        return {"id": task_id, "status": CANCELLED}
+
+    @router.get("/tasks/{task_id}/events")
+    async def task_events(task_id: str):
+        """Server-sent events: a `progress` event whenever status or progress changes, then `done`"""
+        await asyncio.to_thread(get_task, task_id)
+
+        async def stream():
+            last = None
+            while True:
+                task = await asyncio.to_thread(queue.get, task_id)
+                current = (task.status, json.dumps(task.progress, default=str))
+                if current != last:
+                    last = current
+                    event = "done" if task.status in _FINISHED else "progress"
+                    yield f"event: {event}\ndata: {json.dumps(_task_json(task), default=str)}\n\n"
+                if task.status in _FINISHED:
+                    return
+                await asyncio.sleep(poll_interval)
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @router.get("/tasks/{task_id}/artifacts")
+    async def list_artifacts(task_id: str):
+        task = await asyncio.to_thread(get_task, task_id)
+        return {"artifacts": sorted(_artifacts(task.result))}
+
+    @router.get("/tasks/{task_id}/artifacts/{name}")
+    async def read_artifact(task_id: str, name: str):
+        task = await asyncio.to_thread(get_task, task_id)
+        # only files named in the task result can be downloaded
+        path = _artifacts(task.result).get(name)
+        if path is None:
+            raise HTTPException(status_code=404, detail=f"No artifact {name} for task {task_id}")
+        return FileResponse(path, filename=name)
+
+    return router
+
+
+def create_api_app(queue: TaskQueue, api_token: Optional[str] = None) -> FastAPI:
+    app = FastAPI(title="Browser Agent API")
+    app.include_router(create_task_router(queue, api_token=api_token))
+    return app
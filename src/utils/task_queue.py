@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TASK_KINDS = ("custom", "org", "hash_deals", "deep_research")
+
+# task params a client may set; LLM endpoints and keys and all output paths come from the worker's environment
+TASK_PARAMS = (
+    "task", "add_infos", "llm_provider", "llm_model_name", "llm_num_ctx", "llm_temperature", "use_vision",
+    "max_steps", "max_actions_per_step", "tool_calling_method", "enable_recording", "enable_trace",
+    "window_w", "window_h", "context_template", "max_search_iterations", "max_query_num",
+    "website_urls", "location_names", "use_context_compaction", "use_element_diff",
+    "skip_unchanged_screenshots",
+)
+
+
+
+def validate_task_params(kind: str, params: Dict[str, Any]) -> None:
+    """Raise ValueError for a task its worker could not run: an unknown kind or missing params"""
+    if kind not in TASK_KINDS:
+        raise ValueError(f"Invalid task kind: {kind}")
+    if kind != "hash_deals":
+        if not isinstance(params.get("task"), str) or not params["task"].strip():
+            raise ValueError("params.task is required")
+        return
+    urls, locations = params.get("website_urls"), params.get("location_names")
+    for name, values in (("website_urls", urls), ("location_names", locations)):
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+            raise ValueError(f"params.{name} must be a non-empty list of strings")
+    # the worker pairs them up, a shorter list would silently drop sites
+    if len(urls) != len(locations):
+        raise ValueError(f"params.website_urls and params.location_names differ in length "
+                         f"({len(urls)} and {len(locations)})")
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    progress TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at);
+"""
+
+
+@dataclass
+class QueuedTask:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    result: Optional[Any] = None
+    progress: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    worker: Optional[str] = None
+    attempts: int = 0
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "QueuedTask":
+        return cls(
+            id=row["id"],
+            kind=row["kind"],
+            params=json.loads(row["params"]),
+            status=row["status"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            progress=json.loads(row["progress"]) if row["progress"] else None,
+            error=row["error"],
+            worker=row["worker"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            heartbeat_at=row["heartbeat_at"],
+            finished_at=row["finished_at"],
+        )
+
+
+class TaskQueue:
+    """
+    Durable FIFO queue of agent tasks in a local SQLite file, shared by the UI and worker processes.
+
+    Claiming runs in an IMMEDIATE transaction, so each task goes to exactly one worker
+    even when several processes poll the same file. Do not put API keys in the task params:
+    they are stored in plain text; workers read them from the environment instead.
+    """
+
+    def __init__(self, db_path: str = "./tmp/task_queue.db"):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "progress" not in columns:
+                # queues created before progress reporting
+                conn.execute("ALTER TABLE tasks ADD COLUMN progress TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> str:
+        validate_task_params(kind, params)
+        task_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO tasks (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (task_id, kind, json.dumps(params), QUEUED, time.time()),
+            )
+        logger.info(f"Queued {kind} task {task_id}")
+        return task_id
+
+    def claim(self, worker: str) -> Optional[QueuedTask]:
+        """Move the oldest queued task to running for this worker"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM tasks WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE tasks SET status = ?, worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (RUNNING, worker, now, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, task_id: str, worker: Optional[str] = None) -> None:
+        """Called periodically by the worker running the task, see requeue_stale"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET heartbeat_at = ? WHERE id = ? AND (? IS NULL OR worker = ?)",
+                (time.time(), task_id, worker, worker),
+            )
+
+    def update_progress(self, task_id: str, progress: Dict[str, Any], worker: Optional[str] = None) -> None:
+        """Latest progress of a running task (step number, last actions, ...); also counts as a heartbeat"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET progress = ?, heartbeat_at = ? WHERE id = ? AND (? IS NULL OR worker = ?)",
+                (json.dumps(progress, default=str), time.time(), task_id, worker, worker),
+            )
+
+    def complete(self, task_id: str, worker: str, result: Any) -> bool:
+        """Record the result of a task; False if the task is no longer running on this worker"""
+        return self._finish(task_id, worker, DONE, result=json.dumps(result, default=str))
+
+    def fail(self, task_id: str, worker: str, error: str) -> bool:
+        return self._finish(task_id, worker, FAILED, error=error)
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a task that has not been claimed yet"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), task_id, QUEUED),
+            )
+        return cursor.rowcount > 0
+
+    def _finish(self, task_id: str, worker: str, status: str, result: Optional[str] = None,
+                error: Optional[str] = None) -> bool:
+        # a worker whose task was requeued as stale must not overwrite the run of its new worker
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, result, error, time.time(), task_id, worker, RUNNING),
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"Task {task_id} is no longer running on {worker}, its {status} result was dropped")
+        return cursor.rowcount > 0
+
+    def requeue_stale(self, timeout: float, max_attempts: int = 3) -> int:
+        """Requeue running tasks whose worker has not sent a heartbeat for timeout seconds;
+        tasks that already used max_attempts are failed instead"""
+        cutoff = time.time() - timeout
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (FAILED, "Worker stopped responding", time.time(), RUNNING, cutoff, max_attempts),
+            )
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, cutoff),
+            )
+        return cursor.rowcount
+
+    def get(self, task_id: str) -> Optional[QueuedTask]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return QueuedTask.from_row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[QueuedTask]:
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM tasks ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [QueuedTask.from_row(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
@@ -0,0 +1,304 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Callable, Dict, List, Optional
+
+from browser_use.agent.service import Agent
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.context import BrowserContextWindowSize
+
+from src.agent.custom_agent import CustomAgent, agent_options_from_env
+from src.agent.custom_prompts import CustomSystemPrompt, CustomAgentMessagePrompt
+from src.browser.custom_browser import CustomBrowser, preserve_cookie_domains_from_env
+from src.browser.custom_context import CustomBrowserContextConfig
+from src.browser.recorder import recording_config_from_env
+from src.controller.custom_controller import CustomController
+from src.utils import utils
+from src.utils.deep_research import deep_research
+from src.utils.hash_deals_agent import hash_deals_agent
+from src.utils.artifact_index import artifact_index
+from src.utils.screenshot import screenshot_config_from_env
+from src.utils.history_store import HistoryWriter
+from src.utils.history_summary import HistorySummary
+from src.utils.deal_store import DealStore
+from src.utils.task_queue import TaskQueue, QueuedTask
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """Browsers launched once per worker process and lent to one task at a time"""
+
+    def __init__(
+            self,
+            size: int = 1,
+            headless: bool = True,
+            disable_security: bool = True,
+            preserve_cookie_domains: Optional[List[str]] = None,
+    ):
+        self.size = size
+        self.headless = headless
+        self.disable_security = disable_security
+        self.preserve_cookie_domains = preserve_cookie_domains
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._browsers: List[CustomBrowser] = []
+
+    async def acquire(self) -> CustomBrowser:
+        if self._idle.empty() and len(self._browsers) < self.size:
+            browser = CustomBrowser(
+                config=BrowserConfig(headless=self.headless, disable_security=self.disable_security),
+                preserve_cookie_domains=self.preserve_cookie_domains,
+            )
+            self._browsers.append(browser)
+            return browser
+        return await self._idle.get()
+
+    def release(self, browser: CustomBrowser) -> None:
+        self._idle.put_nowait(browser)
+
+    async def close(self) -> None:
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"Failed to close pooled browser: {e}")
+        self._browsers.clear()
+
+
+def _get_llm(params: Dict[str, Any]):
+    # endpoint and API key always come from the environment of the worker, never from the task
+    return utils.get_llm_model(
+        provider=params.get("llm_provider", "openai"),
+        model_name=params.get("llm_model_name"),
+        num_ctx=params.get("llm_num_ctx", 16000),
+        temperature=params.get("llm_temperature", 1.0),
+    )
+
+
+def _step_callback(on_progress: Optional[Callable[[Dict[str, Any]], None]]):
+    if on_progress is None:
+        return None
+
+    def report(state, model_output, step: int):
+        on_progress({
+            "step": step,
+            "url": state.url,
+            "actions": [action.model_dump(exclude_unset=True) for action in model_output.action],
+            "memory": getattr(model_output.current_state, "important_contents", None)
+            or getattr(model_output.current_state, "memory", None),
+        })
+
+    return report
+
+
+async def _run_browser_agent(
+        kind: str,
+        params: Dict[str, Any],
+        browser: CustomBrowser,
+        llm,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        run_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    save_agent_history_path = os.getenv("WORKER_AGENT_HISTORY_PATH", "./tmp/agent_history")
+    os.makedirs(save_agent_history_path, exist_ok=True)
+    browser_context = await browser.new_context(
+        config=CustomBrowserContextConfig(
+            trace_path=os.getenv("WORKER_TRACE_PATH", "./tmp/traces") if params.get("enable_trace") else None,
+            save_recording_path=(
+                os.getenv("WORKER_RECORDING_PATH", "./tmp/record_videos") if params.get("enable_recording") else None
+            ),
+            context_template=params.get("context_template"),
+            run_id=run_id,
+            recording_config=recording_config_from_env(),
+            screenshot_config=screenshot_config_from_env(),
+            no_viewport=False,
+            browser_window_size=BrowserContextWindowSize(
+                width=params.get("window_w", 1280), height=params.get("window_h", 1100)
+            ),
+        )
+    )
+    # custom agents stream their steps to disk, the history of org agents is written when they finish
+    history_writer = HistoryWriter(save_agent_history_path, browser_context.run_id)
+    try:
+        if kind == "org":
+            agent = Agent(
+                task=params["task"],
+                llm=llm,
+                use_vision=params.get("use_vision", True),
+                browser=browser,
+                browser_context=browser_context,
+                max_actions_per_step=params.get("max_actions_per_step", 10),
+                tool_calling_method=params.get("tool_calling_method", "auto"),
+                register_new_step_callback=_step_callback(on_progress),
+            )
+        else:
+            # the AGENT_* defaults, unless the task sets them
+            options = agent_options_from_env()
+            options.update({name: bool(params[name]) for name in options if name in params})
+            agent = CustomAgent(
+                task=params["task"],
+                add_infos=params.get("add_infos", ""),
+                use_vision=params.get("use_vision", True),
+                llm=llm,
+                browser=browser,
+                browser_context=browser_context,
+                controller=CustomController(),
+                system_prompt_class=CustomSystemPrompt,
+                agent_prompt_class=CustomAgentMessagePrompt,
+                max_actions_per_step=params.get("max_actions_per_step", 10),
+                tool_calling_method=params.get("tool_calling_method", "auto"),
+                register_new_step_callback=_step_callback(on_progress),
+                history_writer=history_writer,
+                **options,
+            )
+        history = await agent.run(max_steps=params.get("max_steps", 100))
+        if not history.is_done():
+            browser_context.mark_failed()
+
+        if kind == "org":
+            history_writer.extend(history.history)
+        history_writer.close()
+        history_file = history_writer.path
+        artifact_index.register(history_file, run_id=browser_context.run_id)
+        summary = HistorySummary.for_agent(agent, history)
+        result = {
+            "final_result": summary.final_result,
+            "errors": summary.errors,
+            "model_actions": summary.model_actions,
+            "model_thoughts": summary.model_thoughts,
+            "history_file": history_file,
+        }
+    except Exception:
+        browser_context.mark_failed()
+        raise
+    finally:
+        history_writer.close()
+        await browser_context.close()
+    # the context registers its recording and trace when it closes
+    result["recording_file"] = (
+        artifact_index.latest_for_run(browser_context.run_id, ".webm")
+        or artifact_index.latest_for_run(browser_context.run_id, ".webp")
+    )
+    result["trace_file"] = artifact_index.latest_for_run(browser_context.run_id, ".zip")
+    # the result keeps the paths, the index need not
+    artifact_index.forget_run(browser_context.run_id)
+    return result
+
+
+async def run_task(
+        task: QueuedTask,
+        pool: BrowserPool,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Any:
+    """Run one queued task and return its JSON serializable result.
+    on_progress is called with a small dict after every agent step."""
+    params = task.params
+    llm = _get_llm(params)
+    if task.kind == "deep_research":
+        # deep research opens a browser per query, it does not use the pool
+        report_content, report_file_path = await deep_research(
+            task=params["task"],
+            llm=llm,
+            agent_state=None,
+            headless=pool.headless,
+            **{k: v for k, v in params.items() if k in ("max_search_iterations", "max_query_num", "context_template")},
+        )
+        return {"report": report_content, "report_file": report_file_path}
+
+    browser = await pool.acquire()
+    try:
+        if task.kind == "hash_deals":
+            deals = []
+            for url, location in zip(params["website_urls"], params["location_names"]):
+                if on_progress is not None:
+                    on_progress({"website_url": url, "location_name": location, "sites_done": len(deals)})
+                deals.append({
+                    "website_url": url,
+                    "location_name": location,
+                    "deals": await hash_deals_agent(url, location, llm, browser=browser),
+                })
+            DealStore().record_report({f"{d['location_name']} - {d['website_url']}": d["deals"] for d in deals})
+            return deals
+        return await _run_browser_agent(task.kind, params, browser, llm, on_progress, run_id=task.id)
+    finally:
+        pool.release(browser)
+
+
+async def _heartbeat(queue: TaskQueue, task_id: str, worker: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(queue.heartbeat, task_id, worker)
+
+
+async def worker_loop(
+        db_path: str,
+        worker_name: str,
+        concurrency: int = 1,
+        headless: bool = True,
+        poll_interval: float = 1.0,
+        heartbeat_interval: float = 30.0,
+        stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Claim and run tasks until stop_event is set, at most `concurrency` at once (one browser each)"""
+    queue = TaskQueue(db_path)
+    pool = BrowserPool(
+        size=concurrency,
+        headless=headless,
+        preserve_cookie_domains=preserve_cookie_domains_from_env(),
+    )
+    slots = asyncio.Semaphore(concurrency)
+    stop_event = stop_event or asyncio.Event()
+    running = set()
+
+    async def execute(task: QueuedTask):
+        heartbeat = asyncio.create_task(_heartbeat(queue, task.id, worker_name, heartbeat_interval))
+        progress_writes = set()
+
+        def report_progress(progress: Dict[str, Any]) -> None:
+            # called from the agent's step in the event loop, the SQLite write must not block it
+            write = asyncio.ensure_future(asyncio.to_thread(queue.update_progress, task.id, progress, worker_name))
+            progress_writes.add(write)
+            write.add_done_callback(progress_writes.discard)
+
+        try:
+            logger.info(f"{worker_name}: running {task.kind} task {task.id}")
+            result = await run_task(task, pool, on_progress=report_progress)
+            await asyncio.gather(*progress_writes, return_exceptions=True)
+            await asyncio.to_thread(queue.complete, task.id, worker_name, result)
+            logger.info(f"{worker_name}: finished task {task.id}")
+        except Exception as e:
+            logger.error(f"{worker_name}: task {task.id} failed: {type(e).__name__} - {e}")
+            await asyncio.to_thread(queue.fail, task.id, worker_name, f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.cancel()
+            slots.release()
+
+    try:
+        while not stop_event.is_set():
+            await slots.acquire()
+            task = await asyncio.to_thread(queue.claim, worker_name)
+            if task is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job = asyncio.create_task(execute(task))
+            running.add(job)
+            job.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await pool.close()
+
+
+def worker_process_main(db_path: str, index: int, concurrency: int, headless: bool) -> None:
+    """Entry point of a worker process"""
+    logging.basicConfig(level=logging.INFO)
+    worker_name = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    try:
+        asyncio.run(worker_loop(db_path, worker_name, concurrency=concurrency, headless=headless))
+    except KeyboardInterrupt:
+        pass
@@ -13,6 +13,8 @@ from langchain_openai import AzureChatOpenAI, ChatOpenAI
 import gradio as gr
 
 from .llm import DeepSeekR1ChatOpenAI, DeepSeekR1ChatOllama
+from ..browser.live_view import LiveViewHub, live_view_hub
+from .artifact_index import artifact_index
 
 PROVIDER_DISPLAY_NAMES = {
     "openai": "OpenAI",
@@ -219,18 +221,49 @@ def get_latest_files(directory: str, file_types: list = ['.webm', '.zip']) -> Di
 
     for file_type in file_types:
         try:
-            matches = list(Path(directory).rglob(f"*{file_type}"))
-            if matches:
-                latest = max(matches, key=lambda p: p.stat().st_mtime)
+            # looked up in the artifact index instead of walking the directory on every poll
+            latest = artifact_index.latest(directory, file_type)
+            if latest:
+                mtime, path = latest
                 # Only return files that are complete (not being written)
-                if time.time() - latest.stat().st_mtime > 1.0:
-                    latest_files[file_type] = str(latest)
+                if time.time() - mtime > 1.0:
+                    latest_files[file_type] = path
         except Exception as e:
             print(f"Error getting latest {file_type} file: {e}")
             
     return latest_files
-async def capture_screenshot(browser_context):
-    """Capture and encode a screenshot"""
+async def capture_screenshot(browser_context, live_view: Optional[LiveViewHub] = live_view_hub):
+    """Capture and encode a screenshot.
+    With a live view hub the latest CDP screencast frame is returned instead of taking a new
+    screenshot; the screenshot is only taken until the first frame arrives."""
+    active_page = _active_page(browser_context)
+    if active_page is None:
+        return None
+
+    if live_view is not None:
+        frame = await live_view.latest_frame(active_page)
+        await live_view.release_idle()
+        if frame is not None:
+            return frame
+
+    # Take screenshot
+    try:
+        screenshot = await active_page.screenshot(
+            type='jpeg',
+            quality=75,
+            scale="css"
+        )
+        encoded = base64.b64encode(screenshot).decode('utf-8')
+        return encoded
+    except Exception:
+        return None
+
+
+def _active_page(browser_context):
+    # custom contexts track their active page, no need to scan the pages
+    if hasattr(browser_context, "active_page"):
+        return browser_context.active_page
+
     # Extract the Playwright browser instance
     playwright_browser = browser_context.browser.playwright_browser  # Ensure this is correct.
 
@@ -245,23 +278,11 @@ async def capture_screenshot(browser_context):
     if playwright_context:
         pages = playwright_context.pages
 
-    # Use an existing page or create a new one if none exist
-    if pages:
-        active_page = pages[0]
-        for page in pages:
-            if page.url != "about:blank":
-                active_page = page
-    else:
-        return None
-
-    # Take screenshot
-    try:
-        screenshot = await active_page.screenshot(
-            type='jpeg',
-            quality=75,
-            scale="css"
-        )
-        encoded = base64.b64encode(screenshot).decode('utf-8')
-        return encoded
-    except Exception as e:
+    # Use the last page that is not blank
+    if not pages:
         return None
+    active_page = pages[0]
+    for page in pages:
+        if page.url != "about:blank":
+            active_page = page
+    return active_page
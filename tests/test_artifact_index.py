@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+sys.path.append(".")
+
+from src.utils.artifact_index import ArtifactIndex
+
+
+def test_latest_and_run_lookups(tmp_path):
+    old = tmp_path / "old.webm"
+    old.write_bytes(b"old")
+    os.utime(old, (time.time() - 100, time.time() - 100))
+    index = ArtifactIndex(rescan_interval=3600)
+
+    assert index.latest(str(tmp_path), ".webm")[1] == str(old)
+
+    nested = tmp_path / "run-b" / "new.webm"
+    nested.parent.mkdir()
+    nested.write_bytes(b"new")
+    index.register(str(nested), run_id="b")
+    trace = tmp_path / "a.zip"
+    trace.write_bytes(b"zip")
+    index.register(str(trace), run_id="a")
+
+    assert index.latest(str(tmp_path), ".webm")[1] == str(nested)
+    assert index.latest_for_run("a", ".webm") is None
+    assert index.latest_for_run("a", ".zip") == str(trace)
+    assert sorted(index.files(str(tmp_path), [".webm"])) == sorted([str(old), str(nested)])
+
+    index.forget(str(nested))
+    assert index.latest(str(tmp_path), ".webm")[1] == str(old)
+    assert index.run_files("b") == []
+
+
+def test_runs_are_forgotten(tmp_path):
+    index = ArtifactIndex(rescan_interval=3600, max_runs=2)
+    paths = []
+    for run_id in ("a", "b", "c"):
+        path = tmp_path / f"{run_id}.zip"
+        path.write_bytes(b"zip")
+        index.register(str(path), run_id=run_id)
+        paths.append(str(path))
+
+    # only the newest max_runs runs are kept
+    assert index.latest_for_run("a", ".zip") is None
+    assert index.latest_for_run("c", ".zip") == paths[2]
+
+    index.forget(paths[1])
+    assert "b" not in index._runs
+    index.forget_run("c")
+    assert not index._runs
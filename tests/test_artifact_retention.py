@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+import time
+
+sys.path.append(".")
+
+from src.utils.artifact_index import ArtifactIndex
+from src.utils.artifact_retention import RetentionManager, RetentionPolicy, read_artifact
+
+
+def _write(path, size, age):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (time.time() - age, time.time() - age))
+
+
+def test_oldest_files_are_deleted_until_limits_hold(tmp_path):
+    for i in range(5):
+        _write(tmp_path / f"{i}.webm", 100, age=1000 * (5 - i))
+    _write(tmp_path / "recent.webm", 1000, age=0)
+    manager = RetentionManager(
+        [RetentionPolicy(str(tmp_path), extensions=(".webm",), max_count=4, max_total_bytes=1250)],
+        index=ArtifactIndex(),
+    )
+
+    stats = manager.run_once()[str(tmp_path)]
+
+    # the recent file is never deleted, even though it alone is close to the byte limit
+    assert sorted(os.listdir(tmp_path)) == ["3.webm", "4.webm", "recent.webm"]
+    assert stats.deleted == 3 and stats.bytes == 1200
+
+
+def test_old_history_is_compressed_and_still_readable(tmp_path):
+    history = tmp_path / "agent.json"
+    history.write_text(json.dumps({"history": ["step"] * 100}))
+    os.utime(history, (time.time() - 7200, time.time() - 7200))
+    manager = RetentionManager(
+        [RetentionPolicy(str(tmp_path), extensions=(".json",), compress="gzip")], index=ArtifactIndex()
+    )
+
+    stats = manager.run_once()[str(tmp_path)]
+
+    assert os.listdir(tmp_path) == ["agent.json.gz"]
+    assert stats.compressed == 1 and stats.saved_bytes > 0
+    assert json.loads(read_artifact(str(history))) == {"history": ["step"] * 100}
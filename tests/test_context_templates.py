@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.append(".")
+
+import pytest
+
+from src.browser.context_templates import ContextTemplateStore
+
+
+def test_save_load_and_list(tmp_path):
+    store = ContextTemplateStore(str(tmp_path))
+    state = {
+        "cookies": [{"name": "sid", "value": "1", "domain": "example.com", "path": "/"}],
+        "origins": [{"origin": "https://example.com", "localStorage": [{"name": "token", "value": "t"}]}],
+    }
+    store.save("example-login", state)
+
+    assert store.list() == ["example-login"]
+    assert ContextTemplateStore(str(tmp_path)).load("example-login") == state
+
+    store.delete("example-login")
+    assert store.list() == []
+    with pytest.raises(FileNotFoundError):
+        store.load("example-login")
+
+
+def test_template_names_cannot_escape_the_directory(tmp_path):
+    with pytest.raises(ValueError):
+        ContextTemplateStore(str(tmp_path)).save("../outside", {})
+
+
+def test_templates_changed_on_disk_are_read_again(tmp_path):
+    store = ContextTemplateStore(str(tmp_path))
+    store.save("example-login", {"cookies": [], "origins": []})
+    assert store.load("example-login") is store.load("example-login")
+
+    # recaptured by another process
+    other = ContextTemplateStore(str(tmp_path))
+    state = {"cookies": [{"name": "sid", "value": "2", "domain": "example.com", "path": "/"}], "origins": []}
+    other.save("example-login", state)
+    path = tmp_path / "example-login.json"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.load("example-login") == state
+
+    other.delete("example-login")
+    with pytest.raises(FileNotFoundError):
+        store.load("example-login")
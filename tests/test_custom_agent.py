@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+
+from browser_use.agent.views import ActionResult, AgentOutput
+from browser_use.browser.views import BrowserState
+from browser_use.controller.service import Controller
+from browser_use.dom.views import DOMElementNode
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.agent.custom_agent import CustomAgent, agent_options_from_env
+from src.agent.custom_message_manager import CustomMessageManager
+from src.agent.custom_prompts import CustomAgentMessagePrompt, CustomSystemPrompt
+from src.browser.custom_context import CustomBrowserState
+
+SCREENSHOT = "iVBORw0KGgo="
+
+
+class _FakeLLM(FakeListChatModel):
+    """Answers every step with the next of its JSON responses, recording the messages it got"""
+
+    calls: list = []
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        def answer(messages):
+            self.calls.append(messages)
+            return {"parsed": schema.model_validate(json.loads(self.responses[len(self.calls) - 1])), "raw": None}
+
+        return RunnableLambda(answer)
+
+
+class _FakeBrowserContext:
+    def __init__(self):
+        self.config = SimpleNamespace(wait_between_actions=0, hash_screenshots=False)
+
+    async def get_state(self):
+        return _state()
+
+    async def get_session(self):
+        return SimpleNamespace(cached_state=SimpleNamespace(selector_map={}))
+
+    async def remove_highlights(self):
+        pass
+
+
+def _state(screenshot=None, screenshot_hash=None):
+    root = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="", attributes={}, children=[])
+    if screenshot_hash is not None:
+        return CustomBrowserState(element_tree=root, selector_map={}, url="https://example.com", title="Example",
+                                  tabs=[], screenshot=screenshot, screenshot_hash=screenshot_hash)
+    return BrowserState(element_tree=root, selector_map={}, url="https://example.com", title="Example", tabs=[],
+                        screenshot=screenshot)
+
+
+def _output(text="done"):
+    return json.dumps({
+        "current_state": {"page_summary": "", "evaluation_previous_goal": "Unknown", "memory": "", "next_goal": "finish"},
+        "action": [{"done": {"text": text}}],
+    })
+
+
+def _manager(**kwargs):
+    return CustomMessageManager(
+        llm=FakeListChatModel(responses=[]),
+        task="Find the deals",
+        action_descriptions="",
+        system_prompt_class=CustomSystemPrompt,
+        agent_prompt_class=CustomAgentMessagePrompt,
+        **kwargs,
+    )
+
+
+def test_step_with_fake_llm():
+    llm = _FakeLLM(responses=[_output("all deals found")], calls=[])
+    agent = CustomAgent(
+        task="Find the deals",
+        llm=llm,
+        add_infos="only flower",
+        browser_context=_FakeBrowserContext(),
+        agent_prompt_class=CustomAgentMessagePrompt,
+        system_prompt_class=CustomSystemPrompt,
+        generate_gif=False,
+        skip_unchanged_screenshots=True,
+    )
+    assert agent.browser_context.config.hash_screenshots
+
+    asyncio.run(agent.step())
+
+    messages = llm.calls[0]
+    assert any("Your ultimate task is" in str(m.content) and "Find the deals" in str(m.content) for m in messages)
+    state_message = messages[-1].content
+    assert "1. Task: Find the deals" in state_message and "only flower" in state_message
+    assert agent.history.is_done()
+    assert agent.history.final_result() == "all deals found"
+    assert agent.history_summary.final_result == "all deals found"
+
+
+def test_state_message_pairs_last_actions_with_results():
+    manager = _manager()
+    output_model = AgentOutput.type_with_custom_actions(Controller().registry.create_action_model())
+    manager.add_model_output(output_model.model_validate_json(_output("looked")))
+    manager.add_state_message(_state(), [ActionResult(extracted_content="3 deals", include_in_memory=True)])
+
+    state_message = manager.history.messages[-1].message.content
+    assert 'Previous action 1/1: {"done":{"text":"looked"}}' in state_message
+    assert "Result of previous action 1/1: 3 deals" in state_message
+
+
+def test_strip_old_screenshots_keeps_last():
+    manager = _manager(compaction_keep_screenshots=1)
+    for _ in range(3):
+        manager.add_state_message(_state(SCREENSHOT), use_vision=True)
+
+    manager._strip_old_screenshots()
+
+    contents = [m.message.content for m in manager.history.messages]
+    assert [isinstance(c, list) for c in contents[-3:]] == [False, False, True]
+    assert "Current url: https://example.com" in contents[-3]
+
+
+def test_compact_messages_folds_oldest_into_summary():
+    manager = _manager(use_context_compaction=True, max_history_messages=6)
+    manager.task_progress = "1. Opened the deals page"
+    for step in range(6):
+        manager.add_state_message(_state())
+        manager.important_contents.append(f"deal {step}")
+        manager._add_message_with_tokens(AIMessage(content=f"output {step}"))
+
+    manager.compact_messages()
+
+    messages = [m.message for m in manager.history.messages]
+    assert len(messages) <= 6
+    assert "Your ultimate task is" in messages[1].content
+    summary = messages[2].content
+    assert summary.startswith("[Summary of earlier steps")
+    assert "1. Opened the deals page" in summary and "deal 5" in summary
+    assert messages[-1].content == "output 5"
+
+    # a later compaction replaces the summary instead of stacking another
+    for step in range(6, 9):
+        manager.add_state_message(_state())
+        manager._add_message_with_tokens(AIMessage(content=f"output {step}"))
+    manager.compact_messages()
+    summaries = [m for m in manager.history.messages if str(m.message.content).startswith("[Summary")]
+    assert len(summaries) == 1
+
+
+def test_summary_message_keeps_newest_contents_within_budget():
+    manager = _manager(compaction_summary_tokens=10)
+    manager.important_contents = ["a" * 20, "b" * 10, "c" * 5]
+
+    summary = manager._build_summary_message().content
+
+    assert len(summary) <= 10 * manager.estimated_characters_per_token
+    assert isinstance(manager._build_summary_message(), HumanMessage)
+    manager.compaction_summary_tokens = 100
+    summary = manager._build_summary_message().content
+    assert summary.index("a" * 20) < summary.index("b" * 10) < summary.index("c" * 5)
+
+
+def test_unchanged_screenshots_are_not_sent_again():
+    manager = _manager(skip_unchanged_screenshots=True, screenshot_hash_threshold=2)
+    hashes = [0b1111, 0b1110, 0b1111_0000_0000, 0b1111_0000_0001]
+    for screenshot_hash in hashes:
+        manager.add_state_message(_state(SCREENSHOT, screenshot_hash), use_vision=True)
+
+    contents = [m.message.content for m in manager.history.messages][-4:]
+    assert [isinstance(c, list) for c in contents] == [True, False, True, False]
+    # compared with the last screenshot sent, not the last one seen
+    assert "Screen unchanged since step 1" in contents[1]
+    assert "Screen unchanged since step 3" in contents[3]
+
+    # states of contexts that do not hash screenshots are always sent
+    manager.add_state_message(_state(SCREENSHOT), use_vision=True)
+    assert isinstance(manager.history.messages[-1].message.content, list)
+
+
+def test_agent_options_from_env(monkeypatch):
+    monkeypatch.delenv("AGENT_CONTEXT_COMPACTION", raising=False)
+    monkeypatch.delenv("AGENT_ELEMENT_DIFF", raising=False)
+    monkeypatch.delenv("AGENT_SKIP_UNCHANGED_SCREENSHOTS", raising=False)
+    assert not any(agent_options_from_env().values())
+
+    monkeypatch.setenv("AGENT_CONTEXT_COMPACTION", "True")
+    monkeypatch.setenv("AGENT_ELEMENT_DIFF", "true")
+    monkeypatch.setenv("AGENT_SKIP_UNCHANGED_SCREENSHOTS", "true")
+    assert agent_options_from_env() == {"use_context_compaction": True, "use_element_diff": True,
+                                        "skip_unchanged_screenshots": True}
+
+
+if __name__ == '__main__':
+    test_step_with_fake_llm()
+    test_state_message_pairs_last_actions_with_results()
+    test_strip_old_screenshots_keeps_last()
+    test_compact_messages_folds_oldest_into_summary()
+    test_summary_message_keeps_newest_contents_within_budget()
+    test_unchanged_screenshots_are_not_sent_again()
@@ -0,0 +1,65 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+from src.browser import custom_browser
+from src.browser.custom_browser import (
+    CustomBrowser,
+    close_warm_browsers,
+    get_warm_browser,
+    preserve_cookie_domains_from_env,
+)
+
+
+def test_only_cookies_of_preserved_domains_are_kept():
+    browser = CustomBrowser(preserve_cookie_domains=["example.com", " .shop.io "])
+    browser.preserve_cookies([
+        {"name": "a", "domain": ".example.com"},
+        {"name": "b", "domain": "login.example.com"},
+        {"name": "c", "domain": "notexample.com"},
+        {"name": "d", "domain": "shop.io"},
+        {"name": "e", "domain": "tracker.net"},
+    ])
+    assert [c["name"] for c in browser.preserved_cookies] == ["a", "b", "d"]
+
+
+def test_preserved_cookie_domains_from_env(monkeypatch):
+    monkeypatch.delenv("CHROME_PRESERVE_COOKIE_DOMAINS", raising=False)
+    assert preserve_cookie_domains_from_env() == []
+
+    monkeypatch.setenv("CHROME_PRESERVE_COOKIE_DOMAINS", "example.com, ,shop.io ,")
+    assert preserve_cookie_domains_from_env() == ["example.com", "shop.io"]
+
+
+def test_cookie_preserving_warm_browsers_are_not_shared(monkeypatch):
+    closed = []
+
+    async def launch(self):
+        return None
+
+    async def close(self):
+        closed.append(self)
+
+    monkeypatch.setattr(CustomBrowser, "get_playwright_browser", launch)
+    monkeypatch.setattr(CustomBrowser, "close", close)
+    monkeypatch.setattr(custom_browser, "_warm_browsers", {})
+
+    async def run():
+        shared = await get_warm_browser(owner="a")
+        assert await get_warm_browser(owner="b") is shared
+
+        first = await get_warm_browser(preserve_cookie_domains=["example.com"], owner="a")
+        second = await get_warm_browser(preserve_cookie_domains=["example.com"], owner="b")
+        assert first is not second and first is not shared
+        assert await get_warm_browser(preserve_cookie_domains=["example.com"], owner="a") is first
+
+        await close_warm_browsers(owner="a")
+        assert closed == [first]
+        assert await get_warm_browser(owner="b") is shared
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    test_only_cookies_of_preserved_domains_are_kept()
@@ -0,0 +1,58 @@
+import sys
+
+sys.path.append(".")
+
+from src.utils.deal_changes import (
+    SiteSnapshot, SnapshotStore, deals_fingerprint, deals_page_source, deals_page_url, diff_deals, validated_by_http,
+)
+
+
+def _deal(title, price, page="https://a.example/deals"):
+    return {"title": title, "description": "Top shelf", "price": price, "sources": [{"website_url": page}]}
+
+
+def test_diff_reports_added_removed_and_changed_deals():
+    before = [_deal("Blue Dream 3.5g", "$25"), _deal("Gelato 3.5g", "$30")]
+    after = [_deal("BLUE DREAM 3.5G", "$20"), _deal("Sour Diesel 1g", "$10")]
+
+    changes = diff_deals(before, after)
+
+    assert [d["title"] for d in changes["added"]] == ["Sour Diesel 1g"]
+    assert [d["title"] for d in changes["removed"]] == ["Gelato 3.5g"]
+    assert [(c["before"]["price"], c["after"]["price"]) for c in changes["changed"]] == [("$25", "$20")]
+    assert diff_deals(before, before) == {"added": [], "removed": [], "changed": []}
+
+
+def test_snapshots_are_persisted(tmp_path):
+    deals = [_deal("Blue Dream 3.5g", "$25"), _deal("Gelato 3.5g", "$30", page="https://a.example/")]
+    store = SnapshotStore(str(tmp_path / "snapshots.json"))
+    store.put(SiteSnapshot(
+        website_url="https://a.example",
+        location="Denver",
+        deals_page_url=deals_page_url(deals + deals[:1], "https://a.example"),
+        etag='"abc"',
+        deals=deals,
+    ))
+
+    snapshot = SnapshotStore(str(tmp_path / "snapshots.json")).get("https://a.example", "Denver")
+
+    assert snapshot.deals_page_url == "https://a.example/deals"
+    assert snapshot.etag == '"abc"' and snapshot.deals == deals
+    assert store.get("https://a.example", "Boulder") is None
+
+def test_fingerprint_ignores_order_whitespace_and_provenance():
+    deals = [_deal("Blue Dream 3.5g", "$25"), _deal("Gelato 3.5g", "$30")]
+    reordered = [{**_deal("Gelato  3.5g", "$30 "), "sources": []}, _deal("Blue Dream 3.5g", "$25")]
+
+    assert deals_fingerprint(deals) == deals_fingerprint(reordered)
+    assert deals_fingerprint(deals) != deals_fingerprint([_deal("Blue Dream 3.5g", "$20"), deals[1]])
+    assert deals_fingerprint([]) is None
+
+
+def test_only_container_deals_are_validated_by_http():
+    deals = [{**_deal("Blue Dream 3.5g", "$25"), "sources": [{"website_url": "https://a.example/deals", "source": "api"}]}]
+
+    assert deals_page_source(deals, "https://a.example/deals") == "api"
+    assert deals_page_source(deals, "https://a.example/") is None
+    assert not validated_by_http("api") and not validated_by_http("profile:dutchie")
+    assert validated_by_http(".deals-container")
@@ -0,0 +1,40 @@
+import sys
+
+sys.path.append(".")
+
+from src.utils.deal_crawler import CrawlFrontier, canonicalize_url, link_score
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTPS://Shop.Example.com:443/Deals/?utm_source=x&b=2&a=1#top") == \
+        "https://shop.example.com/Deals?a=1&b=2"
+    assert canonicalize_url("../specials/", base="https://shop.example.com/menu/flower") == \
+        "https://shop.example.com/specials"
+    assert canonicalize_url("https://shop.example.com") == "https://shop.example.com/"
+    assert canonicalize_url("mailto:deals@example.com") is None
+    assert canonicalize_url("/flyer.pdf", base="https://shop.example.com/") is None
+
+
+def test_link_score():
+    assert link_score("Weekly Deals", "https://a.example/promotions") > link_score("Shop", "https://a.example/shop")
+    assert link_score("2", "https://a.example/deals?page=2") > 0
+    assert link_score("About us", "https://a.example/about") == 0
+
+
+def test_frontier_is_bounded_and_best_first():
+    frontier = CrawlFrontier("https://www.a.example/", max_pages=3, max_depth=2)
+    assert frontier.pop() == ("https://www.a.example/", 0)
+    assert frontier.add("/shop", "Shop", depth=1, base="https://www.a.example/")
+    assert frontier.add("https://a.example/deals/#daily", "Daily Deals", depth=1)
+    # already queued (under either host), off site, too deep, unrelated
+    assert not frontier.add("https://a.example/deals", "Deals", depth=1)
+    assert not frontier.add("https://www.a.example/deals", "Deals", depth=1)
+    assert not frontier.add("https://a.example/", "Home deals", depth=1)
+    assert not frontier.add("https://b.example/deals", "Deals", depth=1)
+    assert not frontier.add("https://a.example/specials", "Specials", depth=3)
+    assert not frontier.add("https://a.example/contact", "Contact", depth=1)
+
+    assert frontier.pop() == ("https://a.example/deals", 1)
+    assert frontier.pop() == ("https://www.a.example/shop", 1)
+    assert frontier.add("https://a.example/sale", "Sale", depth=2)
+    assert frontier.pop() is None
@@ -0,0 +1,57 @@
+import sys
+
+sys.path.append(".")
+
+from src.utils.deal_dedup import DealDedupIndex, dedupe_report
+
+
+def _deal(title, price="$25.00", description="Top shelf flower, while supplies last"):
+    return {"title": title, "description": description, "price": price, "original_price": "N/A"}
+
+
+def test_duplicates_are_merged_with_their_sources():
+    index = DealDedupIndex()
+
+    new = index.add_many([_deal("Blue Dream 3.5g"), _deal("Gelato 3.5g", "$30")],
+                         website_url="https://a.example/deals", source=".deals-container")
+    assert len(new) == 2
+    # the carousel repeats the container, with different casing and a reworded description
+    new = index.add_many([_deal("BLUE DREAM 3.5G"), _deal("Blue Dream 3.5g!", description="Top shelf flower while supplies last!")],
+                         website_url="https://a.example/", source=".slick-carousel")
+    assert new == []
+
+    deals = index.deals()
+    assert len(deals) == 2 and index.duplicates == 2
+    assert deals[0]["occurrences"] == 3
+    assert [s["source"] for s in deals[0]["sources"]] == [".deals-container", ".slick-carousel"]
+
+
+def test_near_duplicates_are_merged():
+    index = DealDedupIndex()
+    description = "Top shelf indoor flower from our friends at Acme Farms, while supplies last"
+    index.add(_deal("Blue Dream 3.5g", description=description), website_url="https://a.example")
+
+    record, new = index.add(_deal("Blue Dream 3.5g Sale", description=description + " today"), website_url="https://a.example")
+    assert not new and record["occurrences"] == 2
+
+    # a templated description does not make two strains the same deal
+    assert index.add(_deal("Gelato 3.5g", description=description), website_url="https://a.example")[1]
+
+
+def test_same_title_at_another_price_or_site_is_kept():
+    index = DealDedupIndex()
+    index.add(_deal("Blue Dream 3.5g"), website_url="https://a.example")
+    assert index.add(_deal("Blue Dream 3.5g", "$20"), website_url="https://a.example")[1]
+    assert index.add(_deal("Blue Dream 3.5g"), website_url="https://b.example")[1]
+
+
+def test_cross_location_merge_keeps_provenance():
+    report = {
+        "Denver - https://a.example": [_deal("Blue Dream 3.5g")],
+        "Boulder - https://b.example": [_deal("Blue Dream 3.5g"), _deal("Gelato 3.5g")],
+    }
+
+    assert sum(map(len, dedupe_report(report).values())) == 3
+    merged = dedupe_report(report, cross_location=True)
+    assert [len(deals) for deals in merged.values()] == [1, 1]
+    assert [s["location"] for s in merged["Denver - https://a.example"][0]["sources"]] == ["Denver", "Boulder"]
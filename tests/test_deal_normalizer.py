@@ -0,0 +1,55 @@
+import sys
+import warnings
+
+sys.path.append(".")
+
+from src.utils.deal_normalizer import aggregate_deals, export_deals, normalize_deals
+
+
+REPORT = {
+    "Denver - https://a.example": [
+        {"title": "Blue Dream Eighth", "description": "Top shelf flower", "price": "$25.00", "original_price": "$40.00"},
+        {"title": "Gummies", "description": "100mg edibles", "price": "2 for $40", "original_price": "N/A"},
+        {"title": "Live Rosin", "description": "20% off all concentrates", "price": "Price N/A", "original_price": "N/A"},
+        {"full_page_deals_text": "Deals page"},
+    ],
+    "Boulder - https://b.example": [{"error": "Timeout", "website_url": "https://b.example"}],
+}
+
+
+def test_prices_discounts_and_categories_are_parsed():
+    df = normalize_deals(REPORT).set_index("title")
+
+    assert df.loc["Blue Dream Eighth", "price"] == 25.0
+    assert df.loc["Blue Dream Eighth", "discount_pct"] == 37.5
+    assert df.loc["Blue Dream Eighth", "weight_grams"] == 3.5
+    assert df.loc["Gummies", "unit_price"] == 20.0
+    assert df.loc["Live Rosin", "discount_pct"] == 20.0
+    assert df["price"].isna().sum() == 3
+    assert list(df["category"].dropna()) == ["flower", "edible", "concentrate"]
+
+
+def test_named_weights_fill_without_dtype_warnings():
+    report = {"Denver - https://a.example": [
+        {"title": "Gelato quarter", "description": "No Description", "price": "$45", "original_price": "$60"},
+        {"title": "Gelato 1g", "description": "No Description", "price": "$10", "original_price": "$15"},
+        {"title": "Pre-roll", "description": "No Description", "price": "$5", "original_price": "N/A"},
+    ]}
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        df = normalize_deals(report).set_index("title")
+
+    assert df["weight"].dtype == "float64"
+    assert (df.loc["Gelato quarter", "weight"], df.loc["Gelato quarter", "weight_unit"]) == (7.0, "g")
+    assert (df.loc["Gelato 1g", "weight"], df.loc["Gelato 1g", "weight_unit"]) == (1.0, "g")
+    assert df["weight"].isna().sum() == 1
+
+
+def test_table_is_aggregated_and_exported(tmp_path):
+    df = normalize_deals(REPORT)
+
+    summary = aggregate_deals(df, by=["location"])
+
+    assert summary.to_dict("records")[0]["deals"] == 3
+    path = export_deals(df, str(tmp_path / "deals.csv"))
+    assert open(path).readline().startswith("location,website_url,kind,title")
@@ -0,0 +1,33 @@
+import sys
+
+sys.path.append(".")
+
+from src.utils.deal_store import DealStore
+
+
+def _report(blue_dream_price, gelato_price):
+    return {
+        "Denver - https://a.example": [
+            {"title": "Blue Dream 3.5g", "description": "Flower", "price": blue_dream_price, "original_price": "$40"},
+            {"title": "Gummies", "description": "Edibles", "price": "2 for $30", "original_price": "N/A"},
+            {"full_page_deals_text": "not a deal"},
+        ],
+        "Boulder - https://b.example": [
+            {"title": "Gelato 3.5g", "description": "Flower", "price": gelato_price, "original_price": "N/A"},
+        ],
+    }
+
+
+def test_price_history_and_best_current_deals(tmp_path):
+    store = DealStore(str(tmp_path / "deals.db"))
+    store.record_report(_report("$25", "$22"), observed_at=1000)
+    store.record_report(_report("$20", "$24"), observed_at=2000)
+
+    history = store.price_history("BLUE DREAM 3.5G")
+    assert [(row["observed_at"], row["price"]) for row in history] == [(1000, 25.0), (2000, 20.0)]
+    assert len(store.price_history("blue dream", partial=True)) == 2
+    assert store.price_history("Blue Dream 3.5g", location="Boulder") == []
+
+    best = {row["category"]: (row["title"], row["unit_price"]) for row in store.best_current_deals()}
+    assert best == {"edible": ("Gummies", 15.0), "flower": ("Blue Dream 3.5g", 20.0)}
+    assert len(store.frame(since=1500)) == 3
@@ -0,0 +1,82 @@
+import sys
+
+sys.path.append(".")
+
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+from src.utils.element_diff import ElementTreeDiffer
+
+ATTRIBUTES = ["aria-label"]
+
+
+def _state(buttons, url="https://example.com/deals"):
+    """State with a button per (xpath, label) pair, highlighted in order"""
+    root = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    selector_map = {}
+    for index, (xpath, label) in enumerate(buttons, start=1):
+        node = DOMElementNode(is_visible=True, parent=root, tag_name="button", xpath=xpath,
+                              attributes={"aria-label": label}, children=[], highlight_index=index,
+                              is_interactive=True)
+        node.children.append(DOMTextNode(text=label, is_visible=True, parent=node))
+        root.children.append(node)
+        selector_map[index] = node
+    return BrowserState(element_tree=root, selector_map=selector_map, url=url, title="Deals", tabs=[])
+
+
+BUTTONS = [(f"/body/button[{i}]", f"Deal {i}") for i in range(1, 11)]
+
+
+def test_first_render_is_a_full_snapshot():
+    view = ElementTreeDiffer().render(_state(BUTTONS), ATTRIBUTES, step_number=1)
+
+    assert view.is_snapshot and view.snapshot_step == 1 and view.unchanged == 10
+    assert '[1]<button aria-label="Deal 1">Deal 1</button>' in view.text
+
+
+def test_diff_lists_added_changed_and_removed_elements():
+    differ = ElementTreeDiffer()
+    differ.render(_state(BUTTONS), ATTRIBUTES, step_number=1)
+
+    buttons = BUTTONS[:9] + [("/body/button[11]", "Deal 11")]
+    buttons[0] = (buttons[0][0], "Deal 1 - sold out")
+    view = differ.render(_state(buttons), ATTRIBUTES, step_number=2)
+
+    assert not view.is_snapshot and view.snapshot_step == 1
+    assert (view.added, view.changed, view.removed, view.unchanged) == (1, 1, 1, 8)
+    added, changed, removed = (view.text.split(heading)[1] for heading in ("Added:", "Changed:", "Removed"))
+    assert "Deal 11" in added and "Deal 1 - sold out" in changed and "Deal 10" in removed
+    # removed elements are shown without their stale index
+    assert "[10]" not in removed
+
+
+def test_unchanged_page_renders_a_single_line():
+    differ = ElementTreeDiffer()
+    differ.render(_state(BUTTONS), ATTRIBUTES, step_number=1)
+
+    view = differ.render(_state(BUTTONS), ATTRIBUTES, step_number=2)
+
+    assert view.text == "No changes since the element snapshot of step 1 (10 elements)."
+
+
+def test_new_snapshot_on_url_change_interval_and_large_diff():
+    differ = ElementTreeDiffer(full_snapshot_interval=3, max_diff_ratio=0.5)
+    differ.render(_state(BUTTONS), ATTRIBUTES, step_number=1)
+
+    assert differ.render(_state(BUTTONS, url="https://example.com/menu"), ATTRIBUTES, step_number=2).is_snapshot
+    assert not differ.render(_state(BUTTONS, url="https://example.com/menu"), ATTRIBUTES, step_number=3).is_snapshot
+    assert differ.render(_state(BUTTONS, url="https://example.com/menu"), ATTRIBUTES, step_number=5).is_snapshot
+
+    relabeled = [(xpath, label + " new") for xpath, label in BUTTONS]
+    view = differ.render(_state(relabeled, url="https://example.com/menu"), ATTRIBUTES, step_number=6)
+    assert view.is_snapshot and view.snapshot_step == 6
+
+    differ.reset()
+    assert differ.render(_state(relabeled, url="https://example.com/menu"), ATTRIBUTES, step_number=7).is_snapshot
+
+
+if __name__ == '__main__':
+    test_first_render_is_a_full_snapshot()
+    test_diff_lists_added_changed_and_removed_elements()
+    test_unchanged_page_renders_a_single_line()
+    test_new_snapshot_on_url_change_interval_and_large_diff()
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from src.browser.smart_wait import smart_wait
+from src.controller.custom_controller import CustomController
+from src.utils.hash_deals_agent import hash_deals_agent
+
+START = "https://a.example/"
+
+
+def _deal(title, price):
+    return {"title": title, "description": "Top shelf", "price": price, "original_price": "$40"}
+
+
+class _FakeLLM(FakeListChatModel):
+    """Answers every step with the next of its JSON responses"""
+
+    calls: list = []
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        def answer(messages):
+            self.calls.append(messages)
+            return {"parsed": schema.model_validate(json.loads(self.responses[len(self.calls) - 1])), "raw": None}
+
+        return RunnableLambda(answer)
+
+
+def _step(action):
+    return json.dumps({
+        "current_state": {"page_summary": "", "evaluation_previous_goal": "Unknown", "memory": "", "next_goal": ""},
+        "action": [action],
+    })
+
+
+class _Locator:
+    """Elements of the fake DOM: a deals container holds deal items, a deal item holds its fields"""
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    @property
+    def first(self):
+        return _Locator(self.elements[:1])
+
+    async def count(self):
+        return len(self.elements)
+
+    async def all(self):
+        return [_Locator([element]) for element in self.elements]
+
+    async def is_visible(self):
+        return bool(self.elements)
+
+    async def inner_text(self, timeout=None):
+        return self.elements[0]
+
+    def locator(self, selector):
+        element = self.elements[0] if self.elements else None
+        if isinstance(element, list):
+            # a deals container, any item selector finds its deals
+            return _Locator(element if ".deal-item" in selector else [])
+        if isinstance(element, dict):
+            field = {"h2": "title", "p": "description", ".price": "price", ".original-price": "original_price"}
+            return _Locator([element[key] for prefix, key in field.items() if selector.startswith(prefix)][:1])
+        return _Locator([])
+
+
+class _Page:
+    """A page of a fake site: {url: {"links": [(href, text)], "deals": [deal, ...], "body": text}}"""
+
+    def __init__(self, site):
+        self.site = site
+        self.url = "about:blank"
+        self.closed = False
+        self.visits = []
+
+    @property
+    def document(self):
+        return self.site.get(self.url, {})
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+        self.visits.append(url)
+
+    async def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        if isinstance(arg, list) and arg and isinstance(arg[0], dict):
+            # no platform fingerprint matches
+            return [0] * len(arg)
+        return True
+
+    async def eval_on_selector_all(self, selector, script):
+        return [[href, text, ""] for href, text in self.document.get("links", [])]
+
+    def locator(self, selector):
+        if selector == "body":
+            return _Locator([self.document.get("body", "")])
+        if selector == ".deals-container" and self.document.get("deals"):
+            return _Locator([self.document["deals"]])
+        return _Locator([])
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class _BrowserContext:
+    def __init__(self, site, config):
+        self.site = site
+        self.config = config
+        self.response_capture = None
+        self.pages = [_Page(site)]
+        self.failed = False
+        self.closed = False
+        self.session = SimpleNamespace(
+            current_page=self.pages[0],
+            context=SimpleNamespace(new_page=self._new_page),
+            cached_state=SimpleNamespace(selector_map={}),
+        )
+
+    async def _new_page(self):
+        self.pages.append(_Page(self.site))
+        self.session.current_page = self.pages[-1]
+        return self.pages[-1]
+
+    async def get_session(self):
+        return self.session
+
+    async def get_current_page(self):
+        return self.session.current_page
+
+    async def get_state(self):
+        root = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="", attributes={}, children=[])
+        return BrowserState(element_tree=root, selector_map={}, url=self.session.current_page.url, title="", tabs=[])
+
+    async def remove_highlights(self):
+        pass
+
+    def mark_failed(self):
+        self.failed = True
+
+    async def close(self):
+        self.closed = True
+
+
+class _Browser:
+    def __init__(self, site):
+        self.site = site
+        self.contexts = []
+
+    async def new_context(self, config=None):
+        self.contexts.append(_BrowserContext(self.site, config))
+        return self.contexts[-1]
+
+
+def _run(site, responses, monkeypatch, **kwargs):
+    monkeypatch.setattr(smart_wait, "idle_ms", 10)
+    monkeypatch.setattr(smart_wait, "quiet_ms", 10)
+    browser = _Browser(site)
+    llm = _FakeLLM(responses=responses, calls=[])
+    deals = asyncio.run(hash_deals_agent(START, "Denver", llm, browser=browser, **kwargs))
+    return deals, browser.contexts[0]
+
+
+def test_hash_deals_agent_runs_the_controller_actions(monkeypatch):
+    site = {START: {"deals": [_deal("Blue Dream 3.5g", "$25"), _deal("Gelato 1g", "$10")], "body": "Deals"}}
+
+    deals, context = _run(site, [
+        _step({"extract_deals_information": {}}),
+        _step({"done": {"text": "found the deals"}}),
+    ], monkeypatch, crawl=False)
+
+    assert [deal["title"] for deal in deals] == ["Blue Dream 3.5g", "Gelato 1g"]
+    assert all("error" not in deal for deal in deals)
+    assert context.pages[0].visits == [START]
+    assert context.closed and not context.failed
+
+
+def test_crawl_initial_action_collects_the_deals_of_the_site(monkeypatch):
+    site = {
+        START: {"links": [("/deals", "Deals"), ("/specials?utm_source=nav", "Weekly specials"), ("/about", "About us")],
+                "body": "Welcome"},
+        "https://a.example/deals": {"deals": [_deal("Blue Dream 3.5g", "$25")], "links": [("/", "Home")]},
+        "https://a.example/specials": {"deals": [_deal("Gelato 1g", "$10"), _deal("Blue Dream 3.5g", "$25")]},
+    }
+
+    deals, context = _run(site, [_step({"done": {"text": "the crawl found the deals"}})], monkeypatch, crawl=True)
+
+    assert sorted(deal["title"] for deal in deals) == ["Blue Dream 3.5g", "Gelato 1g"]
+    visited = [url for page in context.pages[1:] for url in page.visits]
+    assert sorted(visited) == [START, "https://a.example/deals", "https://a.example/specials"]
+    # the crawl tabs are closed and the agent continues on its own page
+    assert all(page.closed for page in context.pages[1:])
+    assert context.session.current_page is context.pages[0]
+
+
+if __name__ == '__main__':
+    import pytest
+
+    pytest.main([__file__])
@@ -0,0 +1,112 @@
+import asyncio
+import base64
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.append(".")
+
+from browser_use.agent.views import ActionResult, AgentHistory, AgentHistoryList, AgentOutput
+from browser_use.browser.views import BrowserStateHistory
+from browser_use.controller.service import Controller
+
+from src.agent.custom_views import DealsActionResult
+from src.utils.history_store import HistoryReader, HistoryWriter
+from src.utils.history_summary import HistorySummary
+
+ActionModel = Controller().registry.create_action_model()
+OutputModel = AgentOutput.type_with_custom_actions(ActionModel)
+
+
+def _screenshot(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _step(url, screenshot, result, action=None):
+    model_output = None
+    if action is not None:
+        model_output = OutputModel.model_validate({
+            "current_state": {"page_summary": "", "evaluation_previous_goal": "", "memory": "", "next_goal": url},
+            "action": [action],
+        })
+    return AgentHistory(
+        model_output=model_output,
+        result=[result],
+        state=BrowserStateHistory(url=url, title=url, tabs=[], interacted_element=[None], screenshot=screenshot),
+    )
+
+
+def test_steps_are_streamed_and_read_lazily(tmp_path):
+    red = _screenshot("red")
+    with HistoryWriter(str(tmp_path), "run") as writer:
+        writer.append(_step("https://a", red, ActionResult(error="timeout"), {"go_to_url": {"url": "https://a"}}))
+        # written before the run ends
+        assert HistoryReader(writer.path).errors() == ["timeout"]
+        writer.append(_step("https://b", red, ActionResult(extracted_content="found", is_done=True),
+                            {"done": {"text": "found"}}))
+
+    # identical screenshots are stored once
+    assert len(os.listdir(tmp_path / "screenshots")) == 1
+    reader = HistoryReader(str(tmp_path / "run.jsonl"))
+    assert reader.final_result() == "found" and reader.is_done()
+    assert [list(action)[0] for action in reader.model_actions()] == ["go_to_url", "done"]
+
+    history = reader.load(OutputModel)
+    assert history.final_result() == "found"
+    assert history.screenshots() == [red, red]
+
+
+def test_reused_screenshots_are_touched_and_missing_ones_tolerated(tmp_path):
+    red = _screenshot("red")
+    with HistoryWriter(str(tmp_path), "old") as writer:
+        writer.append(_step("https://a", red, ActionResult(extracted_content="a")))
+    path = tmp_path / "screenshots" / os.listdir(tmp_path / "screenshots")[0]
+    os.utime(path, (0, 0))
+
+    with HistoryWriter(str(tmp_path), "new") as writer:
+        writer.append(_step("https://a", red, ActionResult(extracted_content="a")))
+    # retention sees the screenshot as recent as the new run that references it
+    assert os.stat(path).st_mtime > 0
+
+    os.remove(path)
+    reader = HistoryReader(str(tmp_path / "new.jsonl"))
+    assert reader.screenshot(reader.step(1)) is None
+    assert reader.load(OutputModel).history[0].state.screenshot is None
+
+def test_summary_matches_history_views():
+    history = AgentHistoryList(history=[
+        _step("https://a", None, ActionResult(error="timeout"), {"go_to_url": {"url": "https://a"}}),
+        _step("https://b", None, ActionResult(extracted_content="found", is_done=True), {"done": {"text": "found"}}),
+    ])
+
+    summary = HistorySummary.from_history(history)
+
+    assert summary.final_result == history.final_result()
+    assert summary.is_done == history.is_done()
+    assert summary.errors == history.errors()
+    assert summary.model_actions == history.model_actions()
+    assert summary.model_thoughts == history.model_thoughts()
+
+
+def test_summary_collects_deals_of_controller_actions():
+    deals = [{"title": "Blue Dream 3.5g", "description": "No Description", "price": "$25.00", "original_price": "$35.00"}]
+    controller = Controller()
+
+    @controller.registry.action("Extract deals")
+    async def extract_deals():
+        return DealsActionResult(extracted_content=f"Extracted deals: {deals}", structured_content=deals)
+
+    action = controller.registry.create_action_model().model_validate({"extract_deals": {}})
+    result = asyncio.run(controller.act(action, browser_context=None))
+    assert isinstance(result, DealsActionResult)
+
+    summary = HistorySummary.from_history(AgentHistoryList(history=[
+        _step("https://a", None, result, {"go_to_url": {"url": "https://a"}}),
+        _step("https://a", None, ActionResult(extracted_content="no deals"), {"go_to_url": {"url": "https://a"}}),
+    ]))
+
+    assert summary.structured_content == deals
@@ -0,0 +1,122 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+
+from src.utils import hash_deals_agent as module
+from src.utils.deal_changes import SnapshotStore, deals_fingerprint
+
+PAGE = "https://a.example/deals"
+
+
+def _deals(source, price="$25"):
+    return [
+        {"title": "Blue Dream 3.5g", "description": "No Description", "price": price, "original_price": "$35",
+         "sources": [{"website_url": PAGE, "source": source}]},
+        {"title": "Gelato 1g", "description": "No Description", "price": "$10", "original_price": "$15",
+         "sources": [{"website_url": PAGE, "source": source}]},
+    ]
+
+
+class _Scraper:
+    """hash_deals_agent returning the given deals and fingerprinting them like the controller"""
+
+    def __init__(self, deals):
+        self.deals = deals
+        self.calls = 0
+
+    async def __call__(self, website_url, location_name, llm, headless, disable_security, controller=None, **kwargs):
+        self.calls += 1
+        controller.page_fingerprints[PAGE] = deals_fingerprint(self.deals)
+        return self.deals
+
+
+class _FakeContext:
+    response_capture = None
+
+    async def get_current_page(self):
+        return SimpleNamespace(goto=self._goto)
+
+    async def _goto(self, url, **kwargs):
+        pass
+
+    async def close(self):
+        pass
+
+
+class _FakeBrowser:
+    async def new_context(self, config=None):
+        return _FakeContext()
+
+
+def _patch(monkeypatch, scraper, unchanged_by_http=True, page_deals=None):
+    validator_requests = []
+
+    async def fetch_validators(url, etag=None, last_modified=None):
+        validator_requests.append(url)
+        return {"etag": '"v1"', "last_modified": None, "unchanged": unchanged_by_http and etag == '"v1"'}
+
+    async def extract_page_deals(page, capture=None):
+        return page_deals
+
+    async def settle(page):
+        return True
+
+    monkeypatch.setattr(module, "hash_deals_agent", scraper)
+    monkeypatch.setattr(module, "fetch_validators", fetch_validators)
+    monkeypatch.setattr(module, "extract_page_deals", extract_page_deals)
+    monkeypatch.setattr(module, "smart_wait", SimpleNamespace(settle=settle))
+    return validator_requests
+
+
+def _run(store, browser=None):
+    return asyncio.run(module.incremental_hash_deals_agent(
+        "https://a.example", "Denver", llm=None, store=store, browser=browser
+    ))
+
+
+def test_container_deals_are_skipped_by_http_validators(tmp_path, monkeypatch):
+    scraper = _Scraper(_deals(".deals-container"))
+    _patch(monkeypatch, scraper)
+    store = SnapshotStore(str(tmp_path / "snapshots.json"))
+
+    first = _run(store)
+    assert first["status"] == "new"
+    snapshot = store.get("https://a.example", "Denver")
+    assert (snapshot.source, snapshot.etag, snapshot.deals_page_url) == (".deals-container", '"v1"', PAGE)
+
+    second = _run(store)
+    assert (second["status"], second["checked_by"]) == ("unchanged", "http")
+    assert second["deals"] == scraper.deals
+    assert scraper.calls == 1
+
+
+def test_api_deals_are_compared_by_their_fingerprint(tmp_path, monkeypatch):
+    scraper = _Scraper(_deals("api"))
+    validator_requests = _patch(monkeypatch, scraper, page_deals=("api", _deals("api")))
+    store = SnapshotStore(str(tmp_path / "snapshots.json"))
+
+    _run(store)
+    # the HTML document says nothing about the deals of its API responses
+    assert validator_requests == []
+    assert store.get("https://a.example", "Denver").etag is None
+
+    second = _run(store, browser=_FakeBrowser())
+    assert (second["status"], second["checked_by"]) == ("unchanged", "dom")
+    assert scraper.calls == 1
+    assert validator_requests == []
+
+
+def test_changed_api_deals_are_scraped_again(tmp_path, monkeypatch):
+    scraper = _Scraper(_deals("api"))
+    _patch(monkeypatch, scraper, page_deals=("api", _deals("api", price="$20")))
+    store = SnapshotStore(str(tmp_path / "snapshots.json"))
+    _run(store)
+
+    scraper.deals = _deals("api", price="$20")
+    second = _run(store, browser=_FakeBrowser())
+
+    assert second["status"] == "changed"
+    assert scraper.calls == 2
+    assert [(c["before"]["price"], c["after"]["price"]) for c in second["changes"]["changed"]] == [("$25", "$20")]
@@ -0,0 +1,149 @@
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(".")
+
+from src.browser.live_view import LiveViewHub, ScreencastStream
+
+
+class _FakeCDPSession:
+    def __init__(self):
+        self.sent = []
+        self.handlers = {}
+        self.detached = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+
+    async def detach(self):
+        self.detached = True
+
+    def frame(self, data, session_id=1):
+        self.handlers["Page.screencastFrame"]({"data": data, "sessionId": session_id,
+                                               "metadata": {"timestamp": time.time()}})
+
+
+class _FakePage:
+    def __init__(self, url="https://example.com/deals"):
+        self.url = url
+        self.cdp_sessions = []
+        self.close_handlers = []
+        self.context = SimpleNamespace(new_cdp_session=self._new_cdp_session)
+
+    async def _new_cdp_session(self, page):
+        self.cdp_sessions.append(_FakeCDPSession())
+        return self.cdp_sessions[-1]
+
+    def once(self, event, handler):
+        assert event == "close"
+        self.close_handlers.append(handler)
+
+    def close(self):
+        for handler in self.close_handlers:
+            handler(self)
+
+
+def test_frames_fan_out_and_slow_viewers_get_the_newest():
+    async def run():
+        page = _FakePage()
+        stream = ScreencastStream(page, max_fps=1000, quality=40, max_width=640)
+        await stream.start()
+        cdp = page.cdp_sessions[0]
+        assert cdp.sent[0] == ("Page.startScreencast", {"format": "jpeg", "quality": 40, "everyNthFrame": 1,
+                                                        "maxWidth": 640})
+
+        fast, slow = stream.subscribe(), stream.subscribe()
+        cdp.frame("frame-1")
+        assert await fast.get() == "frame-1"
+        cdp.frame("frame-2")
+        assert (await fast.get(), await slow.get()) == ("frame-2", "frame-2")
+        assert (stream.metrics.frames_received, stream.metrics.frames_delivered, stream.metrics.frames_dropped) == (2, 4, 1)
+
+        # late viewers start with the latest frame
+        assert stream.subscribe().get_nowait() == "frame-2"
+
+        await asyncio.sleep(0.05)
+        assert [params for method, params in cdp.sent if method == "Page.screencastFrameAck"] == [
+            {"sessionId": 1}, {"sessionId": 1}
+        ]
+        await stream.stop()
+        assert cdp.sent[-1][0] == "Page.stopScreencast" and cdp.detached and not stream.is_running
+
+    asyncio.run(run())
+
+
+def test_ack_is_held_back_to_max_fps():
+    async def run():
+        page = _FakePage()
+        stream = ScreencastStream(page, max_fps=10)
+        await stream.start()
+        cdp = page.cdp_sessions[0]
+
+        cdp.frame("frame-1")
+        await asyncio.sleep(0.02)
+        assert not any(method == "Page.screencastFrameAck" for method, _ in cdp.sent)
+        await asyncio.sleep(0.12)
+        assert any(method == "Page.screencastFrameAck" for method, _ in cdp.sent)
+
+        # a stopped stream does not ack pending frames
+        cdp.frame("frame-2")
+        await stream.stop()
+        await asyncio.sleep(0.12)
+        assert sum(method == "Page.screencastFrameAck" for method, _ in cdp.sent) == 1
+
+    asyncio.run(run())
+
+
+def test_hub_shares_one_stream_per_page_and_releases_idle_ones():
+    async def run():
+        hub = LiveViewHub(max_fps=1000)
+        page, other = _FakePage(), _FakePage("https://example.com/menu")
+
+        assert await hub.latest_frame(page) is None
+        stream = await hub.stream_for_page(page)
+        assert await hub.stream_for_page(page) is stream and len(page.cdp_sessions) == 1
+        page.cdp_sessions[0].frame("frame-1")
+        assert await hub.latest_frame(page) == "frame-1"
+        assert hub.metrics()[page.url]["frames_received"] == 1
+
+        watched = await hub.stream_for_page(other)
+        watched.subscribe()
+        stream.last_read_at = watched.last_read_at = time.time() - 60
+        await hub.release_idle(max_idle=10)
+        # only the stream nobody subscribed to or polled is stopped
+        assert not stream.is_running and watched.is_running
+        assert list(hub.metrics()) == [other.url]
+
+        other.close()
+        assert hub.metrics() == {}
+        await hub.close()
+
+    asyncio.run(run())
+
+
+def test_releasing_pages_stops_only_their_streams():
+    async def run():
+        hub = LiveViewHub(max_fps=1000)
+        closed, other = _FakePage(), _FakePage("https://example.com/menu")
+        stream, watched = await hub.stream_for_page(closed), await hub.stream_for_page(other)
+        stream.subscribe()
+
+        await hub.release_pages([closed, _FakePage()])
+        # a stream with viewers is stopped too, an idle stream of another page is not
+        assert not stream.is_running and watched.is_running
+        assert list(hub.metrics()) == [other.url]
+        await hub.close()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    test_frames_fan_out_and_slow_viewers_get_the_newest()
+    test_ack_is_held_back_to_max_fps()
+    test_hub_shares_one_stream_per_page_and_releases_idle_ones()
+    test_releasing_pages_stops_only_their_streams()
@@ -0,0 +1,124 @@
+import random
+import sys
+import time
+
+sys.path.append(".")
+
+from browser_use.agent.message_manager.views import MessageMetadata
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.agent.custom_views import CustomMessageHistory
+
+
+def _build_history():
+    history = CustomMessageHistory()
+    history.add_message(SystemMessage(content="system"), MessageMetadata(input_tokens=10))
+    history.add_message(HumanMessage(content="context"), MessageMetadata(input_tokens=5))
+    for step in range(5):
+        history.add_message(HumanMessage(content=f"state {step}"), MessageMetadata(input_tokens=100))
+        history.add_message(AIMessage(content=f"output {step}"), MessageMetadata(input_tokens=20))
+    return history
+
+
+def test_trim_to_removes_oldest_span():
+    history = _build_history()
+    assert history.total_tokens == 615
+
+    removed = history.trim_to(400, keep=2)
+
+    assert removed == 3
+    assert history.total_tokens == 395
+    contents = [m.message.content for m in history.messages]
+    assert contents[:3] == ["system", "context", "output 1"]
+    assert history.human_message_count() == 4
+
+
+def test_remove_human_message_by_index():
+    history = _build_history()
+
+    history.remove_human_message(-1)
+    assert [m.message.content for m in history.messages][-2:] == ["output 3", "output 4"]
+
+    history.remove_human_message(-2)
+    contents = [m.message.content for m in history.messages]
+    assert "state 2" not in contents
+    assert "state 3" in contents
+    assert history.total_tokens == 415
+
+
+def test_insert_keeps_running_sums():
+    history = _build_history()
+    history.add_message(AIMessage(content="plan"), MessageMetadata(input_tokens=50), position=-1)
+    assert [m.message.content for m in history.messages][-3:] == ["state 4", "plan", "output 4"]
+
+    history.trim_to(300, keep=2)
+    assert history.total_tokens <= 300
+    assert history.messages[0].message.content == "system"
+    assert sum(m.metadata.input_tokens for m in history.messages) == history.total_tokens
+
+
+def test_matches_a_list_under_random_operations():
+    rng = random.Random(7)
+    history = CustomMessageHistory()
+    expected = []
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.5 or not expected:
+            message = (HumanMessage if rng.random() < 0.5 else AIMessage)(content=str(rng.random()))
+            metadata = MessageMetadata(input_tokens=rng.randint(0, 50))
+            position = rng.choice([None, -1, 0, rng.randint(0, len(expected))])
+            history.add_message(message, metadata, position)
+            expected.insert(len(expected) if position is None else position, (message, metadata.input_tokens))
+        elif op < 0.7:
+            index = rng.randint(-len(expected), len(expected) - 1)
+            history.remove_message(index)
+            del expected[index]
+        elif op < 0.85:
+            humans = [i for i, (m, _) in enumerate(expected) if isinstance(m, HumanMessage)]
+            remove_ind = -rng.randint(1, 3)
+            history.remove_human_message(remove_ind)
+            if abs(remove_ind) <= len(humans):
+                del expected[humans[remove_ind]]
+        else:
+            max_tokens = rng.randint(0, sum(t for _, t in expected) + 10)
+            removed = history.trim_to(max_tokens, keep=2, keep_last=1)
+            end, count = len(expected) - 1, 0
+            excess = sum(t for _, t in expected) - max_tokens
+            while excess > 0 and 2 + count < end:
+                excess -= expected[2 + count][1]
+                count += 1
+            del expected[2:2 + count]
+            assert removed == count
+
+        assert [m.message for m in history.messages] == [m for m, _ in expected]
+        assert history.total_tokens == sum(t for _, t in expected)
+        assert history.human_message_count() == sum(isinstance(m, HumanMessage) for m, _ in expected)
+    for index, (message, _) in enumerate(expected):
+        assert history.index_of(message) == index
+
+
+def test_operations_do_not_scan_the_history():
+    history = CustomMessageHistory()
+    for step in range(20000):
+        history.add_message(HumanMessage(content=f"state {step}"), MessageMetadata(input_tokens=100))
+        history.add_message(AIMessage(content=f"output {step}"), MessageMetadata(input_tokens=20))
+
+    # every one of these scanned or shifted the whole history before, seconds of work in total
+    started = time.perf_counter()
+    for _ in range(2000):
+        history.remove_message(2)
+        history.remove_human_message(-2)
+        history.add_message(HumanMessage(content="summary"), MessageMetadata(input_tokens=10), position=2)
+        history.remove_message(2)
+        history.messages[len(history.messages) // 2]
+    history.trim_to(history.total_tokens - 100000, keep=2)
+    assert time.perf_counter() - started < 1.0
+    assert history.total_tokens == sum(m.metadata.input_tokens for m in history.messages)
+
+
+if __name__ == '__main__':
+    test_trim_to_removes_oldest_span()
+    test_remove_human_message_by_index()
+    test_insert_keeps_running_sums()
+    test_matches_a_list_under_random_operations()
+    test_operations_do_not_scan_the_history()
@@ -0,0 +1,46 @@
+import sys
+
+sys.path.append(".")
+
+from src.browser.page_activity import PageActivityTracker
+
+
+class _FakePage:
+    def __init__(self, url):
+        self.url = url
+        self.main_frame = object()
+        self.closed = False
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+        self.handlers["close"](self)
+
+
+def test_current_page_follows_activity():
+    tracker = PageActivityTracker()
+    first, second, third = _FakePage("a"), _FakePage("b"), _FakePage("c")
+    for page in (first, second, third):
+        tracker.track(page)
+    assert tracker.current_page is third
+
+    first.handlers["framenavigated"](first.main_frame)
+    assert tracker.current_page is first
+
+    # sub-frame navigations do not change the active page
+    second.handlers["framenavigated"](object())
+    assert tracker.current_page is first
+
+    first.close()
+    assert tracker.current_page is third
+    assert tracker.pages == [second, third]
+
+
+if __name__ == '__main__':
+    test_current_page_follows_activity()
@@ -0,0 +1,41 @@
+import asyncio
+import base64
+import io
+import sys
+
+from PIL import Image
+
+sys.path.append(".")
+
+from src.browser.recorder import FailureRecorder, RecordingConfig
+
+
+def _frame(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_video_size_is_capped_and_keeps_aspect_ratio():
+    config = RecordingConfig(max_width=960, max_height=720)
+    assert config.video_size({"width": 1280, "height": 1100}) == {"width": 836, "height": 720}
+    assert config.video_size({"width": 640, "height": 480}) == {"width": 640, "height": 480}
+
+
+def test_only_failed_runs_write_the_last_frames(tmp_path):
+    config = RecordingConfig(mode="on_failure", fps=2, buffer_seconds=2)
+    recorder = FailureRecorder(config, str(tmp_path), "run")
+    for i, color in enumerate(["red", "green", "blue", "white", "black", "yellow"]):
+        recorder._frames.append((i * 0.5, _frame(color)))
+
+    assert asyncio.run(recorder.save()) is None
+    assert list(tmp_path.iterdir()) == []
+
+    for i, color in enumerate(["red", "green", "blue", "white", "black", "yellow"]):
+        recorder._frames.append((i * 0.5, _frame(color)))
+    recorder.mark_failed()
+    path = asyncio.run(recorder.save())
+
+    with Image.open(path) as image:
+        # buffer_seconds * fps frames are kept
+        assert image.n_frames == 4
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import sys
+
+sys.path.append(".")
+
+from src.browser.response_capture import ResponseCapture, ResponseCaptureConfig
+from src.utils.deal_json import deals_from_json
+
+
+class _Request:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+class _Frame:
+    def __init__(self, page):
+        self.page = page
+
+
+class _Response:
+    def __init__(self, url, body, resource_type="xhr", content_type="application/json", page=None):
+        self.url = url
+        self.status = 200
+        self.headers = {"content-type": content_type}
+        self.request = _Request(resource_type)
+        self.frame = _Frame(page)
+        self._body = body
+
+    async def text(self):
+        return self._body
+
+
+def test_deals_from_rest_and_graphql_responses():
+    rest = {"categories": [{"name": "Flower"}, {"name": "Edibles"}], "specials": [
+        {"name": "Blue Dream 3.5g", "brand": "Acme", "special_price": 25, "original_price": "40.00",
+         "variants": [{"name": "1g", "price": 10}]},
+        {"name": "Gummies", "description": "2 for $30", "price": {"amount": "15"}, "discountPercent": 20},
+    ]}
+    assert deals_from_json(rest) == [
+        {"title": "Blue Dream 3.5g", "description": "Acme", "price": "$25.00", "original_price": "$40.00"},
+        {"title": "Gummies", "description": "2 for $30 - 20% off", "price": "$15", "original_price": "N/A"},
+    ]
+    graphql = {"data": {"filteredProducts": {"products": [
+        {"Name": "Gelato Cart", "brandName": "Vapeco", "Prices": [30.0, 55.0], "recSpecialPrices": [24.0]},
+        {"Name": "Sour Diesel Cart", "brandName": "Vapeco", "Prices": [30.0], "recSpecialPrices": []},
+    ]}}}
+    assert deals_from_json(graphql) == [
+        {"title": "Gelato Cart", "description": "Vapeco", "price": "$24.00", "original_price": "$30.00"},
+    ]
+    assert deals_from_json({"products": [{"Name": "Gelato 1g", "Prices": [40], "recSpecialPrices": [30],
+                                          "special": True}]}) == [
+        {"title": "Gelato 1g", "description": "No Description", "price": "$30.00", "original_price": "$40.00"},
+    ]
+    assert deals_from_json({"menu": [{"name": "Home"}, {"name": "Shop"}]}) == []
+
+
+def test_products_at_regular_price_are_not_deals():
+    assert deals_from_json({"products": [{"name": "Blue Dream 3.5g", "price": 35}]}) == []
+    assert deals_from_json({"products": [{"name": "Blue Dream 3.5g", "price": 35, "original_price": 35}]}) == []
+    assert deals_from_json({"products": [{"name": "Blue Dream 3.5g", "price": 30, "original_price": 35}]}) == [
+        {"title": "Blue Dream 3.5g", "description": "No Description", "price": "$30.00", "original_price": "$35.00"},
+    ]
+    assert [deal["title"] for deal in deals_from_json({"products": [
+        {"name": "Blue Dream 3.5g", "price": 35, "isSpecial": True},
+        {"name": "Gelato 3.5g", "price": 35, "isSpecial": False},
+        {"name": "Sour Diesel 3.5g", "price": 35},
+    ]})] == ["Blue Dream 3.5g"]
+
+
+def test_capture_keeps_matching_json_responses_per_page():
+    capture = ResponseCapture(ResponseCaptureConfig())
+    page, other_page = object(), object()
+    body = json.dumps({"products": [{"name": "Blue Dream", "price": 25}]})
+
+    async def run():
+        capture._on_response(_Response("https://a.example/api/products", body, page=page))
+        capture._on_response(_Response("https://a.example/api/products", body, page=other_page))
+        # wrong resource type, content type, url or content
+        capture._on_response(_Response("https://a.example/api/products", body, resource_type="document", page=page))
+        capture._on_response(_Response("https://a.example/api/products", body, content_type="text/html", page=page))
+        capture._on_response(_Response("https://a.example/analytics", body, page=page))
+        capture._on_response(_Response("https://a.example/api/menu", json.dumps({"user": "x"}), page=page))
+        await capture.flush()
+
+    asyncio.run(run())
+    assert len(capture.responses()) == 2
+    taken = capture.take(page)
+    assert [r.data["products"][0]["name"] for r in taken] == ["Blue Dream"]
+    assert capture.take(page) == []
+    assert len(capture.responses(other_page)) == 1
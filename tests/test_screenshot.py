@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import io
+import random
+import sys
+
+sys.path.append(".")
+
+from browser_use.browser.context import BrowserContext
+from browser_use.browser.views import BrowserState
+from browser_use.dom.history_tree_processor.view import CoordinateSet, Coordinates, ViewportInfo
+from browser_use.dom.views import DOMElementNode
+from PIL import Image
+
+from src.browser import custom_context
+from src.browser.custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from src.utils.screenshot import (
+    ScreenshotConfig,
+    element_region,
+    encode_screenshot,
+    screenshot_config_from_env,
+    screenshot_mime_type,
+)
+
+
+def _png(width=800, height=600, seed=0):
+    # noise, like the photos of a deals page: compresses badly as PNG and hashes to more than zero
+    image = Image.frombytes("RGB", (width, height), random.Random(seed).randbytes(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def _image(screenshot):
+    return Image.open(io.BytesIO(base64.b64decode(screenshot)))
+
+
+def _node(left, top, right, bottom):
+    return DOMElementNode(
+        is_visible=True, parent=None, tag_name="a", xpath="", attributes={}, children=[],
+        viewport_coordinates=CoordinateSet(
+            top_left=Coordinates(x=left, y=top), top_right=Coordinates(x=right, y=top),
+            bottom_left=Coordinates(x=left, y=bottom), bottom_right=Coordinates(x=right, y=bottom),
+            center=Coordinates(x=(left + right) // 2, y=(top + bottom) // 2),
+            width=right - left, height=bottom - top,
+        ),
+        viewport_info=ViewportInfo(scroll_x=0, scroll_y=0, width=400, height=300),
+    )
+
+
+def _state(screenshot, selector_map=None):
+    root = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="", attributes={}, children=[])
+    return BrowserState(element_tree=root, selector_map=selector_map or {}, url="https://example.com",
+                        title="Example", tabs=[], screenshot=screenshot)
+
+
+def test_passthrough_keeps_the_png_and_hashes_it():
+    screenshot = _png()
+
+    encoded = encode_screenshot(screenshot, ScreenshotConfig())
+
+    assert encoded.data == screenshot and encoded.mime_type == "image/png"
+    assert encoded.original_bytes == encoded.encoded_bytes
+    assert encoded.dhash
+
+
+def test_downscaled_jpeg_is_smaller():
+    screenshot = _png(1600, 1200)
+
+    encoded = encode_screenshot(screenshot, ScreenshotConfig(max_dimension=800, image_format="jpeg", quality=50))
+
+    assert encoded.mime_type == "image/jpeg" and screenshot_mime_type(encoded.data) == "image/jpeg"
+    assert _image(encoded.data).size == (800, 600)
+    assert encoded.encoded_bytes < encoded.original_bytes
+    # the hash is of the screenshot, not of the re-encoded image
+    assert encoded.dhash == encode_screenshot(screenshot, ScreenshotConfig()).dhash
+
+
+def test_crop_to_elements_scales_css_pixels_to_the_screenshot():
+    state = _state(None, {1: _node(100, 50, 200, 100), 2: _node(150, 120, 250, 150)})
+
+    region = element_region(state, margin=10)
+    assert region == (90, 40, 260, 160)
+
+    # a 2x device scale screenshot of a 400 px wide viewport
+    encoded = encode_screenshot(_png(), ScreenshotConfig(crop_to_elements=True), region, viewport_width=400)
+    assert _image(encoded.data).size == (340, 240)
+
+
+def test_get_state_re_encodes_the_screenshot(monkeypatch):
+    screenshot = _png(1600, 1200)
+
+    async def get_state(self):
+        return _state(screenshot)
+
+    monkeypatch.setattr(BrowserContext, "get_state", get_state)
+    context = CustomBrowserContext(browser=None, config=CustomBrowserContextConfig(
+        screenshot_config=ScreenshotConfig(max_dimension=400, image_format="webp"),
+    ))
+
+    state = asyncio.run(context.get_state())
+
+    assert screenshot_mime_type(state.screenshot) == "image/webp"
+    assert _image(state.screenshot).size == (400, 300)
+    assert state.screenshot_hash is not None
+    assert context.screenshot_stats[0]["encoded_bytes"] < context.screenshot_stats[0]["original_bytes"]
+
+
+def test_get_state_decodes_only_to_re_encode_or_hash(monkeypatch):
+    screenshot = _png()
+    encoded = []
+
+    async def get_state(self):
+        return _state(screenshot)
+
+    def encode(*args):
+        encoded.append(args)
+        return encode_screenshot(*args)
+
+    monkeypatch.setattr(BrowserContext, "get_state", get_state)
+    monkeypatch.setattr(custom_context, "encode_screenshot", encode)
+
+    state = asyncio.run(CustomBrowserContext(browser=None, config=CustomBrowserContextConfig()).get_state())
+    assert (state.screenshot, state.screenshot_hash, encoded) == (screenshot, None, [])
+
+    config = CustomBrowserContextConfig(hash_screenshots=True)
+    state = asyncio.run(CustomBrowserContext(browser=None, config=config).get_state())
+    assert state.screenshot == screenshot and state.screenshot_hash == encode_screenshot(screenshot, ScreenshotConfig()).dhash
+    assert len(encoded) == 1
+
+
+def test_screenshot_config_from_env(monkeypatch):
+    for name in ("SCREENSHOT_MAX_DIMENSION", "SCREENSHOT_FORMAT", "SCREENSHOT_QUALITY", "SCREENSHOT_CROP_TO_ELEMENTS",
+                 "SCREENSHOT_CROP_MARGIN"):
+        monkeypatch.delenv(name, raising=False)
+    assert screenshot_config_from_env() is None
+
+    monkeypatch.setenv("SCREENSHOT_MAX_DIMENSION", "1024")
+    monkeypatch.setenv("SCREENSHOT_FORMAT", "webp")
+    monkeypatch.setenv("SCREENSHOT_QUALITY", "60")
+    assert screenshot_config_from_env() == ScreenshotConfig(max_dimension=1024, image_format="webp", quality=60)
+
+
+if __name__ == '__main__':
+    test_passthrough_keeps_the_png_and_hashes_it()
+    test_downscaled_jpeg_is_smaller()
+    test_crop_to_elements_scales_css_pixels_to_the_screenshot()
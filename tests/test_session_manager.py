@@ -0,0 +1,63 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+import pytest
+
+from src.utils.session_manager import SessionLimitError, SessionManager
+
+
+def test_sessions_are_isolated_and_limited():
+    async def run():
+        manager = SessionManager(max_sessions=2, idle_timeout=3600)
+        first = await manager.acquire("a")
+        second = await manager.acquire("b")
+        assert await manager.acquire("a") is first
+
+        first.request_stop()
+        assert first.agent_state.is_stop_requested()
+        assert not second.agent_state.is_stop_requested()
+
+        with pytest.raises(SessionLimitError):
+            await manager.acquire("c")
+
+    asyncio.run(run())
+
+
+def test_idle_sessions_are_evicted_for_new_ones():
+    async def run():
+        manager = SessionManager(max_sessions=1, idle_timeout=0)
+        session = await manager.acquire("a")
+        session.running = True
+        with pytest.raises(SessionLimitError):
+            await manager.acquire("b")
+
+        session.running = False
+        await manager.acquire("b")
+        assert manager.get("a") is None
+        assert len(manager) == 1
+
+    asyncio.run(run())
+
+
+def test_idle_sessions_are_evicted_in_the_background():
+    async def run():
+        manager = SessionManager(max_sessions=2, idle_timeout=0, eviction_interval=0.01)
+        await manager.acquire("a")
+        busy = await manager.acquire("b")
+        busy.running = True
+
+        await asyncio.sleep(0.05)
+
+        assert manager.get("a") is None
+        assert manager.get("b") is busy
+        await manager.close_all()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    test_sessions_are_isolated_and_limited()
+    test_idle_sessions_are_evicted_for_new_ones()
+    test_idle_sessions_are_evicted_in_the_background()
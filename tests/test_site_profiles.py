@@ -0,0 +1,81 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+sys.path.append(".")
+
+from src.utils.site_profiles import ProfileRegistry, SiteProfile, BUILTIN_PROFILE_DIR
+
+
+class _Page:
+    def __init__(self, url, scores):
+        self.url = url
+        self.scores = scores
+        self.evaluations = 0
+
+    async def evaluate(self, script, fingerprints):
+        self.evaluations += 1
+        return self.scores[:len(fingerprints)]
+
+
+def test_builtin_profiles_load():
+    registry = ProfileRegistry([BUILTIN_PROFILE_DIR])
+    assert {"dutchie", "jane", "woocommerce"} <= set(registry.profiles)
+    assert registry.profiles["dutchie"].matches_host("https://shop.dutchie.com/embedded-menu/x")
+    assert not registry.profiles["dutchie"].matches_host("https://notdutchie.com/")
+
+
+def test_custom_profile_replaces_builtin(tmp_path):
+    (tmp_path / "woocommerce.json").write_text(json.dumps({
+        "name": "woocommerce",
+        "fingerprint": {"selectors": ["body.woocommerce"]},
+        "deals": {"item": "li.product.sale", "fields": {"title": "h2"}},
+    }))
+    (tmp_path / "broken.json").write_text(json.dumps({"name": "broken", "fingerprint": {}}))
+    registry = ProfileRegistry([BUILTIN_PROFILE_DIR, str(tmp_path)])
+    assert registry.profiles["woocommerce"].deals["item"] == "li.product.sale"
+    assert "broken" not in registry.profiles
+
+    with pytest.raises(ValueError):
+        SiteProfile.from_dict({"name": "x", "fingerprint": {}, "deals": {"item": "li", "fields": {"title": "h2", "sku": "b"}}})
+
+
+def test_detect_picks_best_fingerprint_once_per_host(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.json").write_text(json.dumps({
+            "name": name, "fingerprint": {"hosts": [f"{name}.example"]}, "deals": {"item": "li", "fields": {"title": "h2"}},
+        }))
+    registry = ProfileRegistry([str(tmp_path)])
+
+    page = _Page("https://shop.example/deals", [1, 3])
+    assert asyncio.run(registry.detect(page)).name == "b"
+    page.url = "https://shop.example/specials"
+    assert asyncio.run(registry.detect(page)).name == "b"
+    assert page.evaluations == 1
+
+    assert asyncio.run(registry.detect(_Page("https://other.example/", [0, 0]))) is None
+    hosted = _Page("https://menu.a.example/", [0, 5])
+    assert asyncio.run(registry.detect(hosted)).name == "a"
+    assert hosted.evaluations == 0
+
+
+def test_unknown_hosts_are_detected_again_after_their_ttl(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps({
+        "name": "a", "fingerprint": {"scripts": ["a-menu.js"]}, "deals": {"item": "li", "fields": {"title": "h2"}},
+    }))
+    registry = ProfileRegistry([str(tmp_path)], unknown_host_ttl=60)
+
+    # the age gate in front of the menu has none of the platform's scripts
+    page = _Page("https://shop.example/", [0])
+    assert asyncio.run(registry.detect(page)) is None
+    page.scores = [2]
+    assert asyncio.run(registry.detect(page)) is None
+    assert page.evaluations == 1
+
+    registry._unknown_hosts["shop.example"] -= 61
+    assert asyncio.run(registry.detect(page)).name == "a"
+    assert "shop.example" not in registry._unknown_hosts
+    assert asyncio.run(registry.detect(page)).name == "a"
+    assert page.evaluations == 2
@@ -0,0 +1,115 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+from src.browser.smart_wait import AdaptiveTimeouts, SmartWait
+
+
+class _Request:
+    def __init__(self, resource_type="fetch"):
+        self.resource_type = resource_type
+
+
+class _Page:
+    url = "https://a.example/deals"
+
+    def __init__(self, dom_quiet=True):
+        self.listeners = {}
+        self.dom_quiet = dom_quiet
+
+    async def wait_for_load_state(self, state, timeout=None):
+        pass
+
+    async def evaluate(self, script, args):
+        # the DOM stability check: quiet after quietMs, or never and false after timeoutMs
+        quiet_ms, timeout_ms = args
+        await asyncio.sleep((quiet_ms if self.dom_quiet else timeout_ms) / 1000)
+        return self.dom_quiet
+
+    def on(self, event, listener):
+        self.listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event, listener):
+        self.listeners[event].remove(listener)
+
+    def emit(self, event, request):
+        for listener in list(self.listeners.get(event, [])):
+            listener(request)
+
+
+def test_adaptive_timeouts_learn_per_domain():
+    timeouts = AdaptiveTimeouts(default_ms=10000, min_ms=1000, max_ms=30000)
+    assert timeouts.timeout("a.example", "settle") == 10000
+    for _ in range(20):
+        timeouts.observe("a.example", "settle", 400)
+    assert timeouts.timeout("a.example", "settle") == 1000
+    assert timeouts.timeout("b.example", "settle") == 10000
+
+    for _ in range(20):
+        timeouts.observe("slow.example", "settle", 3000)
+    fast = timeouts.timeout("slow.example", "settle")
+    timeouts.observe("slow.example", "settle", fast, timed_out=True)
+    assert timeouts.timeout("slow.example", "settle") > fast
+    for _ in range(5):
+        timeouts.observe("slow.example", "settle", 30000, timed_out=True)
+    assert timeouts.timeout("slow.example", "settle") == 30000
+
+
+def test_network_idle_waits_for_requests_and_ignores_streams():
+    wait = SmartWait(idle_ms=100)
+    page = _Page()
+
+    async def run():
+        idle = asyncio.ensure_future(wait.network_idle(page, timeout=2000))
+        await asyncio.sleep(0.01)
+        request, stream = _Request(), _Request("eventsource")
+        page.emit("request", request)
+        page.emit("request", stream)
+        await asyncio.sleep(0.3)
+        assert not idle.done()
+        page.emit("requestfinished", request)
+        started = asyncio.get_running_loop().time()
+        assert await idle
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert not await wait.network_idle(page, timeout=50)
+        assert all(not listeners for listeners in page.listeners.values())
+
+    asyncio.run(run())
+
+
+def test_settle_ends_once_the_dom_or_the_network_is_quiet():
+    wait = SmartWait(quiet_ms=50, idle_ms=50, max_quiet_ms=2000)
+
+    async def run():
+        # an animated page whose network is idle
+        page = _Page(dom_quiet=False)
+        started = asyncio.get_running_loop().time()
+        assert await wait.settle(page)
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert all(not listeners for listeners in page.listeners.values())
+
+        # a page that keeps polling but whose DOM is quiet
+        page = _Page()
+        page.emit("request", _Request())
+        assert await wait.settle(page)
+
+    asyncio.run(run())
+
+
+def test_settle_caps_pages_that_never_go_quiet_without_backing_off():
+    timeouts = AdaptiveTimeouts(default_ms=10000, min_ms=100, max_ms=30000)
+    wait = SmartWait(timeouts, quiet_ms=50, idle_ms=50, max_quiet_ms=200)
+
+    async def run():
+        page = _Page(dom_quiet=False)
+        for _ in range(3):
+            busy = asyncio.ensure_future(wait.settle(page))
+            await asyncio.sleep(0.01)
+            page.emit("request", _Request())
+            assert not await busy
+        assert not any(page.listeners.values())
+
+    asyncio.run(run())
+    # observed as waits of about the cap, not timeouts doubling the estimate
+    assert timeouts.timeout("a.example", "settle") < 1000
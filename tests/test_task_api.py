@@ -0,0 +1,67 @@
+import sys
+
+sys.path.append(".")
+
+from fastapi.testclient import TestClient
+
+from src.utils.task_api import create_api_app
+from src.utils.task_queue import TaskQueue
+
+
+def test_submit_poll_and_fetch_artifacts(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    client = TestClient(create_api_app(queue, api_token="secret"))
+    headers = {"Authorization": "Bearer secret"}
+
+    assert client.post("/api/tasks", json={"kind": "custom", "params": {"task": "t"}}).status_code == 401
+    assert client.post("/api/tasks", json={"kind": "nope", "params": {"task": "t"}}, headers=headers).status_code == 422
+
+    response = client.post("/api/tasks", json={"kind": "custom", "params": {"task": "t"}}, headers=headers)
+    assert response.status_code == 202
+    task_id = response.json()["id"]
+    assert client.get(f"/api/tasks/{task_id}", headers=headers).json()["status"] == "queued"
+
+    history_file = tmp_path / "history.json"
+    history_file.write_text("{}")
+    queue.claim("worker")
+    queue.update_progress(task_id, {"step": 1})
+    queue.complete(task_id, "worker", {"final_result": "ok", "history_file": str(history_file)})
+
+    events = client.get(f"/api/tasks/{task_id}/events", headers=headers).text
+    assert events.startswith("event: done")
+    assert client.get(f"/api/tasks/{task_id}/artifacts", headers=headers).json() == {"artifacts": ["history.json"]}
+    assert client.get(f"/api/tasks/{task_id}/artifacts/history.json", headers=headers).text == "{}"
+    assert client.get(f"/api/tasks/{task_id}/artifacts/other.json", headers=headers).status_code == 404
+
+
+def test_submit_drops_llm_endpoint_key_and_path_params(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    client = TestClient(create_api_app(queue))
+    params = {
+        "task": "t", "max_steps": 5, "llm_base_url": "https://attacker.example", "llm_api_key": "x",
+        "save_agent_history_path": "/etc", "save_dir": "/", "save_recording_path": "/tmp/x",
+    }
+
+    response = client.post("/api/tasks", json={"kind": "custom", "params": params})
+    assert response.status_code == 202
+    assert response.json()["ignored_params"] == [
+        "llm_api_key", "llm_base_url", "save_agent_history_path", "save_dir", "save_recording_path",
+    ]
+    assert queue.get(response.json()["id"]).params == {"task": "t", "max_steps": 5}
+
+
+def test_submit_rejects_tasks_missing_their_params(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    client = TestClient(create_api_app(queue))
+
+    def submit(kind, params):
+        return client.post("/api/tasks", json={"kind": kind, "params": params})
+
+    assert submit("custom", {"task": " "}).status_code == 422
+    assert submit("hash_deals", {"website_urls": ["https://a.example"]}).status_code == 422
+    response = submit("hash_deals", {"website_urls": ["https://a.example", "https://b.example"],
+                                     "location_names": ["Denver"]})
+    assert response.status_code == 422 and "differ in length" in response.json()["detail"]
+    assert queue.list() == []
+
+    assert submit("hash_deals", {"website_urls": ["https://a.example"], "location_names": ["Denver"]}).status_code == 202
@@ -0,0 +1,47 @@
+import sys
+
+sys.path.append(".")
+
+from src.utils.task_queue import DONE, QUEUED, RUNNING, TaskQueue
+
+
+def test_claim_is_fifo_and_exclusive(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    first = queue.submit("custom", {"task": "first"})
+    second = queue.submit("hash_deals", {"website_urls": ["https://a.example"], "location_names": ["Denver"]})
+
+    claimed = queue.claim("worker-1")
+    assert claimed.id == first and claimed.status == RUNNING and claimed.attempts == 1
+    assert queue.claim("worker-2").id == second
+    assert queue.claim("worker-3") is None
+
+    assert queue.complete(first, "worker-1", {"final_result": "ok"})
+    assert queue.get(first).status == DONE
+    assert queue.get(first).result == {"final_result": "ok"}
+
+
+def test_stale_tasks_are_requeued(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    task_id = queue.submit("custom", {"task": "t"})
+    queue.claim("worker-1")
+
+    assert queue.requeue_stale(timeout=3600) == 0
+    assert queue.requeue_stale(timeout=-1) == 1
+    assert queue.get(task_id).status == QUEUED
+    assert queue.claim("worker-2").attempts == 2
+
+    # the first worker finishing late does not overwrite the run of the second
+    assert not queue.complete(task_id, "worker-1", {"final_result": "late"})
+    queue.update_progress(task_id, {"step": 9}, worker="worker-1")
+    task = queue.get(task_id)
+    assert task.status == RUNNING and task.result is None and task.progress is None
+    assert queue.fail(task_id, "worker-2", "boom")
+    assert not queue.complete(task_id, "worker-2", {"final_result": "again"})
+
+
+if __name__ == '__main__':
+    import pathlib
+    import tempfile
+
+    test_claim_is_fifo_and_exclusive(pathlib.Path(tempfile.mkdtemp()))
+    test_stale_tasks_are_requeued(pathlib.Path(tempfile.mkdtemp()))
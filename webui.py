@@ -24,27 +24,34 @@ from browser_use.browser.context import (
 )
 from langchain_ollama import ChatOllama
 from playwright.async_api import async_playwright
-from src.utils.agent_state import AgentState
 
 from src.utils import utils
-from src.agent.custom_agent import CustomAgent
-from src.browser.custom_browser import CustomBrowser
+from src.agent.custom_agent import CustomAgent, agent_options_from_env
+from src.browser.custom_browser import CustomBrowser, preserve_cookie_domains_from_env
 from src.agent.custom_prompts import CustomSystemPrompt, CustomAgentMessagePrompt
-from src.browser.custom_context import BrowserContextConfig, CustomBrowserContext
+from src.browser.custom_context import BrowserContextConfig, CustomBrowserContext, CustomBrowserContextConfig
 from src.controller.custom_controller import CustomController
 from gradio.themes import Citrus, Default, Glass, Monochrome, Ocean, Origin, Soft, Base
 from src.utils.default_config_settings import default_config, load_config_from_file, save_config_to_file, save_current_config, update_ui_from_config
 from src.utils.utils import update_model_dropdown, get_latest_files, capture_screenshot
-from src.utils.hash_deals_agent import hash_deals_agent # Import hash_deals_agent
-
-
-# Global variables for persistence
-_global_browser = None
-_global_browser_context = None
-_global_agent = None
-
-# Create the global agent state instance
-_global_agent_state = AgentState()
+from src.utils.artifact_index import artifact_index
+from src.utils.history_store import write_history
+from src.utils.history_summary import HistorySummary
+from src.utils.screenshot import screenshot_config_from_env
+from src.utils.deal_normalizer import aggregate_deals, export_deals, normalize_deals
+from src.utils.deal_dedup import DealDedupIndex
+from src.utils.deal_changes import SnapshotStore
+from src.utils.deal_store import DealStore
+from src.browser.live_view import live_view_hub
+from src.utils.hash_deals_agent import hash_deals_agent, incremental_hash_deals_agent # Import hash_deals_agent
+from src.utils.session_manager import SessionManager, SessionLimitError
+
+
+# Browser, agent and stop state of every UI session, keyed by the Gradio session hash
+_session_manager = SessionManager(
+    max_sessions=int(os.getenv("MAX_SESSIONS", "4")),
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "1800")),
+)
 
 def resolve_sensitive_env_variables(text):
     """
@@ -70,13 +77,13 @@ def resolve_sensitive_env_variables(text):
 
     return result
 
-async def stop_agent():
+async def stop_agent(request: gr.Request):
     """Request the agent to stop and update UI with enhanced feedback"""
-    global _global_agent_state, _global_browser_context, _global_browser, _global_agent
-
     try:
-        # Request stop
-        _global_agent.stop()
+        # Request stop of this session's agent only
+        session = _session_manager.get(request.session_hash)
+        if session is not None:
+            session.request_stop()
 
         # Update UI immediately
         message = "Stop requested - the agent will halt at the next safe point"
@@ -97,13 +104,13 @@ async def stop_agent():
             gr.update(interactive=True)
         )
 
-async def stop_research_agent():
+async def stop_research_agent(request: gr.Request):
     """Request the agent to stop and update UI with enhanced feedback"""
-    global _global_agent_state, _global_browser_context, _global_browser
-
     try:
-        # Request stop
-        _global_agent_state.request_stop()
+        # Request stop of this session's agent only
+        session = _session_manager.get(request.session_hash)
+        if session is not None:
+            session.request_stop()
 
         # Update UI immediately
         message = "Stop requested - the agent will halt at the next safe point"
@@ -146,10 +153,20 @@ async def run_browser_agent(
         use_vision,
         max_actions_per_step,
         tool_calling_method,
-        is_hash_deals_agent=False
+        is_hash_deals_agent=False,
+        session_id=None
 ):
-    global _global_agent_state
-    _global_agent_state.clear_stop()  # Clear any previous stop requests
+    try:
+        session = await _session_manager.acquire(session_id)
+    except SessionLimitError as e:
+        logger.warning(str(e))
+        return (
+            "", str(e), "", "", None, None, None,
+            gr.update(value="Stop", interactive=True),
+            gr.update(interactive=True)
+        )
+    session.agent_state.clear_stop()  # Clear any previous stop requests
+    session.running = True
 
     try:
         # Disable recording if the checkbox is unchecked
@@ -163,10 +180,7 @@ async def run_browser_agent(
         # Get the list of existing videos before the agent runs
         existing_videos = set()
         if save_recording_path:
-            existing_videos = set(
-                glob.glob(os.path.join(save_recording_path, "*.[mM][pP]4"))
-                + glob.glob(os.path.join(save_recording_path, "*.[wW][eE][bB][mM]"))
-            )
+            existing_videos = set(artifact_index.files(save_recording_path, [".mp4", ".webm"]))
 
         task = resolve_sensitive_env_variables(task)
 
@@ -181,6 +195,7 @@ async def run_browser_agent(
         )
         if agent_type == "org":
             final_result, errors, model_actions, model_thoughts, trace_file, history_file = await run_org_agent(
+                session=session,
                 llm=llm,
                 use_own_browser=use_own_browser,
                 keep_browser_open=keep_browser_open,
@@ -200,6 +215,7 @@ async def run_browser_agent(
             )
         elif agent_type == "custom":
             final_result, errors, model_actions, model_thoughts, trace_file, history_file = await run_custom_agent(
+                session=session,
                 llm=llm,
                 use_own_browser=use_own_browser,
                 keep_browser_open=keep_browser_open,
@@ -220,6 +236,7 @@ async def run_browser_agent(
             )
         elif agent_type == "hash_deals":
             final_result, errors, model_actions, model_thoughts, trace_file, history_file = await run_hash_deals_agent_func(
+                session=session,
                 llm=llm,
                 use_own_browser=use_own_browser,
                 keep_browser_open=keep_browser_open,
@@ -253,9 +270,13 @@ async def run_browser_agent(
             gr.update(value="Stop", interactive=True),
             gr.update(interactive=True)
         )
+    finally:
+        session.running = False
+        session.touch()
 
 
 async def run_org_agent( # Keep run_org_agent same
+        session,
         llm,
         use_own_browser,
         keep_browser_open,
@@ -278,6 +299,7 @@ async def run_org_agent( # Keep run_org_agent same
 
 
 async def run_custom_agent( # Keep run_custom_agent same
+        session,
         llm,
         use_own_browser,
         keep_browser_open,
@@ -301,6 +323,7 @@ async def run_custom_agent( # Keep run_custom_agent same
 
 
 async def run_hash_deals_agent_func( # Keep run_hash_deals_agent_func same
+        session,
         llm,
         use_own_browser,
         keep_browser_open,
@@ -319,14 +342,56 @@ async def run_hash_deals_agent_func( # Keep run_hash_deals_agent_func same
         tool_calling_method,
         is_hash_deals_agent=True
 ):
-    # ... (rest of run_hash_deals_agent_func remains same) ...
-    history_file = os.path.join(save_agent_history_path, f"{_global_agent.agent_id}.json")
-    _global_agent.save_history(history_file)
-
-    final_result = history.final_result()
-    errors = history.errors()
-    model_actions = history.model_actions()
-    model_thoughts = history.model_thoughts()
+    extra_chromium_args = [f"--window-size={window_w},{window_h}"]
+    chrome_path = None
+    if use_own_browser:
+        chrome_path = os.getenv("CHROME_PATH", None) or None
+        chrome_user_data = os.getenv("CHROME_USER_DATA", None)
+        if chrome_user_data:
+            extra_chromium_args += [f"--user-data-dir={chrome_user_data}"]
+    browser_context = await session.new_task_context(
+        BrowserConfig(
+            headless=headless,
+            disable_security=disable_security,
+            chrome_instance_path=chrome_path,
+            extra_chromium_args=extra_chromium_args,
+        ),
+        CustomBrowserContextConfig(
+            trace_path=save_trace_path if save_trace_path else None,
+            save_recording_path=save_recording_path if save_recording_path else None,
+            no_viewport=False,
+            browser_window_size=BrowserContextWindowSize(width=window_w, height=window_h),
+            screenshot_config=screenshot_config_from_env(),
+        ),
+        preserve_cookie_domains=preserve_cookie_domains_from_env(),
+    )
+    # the session's agent is what stop_agent stops
+    session.agent = CustomAgent(
+        task=task,
+        add_infos=add_infos,
+        use_vision=use_vision,
+        llm=llm,
+        browser=session.browser,
+        browser_context=browser_context,
+        controller=CustomController(),
+        max_actions_per_step=max_actions_per_step,
+        tool_calling_method=tool_calling_method,
+        is_hash_deals_agent=is_hash_deals_agent,
+        **agent_options_from_env(),
+    )
+    try:
+        history = await session.agent.run(max_steps=max_steps)
+    finally:
+        if not keep_browser_open:
+            await session.close_browser()
+    history_file = write_history(history, save_agent_history_path, session.agent.agent_id)
+    artifact_index.register(history_file, run_id=session.agent.agent_id)
+
+    summary = HistorySummary.for_agent(session.agent, history)
+    final_result = summary.final_result
+    errors = summary.errors
+    model_actions = summary.model_actions
+    model_thoughts = summary.model_thoughts
 
     trace_file = get_latest_files(save_trace_path)
 
@@ -356,10 +421,12 @@ async def run_with_stream( # Keep run_with_stream same
     max_steps,
     use_vision,
     max_actions_per_step,
-    tool_calling_method
+    tool_calling_method,
+    request: gr.Request
 ):
     if agent_type == "hash_deals": # No browser view for hash_deals_agent
-        result = await run_hash_deals_agent_func( # Call run_hash_deals_agent_func here
+        # run_browser_agent acquires the session and reports when the server is at its session limit
+        result = await run_browser_agent(
             agent_type=agent_type,
             llm_provider=llm_provider,
             llm_model_name=llm_model_name,
@@ -383,7 +450,8 @@ async def run_with_stream( # Keep run_with_stream same
             use_vision=use_vision,
             max_actions_per_step=max_actions_per_step,
             tool_calling_method=tool_calling_method,
-            is_hash_deals_agent=True
+            is_hash_deals_agent=True,
+            session_id=request.session_hash
         )
         yield [gr.update(visible=False)] + list(result) # Hide browser_view for hash_deals_agent
     else: # For other agent types, keep browser view
@@ -402,16 +470,12 @@ async def run_with_stream( # Keep run_with_stream same
         ]
 
 
-async def close_global_browser(): # Keep close_global_browser same
-    global _global_browser, _global_browser_context
-
-    if _global_browser_context:
-        await _global_browser_context.close()
-        _global_browser_context = None
-
-    if _global_browser:
-        await _global_browser.close()
-        _global_browser = None
+async def close_session_browser(session_id):
+    session = _session_manager.get(session_id)
+    if session is not None:
+        # only this session's screencasts, the pages other sessions show keep streaming
+        await live_view_hub.release_pages(session.pages())
+        await session.close_browser()
 
 
 async def run_hash_deals_agents_ui(website_urls_input, location_names_input, llm_provider, llm_model_name, llm_num_ctx, llm_temperature, llm_base_url, llm_api_key, headless, disable_security, agent_type):
@@ -431,16 +495,32 @@ async def run_hash_deals_agents_ui(website_urls_input, location_names_input, llm
         base_url=llm_base_url,
         api_key=llm_api_key,
     )
+    # incremental runs skip sites whose deals page is unchanged since the last run and report what changed
+    incremental = os.getenv("HASH_DEALS_INCREMENTAL", "false").lower() == "true"
+    snapshot_store = SnapshotStore() if incremental else None
     deals_results: Dict[str, List[Dict[str, Any]]] = {}
     agent_tasks = []
     for i in range(len(website_urls)):
         url = website_urls[i]
         location = location_names[i]
-        task = hash_deals_agent(url, location, llm, headless, disable_security)
+        if incremental:
+            task = incremental_hash_deals_agent(url, location, llm, snapshot_store, headless, disable_security)
+        else:
+            task = hash_deals_agent(url, location, llm, headless, disable_security)
         agent_tasks.append(task)
         deals_results[url] = []
 
     all_deals_lists = await asyncio.gather(*agent_tasks)
+    site_changes = [None] * len(website_urls)
+    if incremental:
+        site_changes = all_deals_lists
+        all_deals_lists = [run["deals"] for run in site_changes]
+    # each agent already merged the duplicates of its site; optionally merge chain-wide promotions too
+    deal_index = DealDedupIndex(cross_location=os.getenv("DEALS_DEDUP_ACROSS_LOCATIONS", "false").lower() == "true")
+    all_deals_lists = [
+        deal_index.add_many(deals_list, website_url=website_urls[i], location=location_names[i])
+        for i, deals_list in enumerate(all_deals_lists)
+    ]
 
     output_markdown = ""
     report_data = {} # Dictionary to hold report data for JSON
@@ -452,6 +532,22 @@ async def run_hash_deals_agents_ui(website_urls_input, location_names_input, llm
         report_data[f"{location} - {url}"] = deals_list # Store deals list in report_data
 
         output_markdown += f"### {location} - [{url}]({url})\n"
+        if site_changes[i] is not None:
+            run = site_changes[i]
+            changes = run["changes"]
+            output_markdown += (
+                f"*{run['status'].capitalize()}*: {len(changes['added'])} added, "
+                f"{len(changes['removed'])} removed, {len(changes['changed'])} changed\n"
+            )
+            for label, deals in (("Added", changes["added"]), ("Removed", changes["removed"])):
+                for deal in deals:
+                    output_markdown += f"- {label}: **{deal.get('title', 'No Title')}** {deal.get('price', '')}\n"
+            for change in changes["changed"]:
+                output_markdown += (
+                    f"- Changed: **{change['after'].get('title', 'No Title')}** "
+                    f"{change['before'].get('price', '')} → {change['after'].get('price', '')}\n"
+                )
+            output_markdown += "\n"
 
         if deals_list:
             for deal in deals_list:
@@ -481,7 +577,20 @@ async def run_hash_deals_agents_ui(website_urls_input, location_names_input, llm
     with open(report_file_path, 'w') as f:
         f.write(report_json_str)
 
-    return output_markdown, report_file_path, gr.update(value="Stop", interactive=True),  gr.update(interactive=True) # Return file path
+    # Normalized table of all sites: numeric prices, discounts, weights and categories
+    deals_table = normalize_deals(report_data)
+    # keep every run for price history, the report files are overwritten
+    DealStore().record(deals_table)
+    table_file_path = export_deals(deals_table, f"hash_deals_report.{os.getenv('DEALS_EXPORT_FORMAT', 'csv')}")
+    summary = aggregate_deals(deals_table)
+    if not summary.empty:
+        output_markdown += "### Summary\n| Location | Category | Deals | Lowest unit price | Best discount |\n|---|---|---|---|---|\n"
+        for row in summary.itertuples(index=False):
+            lowest = f"${row.min_unit_price:.2f}" if row.min_unit_price == row.min_unit_price else "-"
+            discount = f"{row.max_discount_pct:.0f}%" if row.max_discount_pct == row.max_discount_pct else "-"
+            output_markdown += f"| {row.location} | {row.category} | {row.deals} | {lowest} | {discount} |\n"
+
+    return output_markdown, [report_file_path, table_file_path], gr.update(value="Stop", interactive=True),  gr.update(interactive=True) # Return file paths
 
 
 def create_ui(config, theme_name="Ocean"):
@@ -503,7 +612,7 @@ def create_ui(config, theme_name="Ocean"):
                     run_hash_deals_button = gr.Button("💰 Run Hash Deals Agents", variant="primary", scale=2)
                     stop_hash_deals_button = gr.Button("⏹️ Stop", variant="stop", scale=1)
                 hash_deals_output_display = gr.Markdown(label="Deals and Discounts")
-                hash_deals_report_download = gr.File(label="Download Deals Report", visible=True) # Make download button visible
+                hash_deals_report_download = gr.File(label="Download Deals Report", file_count="multiple", visible=True) # Make download button visible
 
 
             with gr.TabItem("📊 Results", id=6):
@@ -526,12 +635,47 @@ def main():
     parser.add_argument("--port", type=int, default=7788, help="Port to listen on")
     parser.add_argument("--theme", type=str, default="Ocean", choices=theme_map.keys(), help="Theme to use for the UI")
     parser.add_argument("--dark-mode", action="store_true", help="Enable dark mode")
+    parser.add_argument("--api", action="store_true", help="Serve the task REST API under /api next to the UI")
+    parser.add_argument("--api-workers", type=int, default=0,
+                        help="Run queued API tasks in this process with this many browsers (0: use worker.py)")
+    parser.add_argument("--queue-db", type=str, default=os.getenv("TASK_QUEUE_DB", "./tmp/task_queue.db"),
+                        help="SQLite file of the task queue")
     args = parser.parse_args()
 
     config_dict = default_config()
 
+    if os.getenv("RETENTION_ENABLED", "false").lower() == "true":
+        from src.utils.artifact_retention import RetentionManager, default_retention_policies
+        RetentionManager(
+            default_retention_policies(), interval=float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+        ).start_thread()
+
     demo = create_ui(config_dict, theme_name=args.theme)
-    demo.launch(server_name=args.ip, server_port=args.port)
+    if not args.api:
+        demo.launch(server_name=args.ip, server_port=args.port)
+        return
+
+    api_token = os.getenv("API_TOKEN") or None
+    if api_token is None and args.ip not in ("127.0.0.1", "localhost", "::1"):
+        # task params pick the LLM and the browser runs on this machine, don't serve that to the network unauthenticated
+        parser.error("--api on a non-local --ip requires API_TOKEN to be set")
+
+    import uvicorn
+    from src.utils.task_api import create_api_app
+    from src.utils.task_queue import TaskQueue
+
+    app = create_api_app(TaskQueue(args.queue_db), api_token=api_token)
+    if args.api_workers:
+        from src.utils.task_worker import worker_loop
+
+        @app.on_event("startup")
+        async def start_api_workers():
+            app.state.worker = asyncio.create_task(
+                worker_loop(args.queue_db, f"webui-{os.getpid()}", concurrency=args.api_workers)
+            )
+
+    app = gr.mount_gradio_app(app, demo, path="/")
+    uvicorn.run(app, host=args.ip, port=args.port)
 
 if __name__ == '__main__':
     main()
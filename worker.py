@@ -0,0 +1,112 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.utils.task_queue import TaskQueue, TASK_KINDS
+
+logger = logging.getLogger(__name__)
+
+
+def run_workers(args):
+    # agents, browsers and LLM clients are only needed by the workers, not to submit tasks
+    from src.utils.task_worker import worker_process_main
+
+    queue = TaskQueue(args.db)
+    requeued = queue.requeue_stale(timeout=args.stale_timeout)
+    if requeued:
+        logger.info(f"Requeued {requeued} tasks of stopped workers")
+
+    # spawn, so every worker starts its own Playwright instead of inheriting a forked event loop
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(
+            target=worker_process_main,
+            args=(args.db, i, args.browsers_per_worker, not args.headful),
+            name=f"agent-worker-{i}",
+        )
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {len(processes)} workers on {args.db}")
+    if os.getenv("RETENTION_ENABLED", "false").lower() == "true":
+        from src.utils.artifact_retention import RetentionManager, default_retention_policies
+        RetentionManager(
+            default_retention_policies(), interval=float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+        ).start_thread()
+    try:
+        while any(process.is_alive() for process in processes):
+            time.sleep(args.stale_timeout / 2)
+            queue.requeue_stale(timeout=args.stale_timeout)
+    except KeyboardInterrupt:
+        logger.info("Stopping workers")
+    finally:
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+def submit_task(args):
+    params = json.loads(args.params)
+    if args.task:
+        params["task"] = args.task
+    try:
+        task_id = TaskQueue(args.db).submit(args.kind, params)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(task_id)
+
+
+def show_status(args):
+    queue = TaskQueue(args.db)
+    if args.task_id:
+        task = queue.get(args.task_id)
+        if task is None:
+            print(f"No task with id {args.task_id}")
+            return
+        print(json.dumps(task.__dict__, indent=4, default=str))
+    else:
+        print(json.dumps(queue.counts(), indent=4))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Headless workers running queued browser agent tasks")
+    parser.add_argument("--db", type=str, default=os.getenv("TASK_QUEUE_DB", "./tmp/task_queue.db"),
+                        help="SQLite file of the task queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Start worker processes")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    run_parser.add_argument("--browsers-per-worker", type=int, default=1,
+                            help="Browsers, and so tasks run at once, per worker process")
+    run_parser.add_argument("--headful", action="store_true", help="Show the browser windows")
+    run_parser.add_argument("--stale-timeout", type=float, default=300,
+                            help="Seconds without heartbeat after which a running task is requeued")
+    run_parser.set_defaults(func=run_workers)
+
+    submit_parser = subparsers.add_parser("submit", help="Queue a task")
+    submit_parser.add_argument("--kind", type=str, choices=TASK_KINDS, default="custom", help="Agent type")
+    submit_parser.add_argument("--task", type=str, default="", help="Task for the agent")
+    submit_parser.add_argument("--params", type=str, default="{}",
+                               help="JSON object of run_browser_agent parameters (llm_provider, max_steps, ...)")
+    submit_parser.set_defaults(func=submit_task)
+
+    status_parser = subparsers.add_parser("status", help="Show queue counts or one task")
+    status_parser.add_argument("task_id", nargs="?", help="Task id")
+    status_parser.set_defaults(func=show_status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()